@@ -1,3 +1,4 @@
 """
 Package definition for the overview Opal plugin
-"""
\ No newline at end of file
+"""
+default_app_config = "overview.apps.OverviewConfig"
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Approximate statistics for very large subrecord tables.
+
+Configured with the OVERVIEW_APPROXIMATE setting, eg
+
+    OVERVIEW_APPROXIMATE = {
+        "ENABLED": True,
+        # subrecords whose id range is at least this are approximated
+        "THRESHOLD": 1000000,
+        # roughly how many rows or episodes are sampled
+        "SAMPLE_SIZE": 10000,
+        # the sample is made of this many random ranges of ids
+        "BLOCKS": 50,
+    }
+
+Samples are random ranges of ids, which every database can read with
+an index scan. Estimates come with the half width of a 95% confidence
+interval and the views link through to the exact figures.
+"""
+import math
+import random
+
+from django.conf import settings
+from django.db.models import Count, Case, When, Max, Min, Q
+from django.db.models.functions import Lower
+from opal import models as omodels
+
+from overview import overview_utils
+
+DEFAULTS = dict(
+    ENABLED=False,
+    THRESHOLD=1000000,
+    SAMPLE_SIZE=10000,
+    BLOCKS=50,
+)
+
+# 95% confidence
+Z = 1.96
+
+
+def get_setting(name):
+    return getattr(
+        settings, "OVERVIEW_APPROXIMATE", {}
+    ).get(name, DEFAULTS[name])
+
+
+def is_enabled():
+    return get_setting("ENABLED")
+
+
+class Estimate(object):
+    """
+    An estimated value and the half width of its confidence interval
+    """
+    def __init__(self, value, error):
+        self.value = value
+        self.error = error
+
+    def __str__(self):
+        if not self.error:
+            return str(self.value)
+        return "~{} ± {}".format(self.value, self.error)
+
+    def __repr__(self):
+        return "Estimate({!r}, {!r})".format(self.value, self.error)
+
+    def __neg__(self):
+        return -self.value
+
+    def __float__(self):
+        return float(self.value)
+
+    def __eq__(self, other):
+        if isinstance(other, Estimate):
+            return (self.value, self.error) == (other.value, other.error)
+        return self.value == other and not self.error
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+
+class IdSample(object):
+    """
+    A sample of random, equally sized, non overlapping ranges
+    of the ids between min_id and max_id.
+    """
+    def __init__(self, min_id, max_id, rand=None):
+        rand = rand or random
+        self.min_id = min_id or 0
+        self.max_id = max_id or 0
+        span = self.max_id - self.min_id + 1
+        sample_size = get_setting("SAMPLE_SIZE")
+
+        if span <= sample_size:
+            self.block_length = span
+            self.population = 1
+            self.blocks = [(self.min_id, self.max_id)]
+        else:
+            self.block_length = max(sample_size // get_setting("BLOCKS"), 1)
+            self.population = span // self.block_length
+            number = min(get_setting("BLOCKS"), self.population)
+            self.blocks = [
+                (
+                    self.min_id + i * self.block_length,
+                    self.min_id + (i + 1) * self.block_length - 1
+                ) for i in sorted(rand.sample(range(self.population), number))
+            ]
+
+    @classmethod
+    def of(cls, qs, rand=None):
+        ids = qs.aggregate(min_id=Min("id"), max_id=Max("id"))
+        return cls(ids["min_id"], ids["max_id"], rand=rand)
+
+    @property
+    def span(self):
+        return self.max_id - self.min_id + 1
+
+    @property
+    def fraction(self):
+        if self.population == 1:
+            return 1
+        return float(len(self.blocks)) / self.population
+
+    def is_exact(self):
+        return self.fraction == 1
+
+    def q(self, lookup="id"):
+        result = Q()
+        for start, end in self.blocks:
+            result |= Q(**{"{}__range".format(lookup): (start, end)})
+        return result
+
+    def filter(self, qs, lookup="id"):
+        return qs.filter(self.q(lookup))
+
+
+def is_large(subrecord):
+    ids = subrecord.objects.aggregate(min_id=Min("id"), max_id=Max("id"))
+    if ids["min_id"] is None:
+        return False
+    return ids["max_id"] - ids["min_id"] + 1 >= get_setting("THRESHOLD")
+
+
+def estimate_total(qs, sample):
+    """
+    Estimates the number of distinct rows of qs from the rows
+    in each block of the sample, with one query that only reads
+    the sampled rows.
+    """
+    aggregates = {
+        "block_{}".format(index): Count(
+            Case(When(id__range=block, then="id")), distinct=True
+        ) for index, block in enumerate(sample.blocks)
+    }
+    found = sample.filter(qs).aggregate(**aggregates)
+    counts = [found["block_{}".format(i)] for i in range(len(sample.blocks))]
+
+    if sample.is_exact():
+        return Estimate(sum(counts), 0)
+
+    n = len(counts)
+    mean = float(sum(counts)) / n
+    variance = sum((i - mean) ** 2 for i in counts) / max(n - 1, 1)
+    finite_population = 1 - float(n) / sample.population
+    error = sample.population * math.sqrt(
+        variance / n * finite_population
+    )
+    return Estimate(
+        int(round(mean * sample.population)), int(math.ceil(Z * error))
+    )
+
+
+def estimate_percentage(hits, sample_size, fraction):
+    """
+    Estimates a percentage from hits out of a simple random sample
+    """
+    if not sample_size:
+        return Estimate(0, 0)
+    proportion = float(hits) / sample_size
+    value = round(proportion * 100, 2)
+    if fraction >= 1:
+        return Estimate(value, 0)
+    error = Z * math.sqrt(
+        proportion * (1 - proportion) / sample_size * (1 - fraction)
+    )
+    return Estimate(value, round(error * 100, 2))
+
+
+def get_summary_row(subrecord, episode_qs, rand=None):
+    """
+    The approximate equivalent of a row of
+    overview_utils.get_subrecord_summary_rows.
+
+    The total is estimated from random ranges of the subrecord's ids,
+    the percentage of episodes that use it from random ranges of
+    episode ids.
+    """
+    populated = overview_utils.get_populated(subrecord, episode_qs)
+    total = estimate_total(populated, IdSample.of(subrecord.objects, rand))
+
+    episode_sample = IdSample.of(omodels.Episode.objects, rand)
+    sampled_episodes = episode_sample.filter(episode_qs)
+    sampled_count = sampled_episodes.count()
+    hits = overview_utils.get_subrecord_aggregates(
+        subrecord, sampled_episodes
+    )["episodes"]
+    return (
+        subrecord,
+        total,
+        estimate_percentage(hits, sampled_count, episode_sample.fraction),
+    )
+
+
+def get_subrecord_summary_rows(subrecord_models, episode_qs, rand=None):
+    """
+    overview_utils.get_subrecord_summary_rows where large subrecords
+    are approximated.
+    """
+    subrecord_models = list(subrecord_models)
+    large = [i for i in subrecord_models if is_large(i)]
+    rows = overview_utils.get_subrecord_summary_rows(
+        [i for i in subrecord_models if i not in large], episode_qs
+    )
+    rows.extend(get_summary_row(i, episode_qs, rand=rand) for i in large)
+    return overview_utils.sort_summary_rows(rows)
+
+
+def get_top_uncoded(qs, free_text_field_name, amount, rand=None):
+    """
+    Estimates the most common free text values from a sample
+    of the rows, as a list of (value, Estimate)
+    """
+    sample = IdSample.of(qs.model.objects, rand)
+    top_ft = sample.filter(qs).filter(
+        **{"{}__gt".format(free_text_field_name): ''}
+    )
+    top_ft = top_ft.annotate(lower_ft_field=Lower(free_text_field_name))
+    top_ft = top_ft.values("lower_ft_field").annotate(
+        counted_ft_field=Count("id", distinct=True)
+    ).order_by("-counted_ft_field")[:amount]
+
+    fraction = sample.fraction
+    result = []
+    for row in top_ft:
+        count = row["counted_ft_field"]
+        if fraction >= 1:
+            estimate = Estimate(count, 0)
+        else:
+            estimate = Estimate(
+                int(round(count / fraction)),
+                int(math.ceil(Z * math.sqrt(count * (1 - fraction)) / fraction))
+            )
+        result.append((row["lower_ft_field"], estimate))
+    return result
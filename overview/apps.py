@@ -0,0 +1,17 @@
+"""
+App config for the overview Opal plugin
+"""
+from django.apps import AppConfig
+
+
+class OverviewConfig(AppConfig):
+    name = "overview"
+
+    def ready(self):
+        # database registers the check of OVERVIEW_DATABASE
+        from overview import cache, counters, database  # noqa
+        # data versions are only cached if the cache is enabled,
+        # which tests may change after the app is ready
+        cache.connect()
+        if counters.is_enabled():
+            counters.connect()
@@ -0,0 +1,194 @@
+"""
+Benchmarks the overview pages against synthetic data.
+
+The data uses the models in opal.tests.models, so opal.tests must be
+installed, see runbenchmarks.py. Rows are bulk created with explicit
+ids so it should be run against a throwaway database.
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from opal.core import subrecords
+from opal import models as omodels
+from opal.tests import models as test_models
+
+from overview import overview_utils, views
+from overview.field_overviews import fk_or_ft
+
+DOGS = [
+    "Alsation", "alsation", "Basset", "Beagle", "Collie", "Dachshund",
+    "Greyhound", "Husky", "Labrador", "Poodle", "Spaniel", "Whippet",
+]
+CATEGORIES = ["Inpatient", "Outpatient", "Day Case"]
+TAGS = ["heroes", "villains", "sidekicks"]
+BATCH_SIZE = 1000
+
+
+def bulk_create(model, instances):
+    model.objects.bulk_create(instances, batch_size=BATCH_SIZE)
+
+
+def generate(episodes, episodes_per_patient=2, seed=0):
+    """
+    Creates the patients and episodes, episode and patient singletons
+    (populated for about half), a tag for a third of episodes, and
+    episode and patient subrecords including foreign key or free text
+    fields, with a fixed random seed.
+    """
+    rand = random.Random(seed)
+    now = timezone.now()
+    patient_count = max(episodes // episodes_per_patient, 1)
+    first_patient_id = (
+        omodels.Patient.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first() or 0
+    ) + 1
+    bulk_create(omodels.Patient, [
+        omodels.Patient(id=first_patient_id + i) for i in range(patient_count)
+    ])
+    patient_ids = list(range(first_patient_id, first_patient_id + patient_count))
+
+    first_episode_id = (
+        omodels.Episode.objects.order_by("-id").values_list(
+            "id", flat=True
+        ).first() or 0
+    ) + 1
+    episode_patients = [
+        (first_episode_id + i, patient_ids[i % patient_count])
+        for i in range(episodes)
+    ]
+    bulk_create(omodels.Episode, [
+        omodels.Episode(
+            id=episode_id,
+            patient_id=patient_id,
+            category_name=rand.choice(CATEGORIES),
+            created=now
+        ) for episode_id, patient_id in episode_patients
+    ])
+
+    def updated():
+        return now if rand.random() < 0.5 else None
+
+    bulk_create(test_models.EpisodeName, [
+        test_models.EpisodeName(
+            episode_id=episode_id, updated=updated(), name="episode"
+        ) for episode_id, _ in episode_patients
+    ])
+    bulk_create(test_models.FavouriteColour, [
+        test_models.FavouriteColour(
+            patient_id=patient_id, updated=updated(), name="blue"
+        ) for patient_id in patient_ids
+    ])
+    bulk_create(omodels.Tagging, [
+        omodels.Tagging(episode_id=episode_id, value=rand.choice(TAGS))
+        for episode_id, _ in episode_patients if rand.random() < 0.33
+    ])
+
+    hound_owners = []
+    for episode_id, _ in episode_patients:
+        for _ in range(rand.randint(0, 3)):
+            hound_owner = test_models.HoundOwner(
+                episode_id=episode_id, created=now
+            )
+            hound_owner.dog_ft = rand.choice(DOGS + [""])
+            hound_owners.append(hound_owner)
+    bulk_create(test_models.HoundOwner, hound_owners)
+
+    bulk_create(test_models.FavouriteNumber, [
+        test_models.FavouriteNumber(
+            patient_id=patient_id,
+            number=rand.choice([None, rand.randint(0, 100)]),
+            created=now
+        )
+        for patient_id in patient_ids for _ in range(rand.randint(0, 2))
+    ])
+
+
+def get_user():
+    user, _ = User.objects.get_or_create(
+        username="overview_benchmark", defaults=dict(is_superuser=True)
+    )
+    return user
+
+
+def render_view(view_class, **kwargs):
+    request = RequestFactory().get("/")
+    request.user = get_user()
+    response = view_class.as_view()(request, **kwargs)
+    response.render()
+    return response
+
+
+def measure(name, func, repeat=3):
+    """
+    Runs func repeat times, returning the query count of the first
+    run and the best and mean wall times.
+    """
+    timings = []
+    queries = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.time()
+            func()
+            timings.append(time.time() - started)
+        if queries is None:
+            queries = len(captured.captured_queries)
+    return dict(
+        name=name,
+        queries=queries,
+        best=round(min(timings), 4),
+        mean=round(sum(timings) / len(timings), 4),
+    )
+
+
+def run(repeat=3):
+    """
+    Times the list view, a detail view and get_top_ft.
+    """
+    episode_qs = omodels.Episode.objects.all()
+    hound_owner = test_models.HoundOwner
+    return [
+        measure(
+            "subrecord_summary_rows",
+            lambda: overview_utils.get_subrecord_summary_rows(
+                subrecords.subrecords(), episode_qs
+            ),
+            repeat=repeat
+        ),
+        measure(
+            "list_view",
+            lambda: render_view(views.OverviewSubrecordListView),
+            repeat=repeat
+        ),
+        measure(
+            "detail_view",
+            lambda: render_view(
+                views.OverviewDetailView,
+                api_name=hound_owner.get_api_name()
+            ),
+            repeat=repeat
+        ),
+        measure(
+            "get_top_ft",
+            lambda: fk_or_ft.get_top_ft(
+                overview_utils.get_subrecord_use(hound_owner, episode_qs),
+                "dog",
+                episode_qs
+            ),
+            repeat=repeat
+        ),
+    ]
+
+
+def get_report(results):
+    return dict(
+        database=connection.vendor,
+        episodes=omodels.Episode.objects.count(),
+        patients=omodels.Patient.objects.count(),
+        results=results,
+    )
@@ -0,0 +1,287 @@
+"""
+Caches overview computations with the Django cache framework.
+
+Configured with the OVERVIEW_CACHE setting, eg
+
+    OVERVIEW_CACHE = {
+        "ENABLED": True,
+        # the alias in settings.CACHES, set OPTIONS MAX_ENTRIES
+        # on it to bound the number of cached results
+        "CACHE_ALIAS": "overview",
+        # seconds, None caches forever
+        "TIMEOUT": 300,
+        # include overview_utils.get_data_version, and the episode
+        # data version, in keys so that results are recalculated
+        # as soon as the data changes
+        "USE_DATA_VERSION": True,
+        # seconds a data version is cached for, saves and deletes
+        # throw it away at once, this bounds how long changes that
+        # bypass signals, eg queryset.update(), go unnoticed
+        "VERSION_TIMEOUT": 60,
+    }
+
+Results are keyed by the name of the computation, the subrecord, the
+field, the querysets it was computed from and the data version, which
+is read once per memoised_versions block. Data versions are cached
+too, so a cached result costs no queries of the subrecord tables. Use
+invalidate() to throw away cached results explicitly.
+"""
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.db.models.sql.datastructures import EmptyResultSet
+
+DEFAULTS = dict(
+    ENABLED=False,
+    CACHE_ALIAS="default",
+    TIMEOUT=300,
+    USE_DATA_VERSION=True,
+    VERSION_TIMEOUT=60,
+)
+
+GENERATION_KEY = "overview:generation:{}"
+VERSION_KEY = "overview:data_version:{}"
+ALL = "__all__"
+# the scope of the episode data version
+EPISODES = "__episodes__"
+DISPATCH_UID = "overview_cache_{}"
+
+_local = threading.local()
+
+
+def get_setting(name):
+    return getattr(settings, "OVERVIEW_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def is_enabled():
+    return get_setting("ENABLED")
+
+
+def get_cache():
+    return caches[get_setting("CACHE_ALIAS")]
+
+
+def get_queryset_key(qs):
+    """
+    Querysets are identified by their SQL, so an episode
+    queryset filtered by category is a different key to one
+    filtered by tag or all episodes.
+    """
+    try:
+        return str(qs.query)
+    except EmptyResultSet:
+        return "none"
+
+
+def get_generations(*scopes):
+    keys = [GENERATION_KEY.format(i) for i in scopes]
+    found = get_cache().get_many(keys)
+    return [str(found.get(i, 0)) for i in keys]
+
+
+def invalidate(subrecord=None):
+    """
+    Invalidates the cached results for a subrecord,
+    or for everything if no subrecord is passed.
+    """
+    if subrecord is None:
+        scope = ALL
+    else:
+        scope = subrecord.get_api_name()
+    key = GENERATION_KEY.format(scope)
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+@contextmanager
+def memoised_versions(versions=None):
+    """
+    Reads each data version once in the block, eg a request or a
+    background job, rather than once per key.
+
+    Worker threads pass in the versions of the thread that started
+    them, see get_memoised_versions. Nested blocks use the outer
+    block's versions.
+    """
+    if get_memoised_versions() is not None:
+        yield
+        return
+    _local.versions = {} if versions is None else versions
+    try:
+        yield
+    finally:
+        _local.versions = None
+
+
+def get_memoised_versions():
+    return getattr(_local, "versions", None)
+
+
+def get_stored_version(key, calculate):
+    """
+    The cached data version for key, calculating and caching it
+    if there is none
+    """
+    if not is_enabled():
+        return calculate()
+    cache = get_cache()
+    version_key = VERSION_KEY.format(key or EPISODES)
+    version = cache.get(version_key)
+    if version is None:
+        version = calculate()
+        cache.set(version_key, version, get_setting("VERSION_TIMEOUT"))
+    return version
+
+
+def forget_versions(*keys):
+    """
+    Throws away the cached data versions for keys, a key of
+    None is the episode data version
+    """
+    if is_enabled():
+        get_cache().delete_many([
+            VERSION_KEY.format(i or EPISODES) for i in keys
+        ])
+
+
+def get_memoised_version(key, calculate):
+    """
+    The memoised data version for key, reading it if
+    there is none or versions are not being memoised
+    """
+    versions = get_memoised_versions()
+    if versions is None:
+        return get_stored_version(key, calculate)
+    if key not in versions:
+        versions[key] = get_stored_version(key, calculate)
+    return versions[key]
+
+
+def on_subrecord_change(sender, **kwargs):
+    forget_versions(sender.get_api_name())
+
+
+def on_episode_change(sender, **kwargs):
+    """
+    The versions of patient subrecords count their patients' episodes
+    """
+    from opal.core import subrecords
+    forget_versions(None, *[
+        i.get_api_name() for i in subrecords.patient_subrecords()
+    ])
+
+
+def on_tagging_change(sender, **kwargs):
+    forget_versions(None)
+
+
+def connect():
+    """
+    Throws away the cached data versions when subrecords,
+    episodes or tags are saved or deleted
+    """
+    from opal.core import subrecords
+    from opal import models as omodels
+    receivers = [(i, on_subrecord_change) for i in subrecords.subrecords()]
+    receivers.append((omodels.Episode, on_episode_change))
+    receivers.append((omodels.Tagging, on_tagging_change))
+    for sender, receiver in receivers:
+        uid = DISPATCH_UID.format(sender.__name__)
+        post_save.connect(receiver, sender=sender, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=sender, dispatch_uid=uid)
+
+
+def get_key(
+    name, subrecord=None, field_name=None, querysets=(), use_data_version=True
+):
+    from overview.overview_utils import (
+        get_data_version, get_episode_data_version
+    )
+
+    scopes = [ALL]
+    if subrecord is not None:
+        scopes.append(subrecord.get_api_name())
+    parts = [name] + scopes + get_generations(*scopes)
+
+    use_data_version = use_data_version and get_setting("USE_DATA_VERSION")
+    if subrecord is not None and use_data_version:
+        parts.append(get_data_version(subrecord))
+    if (subrecord is None or querysets) and use_data_version:
+        # results of episodes change as episodes are added, edited or tagged
+        parts.append(get_episode_data_version())
+    if field_name is not None:
+        parts.append(field_name)
+    parts.extend(get_queryset_key(i) for i in querysets)
+    digest = hashlib.md5("|".join(parts).encode("utf8")).hexdigest()
+    return "overview:{}:{}".format(name, digest)
+
+
+def get_or_compute(
+    name, compute, subrecord=None, field_name=None, querysets=()
+):
+    """
+    Returns the cached result of compute(), calling it and
+    caching the result if there is none.
+    """
+    if not is_enabled():
+        return compute()
+    cache = get_cache()
+    key = get_key(
+        name,
+        subrecord=subrecord,
+        field_name=field_name,
+        querysets=querysets
+    )
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, get_setting("TIMEOUT"))
+    return result
+
+
+def get_permanent(name, suffixes, subrecord=None, querysets=()):
+    """
+    Results that are cached forever, eg the statistics of a month that
+    has passed, keyed by name and each of the suffixes.
+
+    They are not keyed by the data version so are only thrown away
+    by invalidate(). Returns a dict of suffix to result for the
+    suffixes that are cached.
+    """
+    if not is_enabled():
+        return {}
+    keys = {
+        get_key(
+            name,
+            subrecord=subrecord,
+            field_name=suffix,
+            querysets=querysets,
+            use_data_version=False
+        ): suffix for suffix in suffixes
+    }
+    found = get_cache().get_many(list(keys.keys()))
+    return {keys[key]: value for key, value in found.items()}
+
+
+def set_permanent(name, results, subrecord=None, querysets=()):
+    """
+    Caches a dict of suffix to result forever, see get_permanent
+    """
+    if not is_enabled():
+        return
+    get_cache().set_many({
+        get_key(
+            name,
+            subrecord=subrecord,
+            field_name=suffix,
+            querysets=querysets,
+            use_data_version=False
+        ): value for suffix, value in results.items()
+    }, None)
@@ -0,0 +1,337 @@
+"""
+Groups the free text values of a ForeignKeyOrFreeText field that are
+probably the same thing, eg "Penicilin" and "penicillin ", and
+suggests the lookup list value they should be coded as.
+
+Configured with the OVERVIEW_CLUSTERING setting, eg
+
+    OVERVIEW_CLUSTERING = {
+        # the most characters two values can differ by and be grouped,
+        # shorter values are allowed a quarter of their length
+        "MAX_DISTANCE": 2,
+    }
+
+Values are normalised (trimmed, lower cased, accents and punctuation
+removed) then grouped with the first value within the edit distance,
+found through an index of their trigrams. The index for each field is
+built once per process from the distinct values of the column and
+brought up to date with the rows added since, it is rebuilt if rows
+have been edited or deleted. Each field's index has its own lock, which
+is only held to change the index in memory, never while querying.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from overview import fields, planner
+from overview.profiling import profiled
+
+DEFAULTS = dict(
+    MAX_DISTANCE=2,
+)
+
+GRAM_LENGTH = 3
+
+_indexes = {}
+# a lock for each (api name, field name), created under _locks_lock
+_locks = defaultdict(threading.Lock)
+_locks_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(
+        settings, "OVERVIEW_CLUSTERING", {}
+    ).get(name, DEFAULTS[name])
+
+
+def normalise(value):
+    """
+    Lower cases a value and removes accents, punctuation and
+    repeated whitespace
+    """
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(i for i in value if not unicodedata.combining(i))
+    value = re.sub(r"[^\w\s]", " ", value.lower(), flags=re.UNICODE)
+    return " ".join(value.split())
+
+
+def get_max_distance(value):
+    return min(get_setting("MAX_DISTANCE"), len(value) // 4)
+
+
+def get_grams(value):
+    padded = "{}{}{}".format(
+        " " * (GRAM_LENGTH - 1), value, " " * (GRAM_LENGTH - 1)
+    )
+    return {
+        padded[i:i + GRAM_LENGTH]
+        for i in range(len(padded) - GRAM_LENGTH + 1)
+    }
+
+
+def edit_distance(a, b, max_distance):
+    """
+    The Levenshtein distance between a and b, or max_distance + 1
+    as soon as it is known to be more than max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, 1):
+        current = [i]
+        for j, b_char in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a_char != b_char)
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex(object):
+    """
+    Finds the closest of a set of strings within an edit distance,
+    comparing only those that share enough trigrams to be close.
+    """
+    def __init__(self):
+        self.postings = defaultdict(set)
+
+    def add(self, value):
+        for gram in get_grams(value):
+            self.postings[gram].add(value)
+
+    def find(self, value, max_distance):
+        """
+        Returns the closest value and its distance, or (None, None)
+        """
+        grams = get_grams(value)
+        # each edit changes at most GRAM_LENGTH grams
+        required = len(grams) - GRAM_LENGTH * max_distance
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        best, best_distance = None, None
+        for candidate, count in shared.items():
+            if count < required:
+                continue
+            distance = edit_distance(value, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            if best is None or (distance, candidate) < (best_distance, best):
+                best, best_distance = candidate, distance
+        return best, best_distance
+
+
+class LookupMatcher(object):
+    """
+    Matches normalised values to the names and synonyms
+    of a lookup list
+    """
+    def __init__(self, lookup_list):
+        self.names = {}
+        self.index = TrigramIndex()
+        for name, synonym in lookup_list.objects.values_list(
+            "name", "synonyms__name"
+        ):
+            for value in (name, synonym):
+                if value:
+                    normalised = normalise(value)
+                    self.names.setdefault(normalised, name)
+                    self.index.add(normalised)
+        self.matches = {}
+
+    def match(self, value):
+        """
+        The lookup list name that the value should be coded as, or None
+        """
+        if value not in self.matches:
+            if value in self.names:
+                self.matches[value] = self.names[value]
+            else:
+                found, _ = self.index.find(value, get_max_distance(value))
+                self.matches[value] = self.names.get(found)
+        return self.matches[value]
+
+
+class Cluster(object):
+    def __init__(self, members, suggestion):
+        # a list of (value, count), most common first
+        self.members = members
+        self.suggestion = suggestion
+
+    @property
+    def name(self):
+        return self.members[0][0]
+
+    @property
+    def count(self):
+        return sum(i[1] for i in self.members)
+
+
+class FieldIndex(object):
+    """
+    The distinct free text values of a field, their counts and
+    the cluster each normalised value belongs to.
+    """
+    def __init__(self, model, field_name):
+        self.model = model
+        self.field_name = field_name
+        self.free_text_field_name = "{}_ft".format(field_name)
+        self.lookup = LookupMatcher(
+            model._meta.get_field("{}_fk".format(field_name)).related_model
+        )
+        self.counts = Counter()
+        self.normalised = {}
+        self.cluster_of = {}
+        self.heads = TrigramIndex()
+        self.version = dict(count=0, max_id=None, max_updated=None)
+
+    def get_version(self):
+        return self.model.objects.aggregate(
+            count=Count("id"), max_id=Max("id"), max_updated=Max("updated")
+        )
+
+    def get_value_counts(self, qs):
+        """
+        The count of each distinct free text value, grouped in the
+        database so only distinct values are sent to us
+        """
+        return qs.exclude(**{self.free_text_field_name: ""}).exclude(
+            **{"{}__isnull".format(self.free_text_field_name): True}
+        ).values_list(self.free_text_field_name).annotate(
+            Count("id")
+        ).order_by().iterator()
+
+    def add(self, value, count):
+        if value not in self.normalised:
+            normalised = normalise(value)
+            self.normalised[value] = normalised
+            if normalised and normalised not in self.cluster_of:
+                head, _ = self.heads.find(
+                    normalised, get_max_distance(normalised)
+                )
+                if head is None:
+                    head = normalised
+                    self.heads.add(head)
+                self.cluster_of[normalised] = head
+        self.counts[value] += count
+
+    @profiled("cluster_index", lambda self: self.model.get_api_name())
+    def read_changes(self):
+        """
+        The rows created since the index was last refreshed, as the
+        version they were read from, the new version and their value
+        counts. Returns None if the index has to be rebuilt instead.
+
+        Only reads from the database, so the index's lock is not held.
+        """
+        base = self.version
+        version = self.get_version()
+        qs = self.model.objects.all()
+        if base["max_id"] is not None:
+            if version["max_updated"] != base["max_updated"]:
+                return None
+            qs = qs.filter(id__gt=base["max_id"])
+            if version["count"] != base["count"] + qs.count():
+                return None
+        return base, version, list(self.get_value_counts(qs))
+
+    def apply_changes(self, changes):
+        base, version, value_counts = changes
+        if self.version is not base:
+            # another thread has already brought the index up to date
+            return
+        for value, count in value_counts:
+            self.add(value, count)
+        self.version = version
+
+    def refresh(self):
+        """
+        Adds the rows created since the index was last refreshed,
+        returns False if the index has to be rebuilt instead
+        """
+        changes = self.read_changes()
+        if changes is None:
+            return False
+        self.apply_changes(changes)
+        return True
+
+    def get_clusters(self, value_counts=None):
+        """
+        The clusters of values, most common first.
+
+        value_counts defaults to the counts over every row
+        """
+        if value_counts is None:
+            value_counts = self.counts.items()
+        members = defaultdict(Counter)
+        for value, count in value_counts:
+            if value not in self.normalised:
+                self.add(value, 0)
+            normalised = self.normalised[value]
+            if normalised:
+                members[self.cluster_of[normalised]][value] += count
+
+        clusters = []
+        for head, counter in members.items():
+            clusters.append(Cluster(
+                sorted(counter.items(), key=lambda x: (-x[1], x[0])),
+                self.lookup.match(head)
+            ))
+        return sorted(clusters, key=lambda x: (-x.count, x.name))
+
+
+def get_lock(model, field_name):
+    with _locks_lock:
+        return _locks[(model.get_api_name(), field_name)]
+
+
+def get_index(model, field_name):
+    """
+    The up to date FieldIndex of a field, built the first time
+    it is asked for in this process
+    """
+    key = (model.get_api_name(), field_name)
+    lock = get_lock(model, field_name)
+    index = _indexes.get(key)
+    changes = None
+    if index is not None:
+        changes = index.read_changes()
+    if changes is None:
+        # no other thread can see the new index until it is swapped in
+        rebuilt = FieldIndex(model, field_name)
+        rebuilt.refresh()
+        with lock:
+            if _indexes.get(key) is index:
+                _indexes[key] = rebuilt
+            return _indexes[key]
+    with lock:
+        index.apply_changes(changes)
+    return index
+
+
+def get_clusters(model, field_name, episode_qs=None, amount=None):
+    """
+    The clusters of the free text values of a field, optionally
+    counting only the rows of episode_qs
+    """
+    index = get_index(model, field_name)
+    value_counts = None
+    if episode_qs is not None and not planner.is_unrestricted(episode_qs):
+        value_counts = list(index.get_value_counts(
+            fields.get_model_qs(episode_qs, model)
+        ))
+    # clustering adds unseen values to the shared index
+    with get_lock(model, field_name):
+        clusters = index.get_clusters(value_counts)
+    if amount is not None:
+        clusters = clusters[:amount]
+    return clusters
@@ -0,0 +1,117 @@
+"""
+Which fields of a subrecord are populated together.
+
+Each row is reduced to a bitmask of its populated fields in the
+database, rows are grouped by their bitmask and only the distinct
+patterns and their counts are read, so a subrecord costs one query
+however many fields it has. The co-occurrence of every pair of fields
+is then summed from the patterns.
+
+Many to many fields would multiply the rows so are left out.
+"""
+from functools import partial
+
+from django.db.models import Count, Case, When, Value, IntegerField
+
+from overview import cache, fields
+from overview.profiling import profiled
+
+
+def get_field_names(subrecord):
+    return [
+        i for i in fields.get_field_names(subrecord)
+        if not fields.is_many_to_many(subrecord, i)
+    ]
+
+
+def get_populated_flag(model, field_name):
+    return Case(
+        When(then=Value(0), **fields.get_empty_lookups(model, field_name)),
+        default=Value(1),
+        output_field=IntegerField()
+    )
+
+
+def get_bits(mask, size):
+    """
+    The indexes of the bits set in a mask
+    """
+    return [i for i in range(size) if mask >> i & 1]
+
+
+class Completeness(object):
+    """
+    The counts of each pattern of populated fields of a subrecord.
+
+    patterns is a dict of bitmask to count, where bit i is
+    set if field_names[i] is populated.
+    """
+    def __init__(self, field_names, patterns):
+        self.field_names = field_names
+        self.patterns = patterns
+
+    @property
+    def total(self):
+        return sum(self.patterns.values())
+
+    def get_matrix(self):
+        """
+        matrix[i][j] is the number of rows where both field i and field j
+        are populated, matrix[i][i] the rows where field i is.
+        """
+        size = len(self.field_names)
+        matrix = [[0] * size for _ in range(size)]
+        for mask, count in self.patterns.items():
+            bits = get_bits(mask, size)
+            for i in bits:
+                row = matrix[i]
+                for j in bits:
+                    row[j] += count
+        return matrix
+
+    def get_top_patterns(self, amount=10):
+        """
+        The most common patterns as a list of
+        (count, [whether each field is populated])
+        """
+        size = len(self.field_names)
+        top = sorted(self.patterns.items(), key=lambda x: (-x[1], x[0]))
+        return [
+            (count, [bool(mask >> i & 1) for i in range(size)])
+            for mask, count in top[:amount]
+        ]
+
+
+@profiled(
+    "completeness", lambda episodes, model, *args: model.get_api_name()
+)
+def calculate_completeness(episodes, model, field_names):
+    qs = fields.get_model_qs(episodes, model)
+    if not field_names:
+        return Completeness(field_names, {0: qs.count()})
+    flags = {
+        "populated_{}".format(index): get_populated_flag(model, field_name)
+        for index, field_name in enumerate(field_names)
+    }
+    rows = qs.annotate(**flags).values(
+        *flags.keys()
+    ).annotate(count=Count("id")).order_by()
+
+    patterns = {}
+    for row in rows.iterator():
+        mask = 0
+        for index in range(len(field_names)):
+            if row["populated_{}".format(index)]:
+                mask |= 1 << index
+        patterns[mask] = patterns.get(mask, 0) + row["count"]
+    return Completeness(field_names, patterns)
+
+
+def get_completeness(episodes, model):
+    field_names = get_field_names(model)
+    return cache.get_or_compute(
+        "completeness",
+        partial(calculate_completeness, episodes, model, field_names),
+        subrecord=model,
+        querysets=[episodes]
+    )
@@ -0,0 +1,439 @@
+"""
+Running counters of subrecord use, kept up to date by signals.
+
+Enabled by settings.OVERVIEW_SIGNAL_COUNTERS. Counters are created
+by the overview_reconcile_counters command, until then, or if
+they do not exist for a subrecord, the views query as normal.
+
+Saves that bypass signals, eg queryset.update(), cause counters to
+drift, overview_reconcile_counters checks and repairs them.
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete
+)
+from opal.core import subrecords
+from opal import models as omodels
+
+from overview import fields, overview_utils
+from overview.models import SubrecordCounter, FieldCounter
+
+DISPATCH_UID = "overview_counters_{}"
+
+_local = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, "OVERVIEW_SIGNAL_COUNTERS", False)
+
+
+def get_counted_field_names(subrecord):
+    """
+    The fields that counters are kept for, many to many
+    fields are changed without saving the subrecord so are not counted.
+    """
+    result = []
+    for field_name in fields.get_field_names(subrecord):
+        field = subrecord._get_field(field_name)
+        if not getattr(field, "many_to_many", False):
+            result.append(field_name)
+    return result
+
+
+def get_field_columns(subrecord, field_name):
+    field = fields.get_field(None, subrecord, field_name)
+    if isinstance(field, fields.ForeignKeyOrFreeTextField):
+        return [
+            field.free_text_field_name, field.foreign_key_id_field_name
+        ]
+    return [field_name]
+
+
+def is_field_populated(subrecord, field_name, values):
+    """
+    Matches the definition of populated in fields.py, takes a dict of
+    column to value.
+    """
+    field = fields.get_field(None, subrecord, field_name)
+    if isinstance(field, fields.ForeignKeyOrFreeTextField):
+        return not (
+            values[field.free_text_field_name] == '' and
+            values[field.foreign_key_id_field_name] is None
+        )
+    return values[field_name] is not None
+
+
+def get_state(subrecord, values):
+    """
+    Whether the row is populated and which of its fields are
+    """
+    if subrecord._is_singleton:
+        populated = values["updated"] is not None
+    else:
+        populated = True
+    # the fields of an unpopulated singleton are its defaults
+    return dict(
+        populated=populated,
+        fields={
+            i: populated and is_field_populated(subrecord, i, values)
+            for i in get_counted_field_names(subrecord)
+        }
+    )
+
+
+def get_columns(subrecord):
+    columns = ["updated"]
+    for field_name in get_counted_field_names(subrecord):
+        columns.extend(get_field_columns(subrecord, field_name))
+    return columns
+
+
+def get_instance_state(instance):
+    subrecord = instance.__class__
+    values = {i: getattr(instance, i) for i in get_columns(subrecord)}
+    return get_state(subrecord, values)
+
+
+def get_saved_state(instance):
+    subrecord = instance.__class__
+    values = subrecord.objects.filter(pk=instance.pk).values(
+        *get_columns(subrecord)
+    ).first()
+    if values is None:
+        return None
+    return get_state(subrecord, values)
+
+
+def get_populated_siblings(instance, lookup, value):
+    """
+    The other populated subrecords that share an episode or patient
+    """
+    qs = overview_utils.get_all_populated(instance.__class__)
+    return qs.filter(**{lookup: value}).exclude(pk=instance.pk)
+
+
+def get_deleting():
+    """
+    The pks of the populated rows that a delete has removed but not
+    yet sent post_delete for, by (subrecord, lookup, value).
+
+    A queryset or cascading delete removes every row before sending
+    any post_delete, so the rows of an episode or patient are still
+    counted as used until the last of them has been signalled.
+    """
+    if not hasattr(_local, "deleting"):
+        _local.deleting = defaultdict(set)
+    return _local.deleting
+
+
+def get_owners(instance):
+    """
+    The (lookup, value) of the episode, if any, and the patient
+    of a subrecord
+    """
+    if hasattr(instance, "episode_id"):
+        patient_id = omodels.Episode.objects.filter(
+            id=instance.episode_id
+        ).values_list("patient_id", flat=True).first()
+        return [
+            ("episode_id", instance.episode_id),
+            ("episode__patient_id", patient_id),
+        ]
+    return [("patient_id", instance.patient_id)]
+
+
+def is_first(instance, lookup, value):
+    """
+    Whether a row is the only populated row of its episode or patient
+    """
+    if get_deleting().get((instance.__class__, lookup, value)):
+        return False
+    return not get_populated_siblings(instance, lookup, value).exists()
+
+
+def get_episodes_used(instance):
+    """
+    The number of episodes a subrecord is used by
+    """
+    if hasattr(instance, "episode_id"):
+        return 1
+    return omodels.Episode.objects.filter(
+        patient_id=instance.patient_id
+    ).count()
+
+
+def update_counter(subrecord, **deltas):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        SubrecordCounter.objects.filter(
+            api_name=subrecord.get_api_name()
+        ).update(**{k: F(k) + v for k, v in deltas.items()})
+
+
+def update_field_counters(subrecord, deltas):
+    for field_name, delta in deltas.items():
+        if delta:
+            FieldCounter.objects.filter(
+                subrecord_counter__api_name=subrecord.get_api_name(),
+                field_name=field_name
+            ).update(populated=F("populated") + delta)
+
+
+def apply_change(instance, previous, current, owners=None):
+    """
+    Applies the difference between two states of a row to the counters.
+    A state of None means the row does not exist.
+
+    owners defaults to the row's current episode and patient.
+    """
+    subrecord = instance.__class__
+    was_populated = bool(previous and previous["populated"])
+    is_populated = bool(current and current["populated"])
+    rows = int(current is not None) - int(previous is not None)
+    total = int(is_populated) - int(was_populated)
+    episodes = 0
+    patients = 0
+
+    if total:
+        if owners is None:
+            owners = get_owners(instance)
+        if len(owners) == 2:
+            is_first_for_episode = is_first(instance, *owners[0])
+        else:
+            is_first_for_episode = None
+        is_first_for_patient = is_first(instance, *owners[-1])
+
+        if is_first_for_patient:
+            patients = total
+        if is_first_for_episode or (
+            is_first_for_episode is None and is_first_for_patient
+        ):
+            episodes = total * get_episodes_used(instance)
+
+    update_counter(
+        subrecord,
+        rows=rows,
+        total=total,
+        episodes=episodes,
+        patients=patients
+    )
+    field_deltas = {}
+    for field_name in get_counted_field_names(subrecord):
+        was = bool(previous and previous["fields"][field_name])
+        now = bool(current and current["fields"][field_name])
+        field_deltas[field_name] = int(now) - int(was)
+    update_field_counters(subrecord, field_deltas)
+
+
+def on_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._overview_previous_state = None
+    if instance.pk:
+        instance._overview_previous_state = get_saved_state(instance)
+
+
+def on_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_overview_previous_state", None)
+    apply_change(instance, previous, get_instance_state(instance))
+
+
+def on_pre_delete(sender, instance, **kwargs):
+    """
+    Stores the episode and patient of a row, which a cascading
+    delete may remove before post_delete is sent, and marks it
+    as being deleted.
+    """
+    instance._overview_owners = get_owners(instance)
+    if get_instance_state(instance)["populated"]:
+        for lookup, value in instance._overview_owners:
+            get_deleting()[(sender, lookup, value)].add(instance.pk)
+
+
+def on_post_delete(sender, instance, **kwargs):
+    owners = getattr(instance, "_overview_owners", None)
+    deleting = get_deleting()
+    for lookup, value in owners or []:
+        key = (sender, lookup, value)
+        deleting[key].discard(instance.pk)
+        if not deleting[key]:
+            del deleting[key]
+    apply_change(instance, get_instance_state(instance), None, owners)
+
+
+def on_episode_post_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    A new episode is used by the patient subrecords its patient has
+    """
+    if raw or not created:
+        return
+    update_patient_subrecord_episodes(instance, 1)
+
+
+def on_episode_post_delete(sender, instance, **kwargs):
+    update_patient_subrecord_episodes(instance, -1)
+
+
+def update_patient_subrecord_episodes(episode, delta):
+    for subrecord in subrecords.patient_subrecords():
+        qs = overview_utils.get_all_populated(subrecord)
+        if qs.filter(patient_id=episode.patient_id).exists():
+            update_counter(subrecord, episodes=delta)
+
+
+def connect():
+    for subrecord in subrecords.subrecords():
+        uid = DISPATCH_UID.format(subrecord.get_api_name())
+        pre_save.connect(on_pre_save, sender=subrecord, dispatch_uid=uid)
+        post_save.connect(on_post_save, sender=subrecord, dispatch_uid=uid)
+        pre_delete.connect(on_pre_delete, sender=subrecord, dispatch_uid=uid)
+        post_delete.connect(
+            on_post_delete, sender=subrecord, dispatch_uid=uid
+        )
+    uid = DISPATCH_UID.format("episode")
+    post_save.connect(
+        on_episode_post_save, sender=omodels.Episode, dispatch_uid=uid
+    )
+    post_delete.connect(
+        on_episode_post_delete, sender=omodels.Episode, dispatch_uid=uid
+    )
+
+
+def disconnect():
+    for subrecord in subrecords.subrecords():
+        uid = DISPATCH_UID.format(subrecord.get_api_name())
+        pre_save.disconnect(sender=subrecord, dispatch_uid=uid)
+        post_save.disconnect(sender=subrecord, dispatch_uid=uid)
+        pre_delete.disconnect(sender=subrecord, dispatch_uid=uid)
+        post_delete.disconnect(sender=subrecord, dispatch_uid=uid)
+    uid = DISPATCH_UID.format("episode")
+    post_save.disconnect(sender=omodels.Episode, dispatch_uid=uid)
+    post_delete.disconnect(sender=omodels.Episode, dispatch_uid=uid)
+
+
+def recount(subrecord):
+    """
+    Counts from scratch what the counters for a subrecord should be
+    """
+    episode_qs = omodels.Episode.objects.all()
+    aggregates = overview_utils.get_subrecord_aggregates(
+        subrecord, episode_qs
+    )
+    if subrecord in subrecords.episode_subrecords():
+        patient_lookup = "episode__patient_id"
+    else:
+        patient_lookup = "patient_id"
+    patients = overview_utils.get_populated(
+        subrecord, episode_qs
+    ).aggregate(patients=Count(patient_lookup, distinct=True))["patients"]
+    field_counts = {}
+    for field_name in get_counted_field_names(subrecord):
+        field = fields.get_field(episode_qs, subrecord, field_name)
+        field_counts[field_name] = field.total_populated()
+    return dict(
+        rows=subrecord.objects.count(),
+        total=aggregates["total"],
+        episodes=aggregates["episodes"],
+        patients=patients,
+        fields=field_counts
+    )
+
+
+def get_counts(counter):
+    return dict(
+        rows=counter.rows,
+        total=counter.total,
+        episodes=counter.episodes,
+        patients=counter.patients,
+        fields={i.field_name: i.populated for i in counter.fields.all()}
+    )
+
+
+def reconcile(subrecord, repair=True):
+    """
+    Compares a subrecord's counters with a full recount.
+
+    Returns the drift as a dict of name to (counter, actual),
+    creating or repairing the counters if repair is True.
+    """
+    actual = recount(subrecord)
+    counter = SubrecordCounter.objects.filter(
+        api_name=subrecord.get_api_name()
+    ).first()
+    if counter is None:
+        counted = {}
+    else:
+        counted = get_counts(counter)
+
+    drift = {}
+    for key in ["rows", "total", "episodes", "patients"]:
+        if counted.get(key) != actual[key]:
+            drift[key] = (counted.get(key), actual[key])
+    for field_name, populated in actual["fields"].items():
+        counted_populated = counted.get("fields", {}).get(field_name)
+        if counted_populated != populated:
+            drift[field_name] = (counted_populated, populated)
+
+    if repair and drift:
+        if counter is None:
+            counter = SubrecordCounter(api_name=subrecord.get_api_name())
+        for key in ["rows", "total", "episodes", "patients"]:
+            setattr(counter, key, actual[key])
+        counter.save()
+        counter.fields.exclude(field_name__in=actual["fields"]).delete()
+        for field_name, populated in actual["fields"].items():
+            FieldCounter.objects.update_or_create(
+                subrecord_counter=counter,
+                field_name=field_name,
+                defaults=dict(populated=populated)
+            )
+    return drift
+
+
+def get_version(subrecord_models):
+    """
+    A token that changes whenever the counters of the subrecords
+    change, including when they are repaired by reconcile
+    """
+    if not is_enabled():
+        return ""
+    counts = SubrecordCounter.objects.filter(
+        api_name__in=[i.get_api_name() for i in subrecord_models]
+    ).order_by("api_name").values_list(
+        "api_name", "rows", "total", "episodes"
+    )
+    return "|".join(
+        "{}={}:{}:{}".format(*i) for i in counts
+    )
+
+
+def get_subrecord_summary_rows(subrecord_models, episode_qs):
+    """
+    The same rows as overview_utils.get_subrecord_summary_rows
+    but read from the counters.
+
+    Returns None unless counters are enabled and exist for
+    every subrecord.
+    """
+    if not is_enabled():
+        return None
+    counters = {i.api_name: i for i in SubrecordCounter.objects.all()}
+    if not all(i.get_api_name() in counters for i in subrecord_models):
+        return None
+
+    episode_count = episode_qs.count()
+    rows = []
+    for subrecord in subrecord_models:
+        counter = counters[subrecord.get_api_name()]
+        rows.append((
+            subrecord,
+            counter.total,
+            overview_utils.get_percentage(counter.episodes, episode_count),
+        ))
+    return overview_utils.sort_summary_rows(rows)
@@ -0,0 +1,215 @@
+"""
+The share of episodes and of patients that have a subrecord, and the
+mean number of rows per episode and per patient, calculated together.
+
+Rather than joining patient subrecords to every episode of a patient,
+the owner ids (episode or patient) of a subrecord's populated rows are
+read with one query into a sorted array of integers, which is kept in
+memory until the subrecord's data version changes. The episodes are
+read as sorted arrays of their ids and patient ids, and the statistics
+are counted by walking the arrays together.
+"""
+import threading
+from array import array
+
+from opal.core import subrecords
+
+from overview import overview_utils
+from overview.profiling import profiled
+
+_owner_ids = {}
+_lock = threading.Lock()
+
+
+def to_array(values):
+    return array("l", values)
+
+
+def get_runs(ids):
+    """
+    The distinct values of a sorted array and how many times each appears
+    """
+    distinct = array("l")
+    counts = []
+    for i in ids:
+        if distinct and distinct[-1] == i:
+            counts[-1] += 1
+        else:
+            distinct.append(i)
+            counts.append(1)
+    return distinct, counts
+
+
+def is_episode_subrecord(subrecord):
+    return subrecord in subrecords.episode_subrecords()
+
+
+@profiled("owner_ids", overview_utils.get_subrecord_label)
+def read_owner_ids(subrecord):
+    if is_episode_subrecord(subrecord):
+        owner = "episode_id"
+    else:
+        owner = "patient_id"
+    return to_array(
+        overview_utils.get_all_populated(subrecord).order_by(
+            owner
+        ).values_list(owner, flat=True).iterator()
+    )
+
+
+def get_owner_ids(subrecord):
+    """
+    The sorted episode or patient ids of every populated row of a
+    subrecord, one per row.
+    """
+    version = overview_utils.get_data_version(subrecord)
+    key = subrecord.get_api_name()
+    with _lock:
+        found = _owner_ids.get(key)
+    if found is not None and found[0] == version:
+        return found[1]
+    ids = read_owner_ids(subrecord)
+    with _lock:
+        _owner_ids[key] = (version, ids)
+    return ids
+
+
+class EpisodeSet(object):
+    """
+    The ids of some episodes, sorted, and the patient id of each
+    """
+    def __init__(self, episode_qs):
+        self.episode_ids = array("l")
+        self.patient_ids = array("l")
+        for episode_id, patient_id in episode_qs.order_by("id").values_list(
+            "id", "patient_id"
+        ).iterator():
+            if self.episode_ids and self.episode_ids[-1] == episode_id:
+                # repeated by a join, eg to tags
+                continue
+            self.episode_ids.append(episode_id)
+            self.patient_ids.append(patient_id)
+        self.patients = set(self.patient_ids)
+
+    def __len__(self):
+        return len(self.episode_ids)
+
+
+class Coverage(object):
+    def __init__(
+        self,
+        subrecord,
+        episodes,
+        patients,
+        covered_episodes,
+        covered_patients,
+        episode_rows,
+        patient_rows
+    ):
+        self.subrecord = subrecord
+        self.episodes = episodes
+        self.patients = patients
+        self.covered_episodes = covered_episodes
+        self.covered_patients = covered_patients
+        # rows counted once for each episode that has them
+        self.episode_rows = episode_rows
+        # rows counted once
+        self.patient_rows = patient_rows
+
+    @property
+    def episode_percentage(self):
+        return overview_utils.get_percentage(
+            self.covered_episodes, self.episodes
+        )
+
+    @property
+    def patient_percentage(self):
+        return overview_utils.get_percentage(
+            self.covered_patients, self.patients
+        )
+
+    @property
+    def mean_per_episode(self):
+        if not self.episodes:
+            return 0
+        return round(float(self.episode_rows) / self.episodes, 2)
+
+    @property
+    def mean_per_patient(self):
+        if not self.patients:
+            return 0
+        return round(float(self.patient_rows) / self.patients, 2)
+
+
+def get_episode_subrecord_coverage(subrecord, episode_set, owner_ids):
+    distinct, counts = get_runs(owner_ids)
+    episode_ids = episode_set.episode_ids
+    covered_episodes = 0
+    rows = 0
+    covered_patients = set()
+    i = j = 0
+    while i < len(distinct) and j < len(episode_ids):
+        if distinct[i] < episode_ids[j]:
+            i += 1
+        elif distinct[i] > episode_ids[j]:
+            j += 1
+        else:
+            covered_episodes += 1
+            rows += counts[i]
+            covered_patients.add(episode_set.patient_ids[j])
+            i += 1
+            j += 1
+    return Coverage(
+        subrecord,
+        len(episode_set),
+        len(episode_set.patients),
+        covered_episodes,
+        len(covered_patients),
+        rows,
+        rows
+    )
+
+
+def get_patient_subrecord_coverage(subrecord, episode_set, owner_ids):
+    distinct, counts = get_runs(owner_ids)
+    rows_by_patient = {
+        patient_id: count for patient_id, count in zip(distinct, counts)
+        if patient_id in episode_set.patients
+    }
+    covered_episodes = 0
+    episode_rows = 0
+    for patient_id in episode_set.patient_ids:
+        rows = rows_by_patient.get(patient_id)
+        if rows:
+            covered_episodes += 1
+            episode_rows += rows
+    return Coverage(
+        subrecord,
+        len(episode_set),
+        len(episode_set.patients),
+        covered_episodes,
+        len(rows_by_patient),
+        episode_rows,
+        sum(rows_by_patient.values())
+    )
+
+
+def get_coverage(subrecord, episode_set):
+    owner_ids = get_owner_ids(subrecord)
+    if is_episode_subrecord(subrecord):
+        return get_episode_subrecord_coverage(
+            subrecord, episode_set, owner_ids
+        )
+    return get_patient_subrecord_coverage(subrecord, episode_set, owner_ids)
+
+
+def get_coverages(subrecord_models, episode_qs):
+    """
+    The Coverage of each subrecord, sorted by display name,
+    reading the episodes once.
+    """
+    episode_set = EpisodeSet(episode_qs)
+    result = [get_coverage(i, episode_set) for i in subrecord_models]
+    return sorted(
+        result, key=lambda x: overview_utils.get_sort_name(x.subrecord)
+    )
@@ -0,0 +1,222 @@
+"""
+Runs overview queries against a read replica or reporting database.
+
+Configured with the OVERVIEW_DATABASE setting, eg
+
+    OVERVIEW_DATABASE = {
+        # the alias in settings.DATABASES that overview queries read from
+        "ALIAS": "replica",
+        # milliseconds a query may run for before it is cancelled,
+        # PostgreSQL and MySQL only, None for no limit
+        "STATEMENT_TIMEOUT": 30000,
+        # seconds a PostgreSQL replica may lag behind the primary
+        # before it is treated as unavailable, None to not check
+        "MAX_LAG": 300,
+    }
+
+and by adding the router to the host project's settings
+
+    DATABASE_ROUTERS = ["overview.database.OverviewRouter"]
+
+The router only sends reads made inside reading() to the alias, which
+the views, background jobs and export command use, so the rest of the
+application is unaffected. A system check warns if an ALIAS is set
+without the router, as it would be ignored. The overview's own tables, users and
+sessions are always read from the default database.
+
+If the database is unavailable, lagging or a query times out the views
+serve the last result of their background job, however old.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import checks
+from django.db import DatabaseError, OperationalError, connections
+from django.utils import six
+from django.utils.module_loading import import_string
+
+DEFAULTS = dict(
+    ALIAS="default",
+    STATEMENT_TIMEOUT=None,
+    MAX_LAG=None,
+)
+
+ROUTER = "overview.database.OverviewRouter"
+
+# apps whose reads are never sent to the overview database
+DEFAULT_DATABASE_APPS = {"overview", "auth", "sessions", "contenttypes"}
+
+TIMEOUT_SQL = {
+    "postgresql": (
+        "SET statement_timeout = %s", "RESET statement_timeout"
+    ),
+    "mysql": (
+        "SET SESSION max_execution_time = %s",
+        "SET SESSION max_execution_time = DEFAULT"
+    ),
+}
+
+# NULL on a primary, which is never lagging
+LAG_SQL = {
+    "postgresql": (
+        "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    ),
+}
+
+_local = threading.local()
+
+
+class Unavailable(Exception):
+    """
+    The overview database is too far behind the primary to be used
+    """
+
+
+# the errors that views fall back to stored results for
+UNAVAILABLE_ERRORS = (Unavailable, OperationalError)
+
+
+def get_setting(name):
+    return getattr(
+        settings, "OVERVIEW_DATABASE", {}
+    ).get(name, DEFAULTS[name])
+
+
+def get_alias():
+    return get_setting("ALIAS")
+
+
+def is_reading():
+    return getattr(_local, "reading", False)
+
+
+def get_lag(connection):
+    """
+    The seconds the database is behind its primary, or None
+    if it cannot tell
+    """
+    sql = LAG_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        lag = cursor.fetchone()[0]
+    if lag is None:
+        return 0
+    return float(lag)
+
+
+def check_lag(connection):
+    max_lag = get_setting("MAX_LAG")
+    if max_lag is None:
+        return
+    lag = get_lag(connection)
+    if lag is not None and lag > max_lag:
+        raise Unavailable(
+            "The {} database is {} seconds behind".format(
+                connection.alias, int(lag)
+            )
+        )
+
+
+def set_statement_timeout(connection, timeout):
+    sql = TIMEOUT_SQL.get(connection.vendor)
+    if sql is None or timeout is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(sql[0], [int(timeout)])
+
+
+def reset_statement_timeout(connection):
+    sql = TIMEOUT_SQL.get(connection.vendor)
+    if sql is None or get_setting("STATEMENT_TIMEOUT") is None:
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql[1])
+    except DatabaseError:
+        # the connection is broken, so is closed rather than reused
+        connection.close()
+
+
+@contextmanager
+def reading(check=True):
+    """
+    Sends the reads in the block to the overview database with the
+    statement timeout. If check is True, raises Unavailable if the
+    database is lagging, or OperationalError if it cannot be reached.
+
+    Nested blocks, eg a background job run during a request, use
+    the outer block's connection as it is.
+    """
+    if is_reading():
+        yield
+        return
+    connection = connections[get_alias()]
+    if check:
+        check_lag(connection)
+    set_statement_timeout(connection, get_setting("STATEMENT_TIMEOUT"))
+    _local.reading = True
+    try:
+        yield
+    finally:
+        _local.reading = False
+        reset_statement_timeout(connection)
+
+
+def iterate(iterable):
+    """
+    Iterates inside reading(), for streamed responses that
+    query after the view has returned
+    """
+    with reading():
+        for i in iterable:
+            yield i
+
+
+class OverviewRouter(object):
+    """
+    Sends the reads made inside reading() to the overview database
+    """
+    def db_for_read(self, model, **hints):
+        if not is_reading():
+            return None
+        if model._meta.app_label in DEFAULT_DATABASE_APPS:
+            return None
+        return get_alias()
+
+
+def has_router():
+    for router in getattr(settings, "DATABASE_ROUTERS", []):
+        if isinstance(router, six.string_types):
+            router = import_string(router)
+        if isinstance(router, type) and issubclass(router, OverviewRouter):
+            return True
+        if isinstance(router, OverviewRouter):
+            return True
+    return False
+
+
+@checks.register()
+def check_router(app_configs, **kwargs):
+    """
+    An ALIAS has no effect unless the router is installed
+    """
+    alias = get_alias()
+    if alias == DEFAULTS["ALIAS"]:
+        return []
+    errors = []
+    if alias not in settings.DATABASES:
+        errors.append(checks.Error(
+            "OVERVIEW_DATABASE ALIAS {} is not in DATABASES".format(alias),
+            id="overview.E001",
+        ))
+    if not has_router():
+        errors.append(checks.Warning(
+            "OVERVIEW_DATABASE ALIAS {} is ignored as {} is not in "
+            "DATABASE_ROUTERS".format(alias, ROUTER),
+            hint="Add {} to DATABASE_ROUTERS".format(ROUTER),
+            id="overview.W001",
+        ))
+    return errors
@@ -0,0 +1,300 @@
+"""
+Summaries of the values of numeric, date, boolean and choice fields.
+
+The counts, ranges and means of every typed field of a subrecord are
+read with a single aggregate query. Histograms and frequencies are
+counted by grouped queries and percentiles are read at their offset in
+the ordered values, so no more than a few rows per field are sent to
+us however large the table. Summaries are dicts of JSON serialisable
+values so that they can be stored by background jobs.
+"""
+import datetime
+from collections import Counter
+
+from django.db import models
+from django.db.models import Avg, Case, Count, IntegerField, Max, Min, When
+from django.db.models.functions import TruncMonth
+from django.utils.encoding import force_text
+
+NUMERIC = "numeric"
+DATE = "date"
+BOOLEAN = "boolean"
+CHOICE = "choice"
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+# dates are counted by month, or by year if they span more months
+MAX_MONTHS = 36
+
+
+def get_kind(model, field_name):
+    """
+    The kind of summary a field has, or None
+    """
+    field = model._get_field(field_name)
+    if not isinstance(field, models.Field) or field.is_relation:
+        return None
+    if field.choices:
+        return CHOICE
+    if isinstance(field, (models.BooleanField, models.NullBooleanField)):
+        return BOOLEAN
+    # includes DateTimeFields
+    if isinstance(field, models.DateField):
+        return DATE
+    if isinstance(field, (
+        models.IntegerField, models.FloatField, models.DecimalField
+    )):
+        return NUMERIC
+    return None
+
+
+def get_share(count, total):
+    if not total:
+        return 0
+    return round(float(count) * 100 / total, 2)
+
+
+def get_populated_values(qs, field_name):
+    return qs.exclude(**{"{}__isnull".format(field_name): True}).order_by()
+
+
+def get_percentile(qs, field_name, count, percentile):
+    """
+    The percentile of the populated values of a field, interpolating
+    between the two values either side of it, which are read at their
+    offset in the ordered values
+    """
+    position = (count - 1) * percentile / 100.0
+    lower = int(position)
+    found = [float(i) for i in get_populated_values(
+        qs, field_name
+    ).order_by(field_name).values_list(field_name, flat=True)[lower:lower + 2]]
+    upper = found[-1]
+    return found[0] + (upper - found[0]) * (position - lower)
+
+
+def get_histogram_bins(qs, field_name, minimum, width):
+    """
+    The number of values in each of the histogram's bins, counted
+    by a query grouped by the bin of each value
+    """
+    bin_expression = Case(*[
+        When(then=i, **{
+            "{}__lt".format(field_name): minimum + (i + 1) * width
+        }) for i in range(HISTOGRAM_BINS - 1)
+    ], default=HISTOGRAM_BINS - 1, output_field=IntegerField())
+    rows = get_populated_values(qs, field_name).annotate(
+        histogram_bin=bin_expression
+    ).values("histogram_bin").annotate(count=Count("id"))
+    bins = [0] * HISTOGRAM_BINS
+    for row in rows:
+        bins[row["histogram_bin"]] = row["count"]
+    return bins
+
+
+def get_value_counts(qs, field_name):
+    """
+    The count of each distinct value of a field, from a grouped query
+    """
+    rows = get_populated_values(qs, field_name).values_list(
+        field_name
+    ).annotate(Count("id"))
+    return Counter({value: count for value, count in rows if value != ""})
+
+
+def summarise_numbers(qs, field_name, aggregates):
+    """
+    aggregates are the count, min, max and mean of the field
+    """
+    count = aggregates["count"]
+    if not count:
+        return dict(kind=NUMERIC, count=0)
+    minimum = float(aggregates["min"])
+    maximum = float(aggregates["max"])
+    width = (maximum - minimum) / HISTOGRAM_BINS
+    if width:
+        bins = get_histogram_bins(qs, field_name, minimum, width)
+        histogram = [
+            (
+                round(minimum + i * width, 2),
+                round(minimum + (i + 1) * width, 2),
+                bin_count,
+                get_share(bin_count, count)
+            ) for i, bin_count in enumerate(bins)
+        ]
+    else:
+        histogram = [(minimum, maximum, count, 100)]
+    return dict(
+        kind=NUMERIC,
+        count=count,
+        min=minimum,
+        max=maximum,
+        mean=round(float(aggregates["mean"]), 2),
+        percentiles=[
+            (i, round(get_percentile(qs, field_name, count, i), 2))
+            for i in PERCENTILES
+        ],
+        histogram=histogram,
+    )
+
+
+def to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def summarise_dates(qs, field_name, aggregates):
+    """
+    aggregates are the count, min and max of the field, the values
+    are counted by month with a grouped query
+    """
+    count = aggregates["count"]
+    if not count:
+        return dict(kind=DATE, count=0)
+    first = to_date(aggregates["min"])
+    last = to_date(aggregates["max"])
+    months = (last.year - first.year) * 12 + (last.month - first.month)
+    if months > MAX_MONTHS:
+        label_format = "%Y"
+    else:
+        label_format = "%Y-%m"
+    rows = get_populated_values(qs, field_name).annotate(
+        month=TruncMonth(field_name)
+    ).values("month").annotate(count=Count("id"))
+    counts = Counter()
+    for row in rows:
+        counts[to_date(row["month"]).strftime(label_format)] += row["count"]
+    return dict(
+        kind=DATE,
+        count=count,
+        min=first.isoformat(),
+        max=last.isoformat(),
+        histogram=[
+            (label, counts[label], get_share(counts[label], count))
+            for label in sorted(counts.keys())
+        ],
+    )
+
+
+def summarise_booleans(value_counts):
+    """
+    value_counts is a dict of value to the number of rows with it
+    """
+    counts = Counter()
+    for value, value_count in value_counts.items():
+        counts[bool(value)] += value_count
+    count = sum(counts.values())
+    return dict(
+        kind=BOOLEAN,
+        count=count,
+        true=counts[True],
+        false=counts[False],
+        true_share=get_share(counts[True], count),
+    )
+
+
+def get_choice_labels(choices):
+    """
+    The display label of each value, including those in option groups
+    """
+    labels = {}
+    for value, label in choices:
+        if isinstance(label, (list, tuple)):
+            labels.update(get_choice_labels(label))
+        else:
+            labels[value] = label
+    return labels
+
+
+def summarise_choices(value_counts, choices):
+    """
+    value_counts is a dict of value to the number of rows with it
+    """
+    counts = Counter(value_counts)
+    count = sum(counts.values())
+    labels = get_choice_labels(choices)
+    for value in labels:
+        counts.setdefault(value, 0)
+    frequencies = sorted(
+        counts.items(),
+        key=lambda x: (-x[1], force_text(labels.get(x[0], x[0])))
+    )
+    return dict(
+        kind=CHOICE,
+        count=count,
+        frequencies=[
+            (
+                force_text(labels.get(value, value)),
+                value_count,
+                get_share(value_count, count)
+            ) for value, value_count in frequencies
+        ],
+    )
+
+
+def get_aggregates(field_name, kind):
+    """
+    The aggregates that summarising a field of a kind starts from
+    """
+    if kind == NUMERIC:
+        return dict(
+            count=Count(field_name),
+            min=Min(field_name),
+            max=Max(field_name),
+            mean=Avg(field_name),
+        )
+    if kind == DATE:
+        return dict(
+            count=Count(field_name), min=Min(field_name), max=Max(field_name)
+        )
+    return {}
+
+
+def summarise(qs, model, field_name, kind, aggregates):
+    if kind == NUMERIC:
+        return summarise_numbers(qs, field_name, aggregates)
+    if kind == DATE:
+        return summarise_dates(qs, field_name, aggregates)
+    value_counts = get_value_counts(qs, field_name)
+    if kind == BOOLEAN:
+        return summarise_booleans(value_counts)
+    return summarise_choices(
+        value_counts, model._get_field(field_name).choices
+    )
+
+
+def calculate_distributions(qs, model, field_names):
+    """
+    The summary of each typed field of the rows of qs, starting from
+    a single aggregate query. Returns a dict of field name to summary.
+    """
+    kinds = {}
+    for field_name in field_names:
+        kind = get_kind(model, field_name)
+        if kind is not None:
+            kinds[field_name] = kind
+    if not kinds:
+        return {}
+
+    typed = sorted(kinds.keys())
+    aggregates = {}
+    for index, field_name in enumerate(typed):
+        for key, aggregate in get_aggregates(
+            field_name, kinds[field_name]
+        ).items():
+            aggregates["{}_{}".format(key, index)] = aggregate
+    found = {}
+    if aggregates:
+        found = qs.order_by().aggregate(**aggregates)
+
+    result = {}
+    for index, field_name in enumerate(typed):
+        field_aggregates = {
+            key: found["{}_{}".format(key, index)]
+            for key in get_aggregates(field_name, kinds[field_name])
+        }
+        result[field_name] = summarise(
+            qs, model, field_name, kinds[field_name], field_aggregates
+        )
+    return result
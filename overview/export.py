@@ -0,0 +1,100 @@
+"""
+Exports overview statistics as CSV or JSON Lines.
+
+Rows are generated one subrecord/field at a time and written as
+they are calculated, so they can be streamed without holding the
+whole report in memory.
+"""
+import csv
+import json
+
+from overview import fields, overview_utils
+
+SUBRECORD_COLUMNS = ["subrecord", "total", "percentage_of_episodes"]
+FIELD_COLUMNS = [
+    "subrecord", "field", "total", "populated", "percentage_populated"
+]
+
+REPORTS = {
+    "subrecords": SUBRECORD_COLUMNS,
+    "fields": FIELD_COLUMNS,
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def get_subrecord_rows(subrecord_models, episode_qs):
+    episode_count = episode_qs.count()
+    for subrecord in subrecord_models:
+        aggregates = overview_utils.get_subrecord_aggregates(
+            subrecord, episode_qs
+        )
+        yield dict(
+            subrecord=subrecord.get_api_name(),
+            total=aggregates["total"],
+            percentage_of_episodes=overview_utils.get_percentage(
+                aggregates["episodes"], episode_count
+            ),
+        )
+
+
+def get_field_rows(subrecord_models, episode_qs):
+    for subrecord in subrecord_models:
+        field_names = fields.get_field_names(subrecord)
+        field_stats = fields.get_field_stats(
+            episode_qs, subrecord, field_names
+        )
+        for field_name in field_names:
+            field = fields.get_field(
+                episode_qs,
+                subrecord,
+                field_name,
+                stats=field_stats[field_name]
+            )
+            yield dict(
+                subrecord=subrecord.get_api_name(),
+                field=field_name,
+                total=field.total_count(),
+                populated=field.total_populated(),
+                percentage_populated=field.percentage_populated(),
+            )
+
+
+def get_rows(report, subrecord_models, episode_qs):
+    if report == "subrecords":
+        return get_subrecord_rows(subrecord_models, episode_qs)
+    return get_field_rows(subrecord_models, episode_qs)
+
+
+class Echo(object):
+    """
+    A file like object that returns what is written to it,
+    so csv.writer can be used to generate lines.
+    """
+    def write(self, value):
+        return value
+
+
+def to_csv(rows, columns):
+    writer = csv.DictWriter(Echo(), fieldnames=columns)
+    yield writer.writerow(dict(zip(columns, columns)))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def to_json_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def export(report, export_format, subrecord_models, episode_qs):
+    """
+    A generator of the lines of a report in a format
+    """
+    rows = get_rows(report, subrecord_models, episode_qs)
+    if export_format == "csv":
+        return to_csv(rows, REPORTS[report])
+    return to_json_lines(rows)
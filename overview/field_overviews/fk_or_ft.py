@@ -1,6 +1,9 @@
-from overview import overview_utils
+from functools import partial
+
+from overview import cache, overview_utils
+from overview.profiling import profiled
 from django.db.models.functions import Lower
-from django.db.models import Count
+from django.db.models import Count, Min
 
 
 def get_field_dict(episode_qs, model, field_name):
@@ -16,49 +19,67 @@ def get_field_dict(episode_qs, model, field_name):
     return field_dict
 
 
-def get_ft_display_name(
-    subrecord_qs, ft_field_name, ft_field_value
-):
+def get_ft_display_names(subrecord_qs, ft_field_name, ids):
     """
     When aggregating free text we ignore case.
 
-    This gives us the first populated value from the qs
-    that is case sensitive.
+    Given the ids of the first subrecord in each group, this gives
+    us the case sensitive value that was entered, in a single query.
     """
-    return getattr(
-        subrecord_qs.filter(**{ft_field_name: ft_field_value}).first(),
-        ft_field_name
+    return dict(
+        subrecord_qs.model.objects.filter(id__in=ids).values_list(
+            "id", ft_field_name
+        )
     )
 
 
 def get_top_ft(qs, field_name, episode_qs, amount=25):
     """
     Gets a summary of the top 25 ft fields of the amount.
+
+    The counts and episode coverage for every value come from
+    a single grouped query, rather than querying per value.
     """
+    return cache.get_or_compute(
+        "top_ft_{}".format(amount),
+        partial(calculate_top_ft, qs, field_name, episode_qs, amount),
+        subrecord=qs.model,
+        field_name=field_name,
+        querysets=[qs, episode_qs]
+    )
+
+
+@profiled("get_top_ft", lambda qs, field_name, *args: "{}.{}".format(
+    qs.model.get_api_name(), field_name
+))
+def calculate_top_ft(qs, field_name, episode_qs, amount):
     ft_field = "{}_ft".format(field_name)
-    top_ft = qs.annotate(
+    episode_lookup = overview_utils.get_episode_lookup(qs.model)
+    top_ft = qs.exclude(**{"{}__isnull".format(ft_field): True}).annotate(
         lower_ft_field=Lower(ft_field)
     )
 
     top_ft = top_ft.values("lower_ft_field")
 
     top_ft = top_ft.annotate(
-        counted_ft_field=Count("lower_ft_field")
+        counted_ft_field=Count("id", distinct=True),
+        counted_episodes=Count(episode_lookup, distinct=True),
+        first_id=Min("id"),
+    )
+    top_ft = list(top_ft.order_by("-counted_ft_field")[:amount])
+    display_names = get_ft_display_names(
+        qs, ft_field, [row["first_id"] for row in top_ft]
     )
-    top_ft = top_ft.order_by("-counted_ft_field")[:amount]
+    episode_count = episode_qs.count()
     result = []
 
     for row in top_ft:
-        result.append(overview_utils.get_summary_row(
-            get_ft_display_name(qs, ft_field, row["lower_ft_field"]),
-            qs.filter(
-                **{"{}__iexact".format(ft_field): row["lower_ft_field"]}
+        result.append((
+            display_names[row["first_id"]],
+            row["counted_ft_field"],
+            overview_utils.get_percentage(
+                row["counted_episodes"], episode_count
             ),
-            episode_qs
         ))
 
-    result = sorted(result, key=lambda x: x[0])
-    result = sorted(result, key=lambda x: -x[1])
-    result = sorted(result, key=lambda x: -x[2])
-
-    return result
+    return overview_utils.sort_summary_rows(result)
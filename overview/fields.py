@@ -1,8 +1,66 @@
-from decimal import Decimal, getcontext
-from django.db.models import Count
+from decimal import Decimal, localcontext
+from functools import partial
+from django.db.models import Count, Sum, Case, When, Value, IntegerField
 from django.db.models.functions import Lower
 from django.utils.functional import cached_property
 from opal.core import subrecords
+from opal.core.fields import ForeignKeyOrFreeText
+
+from overview import (
+    approximate, cache, distributions, overview_utils, parallel, planner
+)
+from overview.profiling import profiled
+
+
+IGNORED_FIELDS = {
+    "id",
+    "created",
+    "updated",
+    "created_by_id",
+    "updated_by_id",
+    "consistency_token",
+    "episode_id",
+    "patient_id"
+}
+
+
+def get_field_label(field, *args, **kwargs):
+    return "{}.{}".format(field.model.get_api_name(), field.field_name)
+
+
+def get_model_qs(episodes, model):
+    """
+    All populated rows of the model that relate to the episodes,
+    singletons that have never been updated are not counted
+    """
+    populated = overview_utils.get_all_populated(model)
+    if model in subrecords.patient_subrecords():
+        return planner.restrict_to_patients(populated, episodes)
+    else:
+        return planner.restrict(populated, "episode_id", episodes)
+
+
+class FieldStats(object):
+    """
+    Precalculated statistics that a Field reads from
+    rather than querying.
+
+    top_uncoded, top_coded and distribution are None if they
+    have not been calculated.
+    """
+    def __init__(
+        self,
+        total,
+        populated,
+        top_uncoded=None,
+        top_coded=None,
+        distribution=None
+    ):
+        self.total = total
+        self.populated = populated
+        self.top_uncoded = top_uncoded
+        self.top_coded = top_coded
+        self.distribution = distribution
 
 
 class Field(object):
@@ -12,42 +70,86 @@ class Field(object):
             "please implement a template"
         )
 
-    def __init__(self, episodes, model, field_name):
+    def __init__(
+        self, episodes, model, field_name, stats=None, approximate=False
+    ):
+        """
+        If stats are passed in, eg from a snapshot, the field
+        reads its numbers from them rather than querying.
+
+        If approximate is True, statistics of large tables are
+        estimated from a sample.
+        """
         self.episodes = episodes
         self.model = model
         self.field_name = field_name
+        self.stats = stats
+        self.approximate = approximate
 
     def display_name(self):
         return self.model._get_field_title(self.field_name)
 
     def model_qs(self):
-        if self.model in subrecords.patient_subrecords():
-            patient_ids = self.episodes.values_list(
-                'patient_id', flat=True
-            ).distinct()
-            return self.model.objects.filter(patient_id__in=patient_ids)
-        else:
-            episode_ids = self.episodes.values_list('id', flat=True)
-            return self.model.objects.filter(episode_id__in=episode_ids)
+        return get_model_qs(self.episodes, self.model)
+
+    def get_cached(self, name, compute):
+        return cache.get_or_compute(
+            name,
+            compute,
+            subrecord=self.model,
+            field_name=self.field_name,
+            querysets=[self.episodes]
+        )
 
 
 class DefaultField(Field):
     template = "overview/fields/default_field.html"
+    TOP_AMOUNT = 10
+
+    @profiled("total_count", get_field_label)
+    def total_count(self):
+        if self.stats is not None:
+            return self.stats.total
+        return self.model_qs().count()
 
+    @profiled("total_populated", get_field_label)
     def total_populated(self):
+        if self.stats is not None:
+            return self.stats.populated
         return self.model_qs().exclude(**{self.field_name: None}).count()
 
     def percentage_populated(self):
-        total_count = self.model_qs().count()
+        total_count = self.total_count()
         if total_count == 0:
             return 0
-        getcontext().prec = 2
-        return (Decimal(self.total_populated())/total_count) * 100
+        with localcontext() as ctx:
+            ctx.prec = 2
+            return (Decimal(self.total_populated())/total_count) * 100
+
+    def get_top_values(self):
+        """
+        The most common values and how many times each appears,
+        as a list of lists where list[0] is the value
+        and list[1] is the amount
+        """
+        return self.get_cached("top_values", self.calculate_top_values)
+
+    @profiled("top_values", get_field_label)
+    def calculate_top_values(self):
+        qs = self.model_qs().exclude(**{self.field_name: None})
+        qs = qs.values_list(self.field_name).annotate(
+            counted_field=Count("id")
+        )
+        return list(
+            qs.order_by("-counted_field", self.field_name)[:self.TOP_AMOUNT]
+        )
 
 
 class ForeignKeyOrFreeTextField(DefaultField):
     template = "overview/fields/fk_or_ft.html"
     TOP_AMOUNT = 10
+    # set by views that link to the clusters of free text values
+    clusters_url = None
 
     @property
     def free_text_field_name(self):
@@ -57,12 +159,18 @@ class ForeignKeyOrFreeTextField(DefaultField):
     def foreign_key_id_field_name(self):
         return "{}_fk_id".format(self.field_name)
 
-    def total_populated(self):
-        unpopulated = self.model_qs().filter(
+    def get_unpopulated_qs(self):
+        return self.model_qs().filter(
             **{self.free_text_field_name: ''}
         ).filter(
             **{self.foreign_key_id_field_name: None}
         )
+
+    @profiled("total_populated", get_field_label)
+    def total_populated(self):
+        if self.stats is not None:
+            return self.stats.populated
+        unpopulated = self.get_unpopulated_qs()
         return self.model_qs().count() - unpopulated.count()
 
     @cached_property
@@ -73,7 +181,20 @@ class ForeignKeyOrFreeTextField(DefaultField):
         As a list of lists where list[0] is the ft
         and list[1] is the amount
         """
-        qs = self.model_qs().exclude(**{self.free_text_field_name: ''})
+        if self.stats is not None and self.stats.top_uncoded is not None:
+            return self.stats.top_uncoded
+        if self.approximate and approximate.is_large(self.model):
+            return approximate.get_top_uncoded(
+                self.model_qs(), self.free_text_field_name, self.TOP_AMOUNT
+            )
+        return self.get_cached("top_uncoded", self.get_top_uncoded)
+
+    def get_top_uncoded_qs(self):
+        # rather than exclude(), whose NOT (ft = '' AND ft IS NOT NULL)
+        # does not match the partial index that indexes.py suggests
+        qs = self.model_qs().filter(
+            **{"{}__gt".format(self.free_text_field_name): ''}
+        )
         top_ft = qs.annotate(
             lower_ft_field=Lower(self.free_text_field_name)
         )
@@ -82,9 +203,12 @@ class ForeignKeyOrFreeTextField(DefaultField):
             counted_ft_field=Count("lower_ft_field")
         )
         top_ft = top_ft.order_by("-counted_ft_field")[:self.TOP_AMOUNT]
-
         return top_ft.values_list("lower_ft_field", "counted_ft_field")
 
+    @profiled("top_uncoded", get_field_label)
+    def get_top_uncoded(self):
+        return list(self.get_top_uncoded_qs())
+
     @cached_property
     def top_coded(self):
         """
@@ -93,6 +217,11 @@ class ForeignKeyOrFreeTextField(DefaultField):
         As a list of lists where list[0] is the ft
         and list[1] is the amount
         """
+        if self.stats is not None and self.stats.top_coded is not None:
+            return self.stats.top_coded
+        return self.get_cached("top_coded", self.get_top_coded)
+
+    def get_top_coded_qs(self):
         qs = self.model_qs().exclude(**{self.foreign_key_id_field_name: None})
 
         fk_id = qs.values(self.foreign_key_id_field_name)
@@ -100,7 +229,191 @@ class ForeignKeyOrFreeTextField(DefaultField):
             counted_fk_field=Count(self.foreign_key_id_field_name)
         )
         fk_id = fk_id.order_by("-counted_fk_field")[:self.TOP_AMOUNT]
-
         return fk_id.values_list(
             "{}_fk__name".format(self.field_name), "counted_fk_field"
         )
+
+    @profiled("top_coded", get_field_label)
+    def get_top_coded(self):
+        return list(self.get_top_coded_qs())
+
+
+class TypedField(DefaultField):
+    """
+    A field with a summary of its values, see overview.distributions
+    """
+    @cached_property
+    def distribution(self):
+        if self.stats is not None and self.stats.distribution is not None:
+            return self.stats.distribution
+        return self.get_cached("distribution", self.get_distribution)
+
+    @profiled("distribution", get_field_label)
+    def get_distribution(self):
+        return distributions.calculate_distributions(
+            self.model_qs(), self.model, [self.field_name]
+        )[self.field_name]
+
+
+class NumericField(TypedField):
+    template = "overview/fields/numeric.html"
+
+
+class DateField(TypedField):
+    template = "overview/fields/date.html"
+
+
+class BooleanField(TypedField):
+    template = "overview/fields/boolean.html"
+
+
+class ChoiceField(TypedField):
+    template = "overview/fields/choice.html"
+
+
+TYPED_FIELDS = {
+    distributions.NUMERIC: NumericField,
+    distributions.DATE: DateField,
+    distributions.BOOLEAN: BooleanField,
+    distributions.CHOICE: ChoiceField,
+}
+
+
+def get_field_names(model):
+    """
+    The names of the fields on a subrecord that we give an overview of
+    """
+    return [
+        i for i in model._get_fieldnames_to_serialize()
+        if i not in IGNORED_FIELDS
+    ]
+
+
+def is_foreign_key_or_free_text(model, field_name):
+    return isinstance(model._get_field(field_name), ForeignKeyOrFreeText)
+
+
+def get_field(episodes, model, field_name, stats=None, approximate=False):
+    """
+    Returns the Field class that gives an overview of the model field
+    """
+    if is_foreign_key_or_free_text(model, field_name):
+        field_class = ForeignKeyOrFreeTextField
+    else:
+        field_class = TYPED_FIELDS.get(
+            distributions.get_kind(model, field_name), DefaultField
+        )
+    return field_class(
+        episodes, model, field_name, stats=stats, approximate=approximate
+    )
+
+
+def is_many_to_many(model, field_name):
+    return getattr(model._get_field(field_name), "many_to_many", False)
+
+
+def get_empty_lookups(model, field_name):
+    """
+    The lookups that match rows where the field is not populated,
+    for fields that are not many to many
+    """
+    if is_foreign_key_or_free_text(model, field_name):
+        return {
+            "{}_ft".format(field_name): "",
+            "{}_fk_id__isnull".format(field_name): True,
+        }
+    return {"{}__isnull".format(field_name): True}
+
+
+def get_populated_aggregate(model, field_name):
+    """
+    An aggregate that counts the rows where the field is populated.
+    """
+    if is_foreign_key_or_free_text(model, field_name):
+        # populated unless both the free text is empty and the fk is null
+        return Sum(Case(
+            When(then=Value(0), **get_empty_lookups(model, field_name)),
+            default=Value(1),
+            output_field=IntegerField()
+        ))
+    return Count(field_name)
+
+
+def get_field_stats(episodes, model, field_names):
+    """
+    Calculates the total and populated counts of every field
+    with a single aggregate query.
+
+    Many to many fields cannot be counted in the same query
+    without multiplying the rows so cost a query each. The values
+    of numeric, date, boolean and choice fields are summarised
+    from one more query.
+
+    Returns a dict of field name to FieldStats.
+    """
+    return cache.get_or_compute(
+        "field_stats",
+        partial(calculate_field_stats, episodes, model, field_names),
+        subrecord=model,
+        field_name=",".join(field_names),
+        querysets=[episodes]
+    )
+
+
+@profiled(
+    "field_stats", lambda episodes, model, *args: model.get_api_name()
+)
+def calculate_field_stats(episodes, model, field_names):
+    qs = get_model_qs(episodes, model)
+    aggregates = {"total": Count("id")}
+    many_to_manys = []
+
+    for index, field_name in enumerate(field_names):
+        if is_many_to_many(model, field_name):
+            many_to_manys.append(field_name)
+        else:
+            aggregates["populated_{}".format(index)] = get_populated_aggregate(
+                model, field_name
+            )
+
+    counts = qs.aggregate(**aggregates)
+    total = counts["total"]
+    result = {}
+
+    many_to_many_counts = dict(zip(many_to_manys, parallel.map(
+        lambda x: qs.exclude(**{x: None}).count(), many_to_manys
+    )))
+    field_distributions = distributions.calculate_distributions(
+        qs, model, field_names
+    )
+
+    for index, field_name in enumerate(field_names):
+        if field_name in many_to_manys:
+            populated = many_to_many_counts[field_name]
+        else:
+            # Sum returns None for an empty table
+            populated = counts["populated_{}".format(index)] or 0
+        result[field_name] = FieldStats(
+            total,
+            populated,
+            distribution=field_distributions.get(field_name)
+        )
+    return result
+
+
+def prefetch_top_values(field_list):
+    """
+    Calculates the top coded and free text values of the fields,
+    in parallel if OVERVIEW_WORKERS is set, rather than one by one
+    as the template renders.
+    """
+    def prefetch(args):
+        field, name = args
+        getattr(field, name)
+
+    parallel.map(prefetch, [
+        (field, name)
+        for field in field_list
+        if isinstance(field, ForeignKeyOrFreeTextField)
+        for name in ("top_uncoded", "top_coded")
+    ])
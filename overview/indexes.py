@@ -0,0 +1,252 @@
+"""
+Suggests partial and functional indexes for the queries the overview
+makes of subrecord tables, which Opal does not index.
+
+Each suggestion is checked against the plan the overview database,
+see overview.database, gives for the query it serves, with EXPLAIN,
+and against the indexes that already exist. The condition of each
+partial index is the predicate its query filters on, so that the
+database can prove the index covers the query. The overview_index_advisor command reports them and can write
+the recommended indexes as a migration of a host project app.
+
+Partial and functional indexes are written for PostgreSQL and SQLite,
+other databases are reported on but not given a migration.
+"""
+from django.db import connection, connections, migrations
+from django.db.backends.utils import truncate_name
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from opal.core import subrecords
+from opal import models as omodels
+
+from overview import database, fields, overview_utils
+
+SUPPORTED_VENDORS = ("postgresql", "sqlite")
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN",
+    "postgresql": "EXPLAIN",
+    "mysql": "EXPLAIN",
+}
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def get_column(model, field_name):
+    return model._meta.get_field(field_name).column
+
+
+def get_owner_column(subrecord):
+    """
+    The column that restricts a subrecord to episodes or patients
+    """
+    if subrecord in subrecords.episode_subrecords():
+        return get_column(subrecord, "episode")
+    return get_column(subrecord, "patient")
+
+
+class Suggestion(object):
+    """
+    An index on expression of the subrecord's table, partial
+    if there is a condition, and the query that it would serve.
+    """
+    def __init__(self, model, suffix, expression, condition, qs, reason):
+        self.model = model
+        self.table = model._meta.db_table
+        self.name = truncate_name(
+            "{}_{}".format(self.table, suffix),
+            connection.ops.max_name_length()
+        )
+        self.expression = expression
+        self.condition = condition
+        self.qs = qs
+        self.reason = reason
+
+    def create_sql(self):
+        sql = "CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+            quote(self.name), quote(self.table), self.expression
+        )
+        if self.condition:
+            sql = "{} WHERE {}".format(sql, self.condition)
+        return sql
+
+    def drop_sql(self):
+        return "DROP INDEX IF EXISTS {}".format(quote(self.name))
+
+
+def get_suggestions(subrecord):
+    """
+    The indexes that would serve the overview queries of a subrecord
+    """
+    episode_qs = omodels.Episode.objects.all()
+    owner = quote(get_owner_column(subrecord))
+    result = []
+
+    if subrecord._is_singleton:
+        result.append(Suggestion(
+            subrecord,
+            "populated",
+            owner,
+            "{} IS NOT NULL".format(quote(get_column(subrecord, "updated"))),
+            overview_utils.get_all_populated(subrecord),
+            "singletons are only populated once they have been updated"
+        ))
+
+    for field_name in fields.get_field_names(subrecord):
+        if not fields.is_foreign_key_or_free_text(subrecord, field_name):
+            continue
+        field = fields.get_field(episode_qs, subrecord, field_name)
+        ft = quote(get_column(subrecord, field.free_text_field_name))
+        fk = quote(get_column(subrecord, "{}_fk".format(field_name)))
+        result.append(Suggestion(
+            subrecord,
+            "{}_lower".format(field.free_text_field_name),
+            "LOWER({})".format(ft),
+            "{} > ''".format(ft),
+            field.get_top_uncoded_qs(),
+            "the top free text values of {} are grouped by LOWER({})".format(
+                field_name, ft
+            )
+        ))
+        result.append(Suggestion(
+            subrecord,
+            "{}_unpopulated".format(field_name),
+            owner,
+            "{} = '' AND {} IS NULL".format(ft, fk),
+            field.get_unpopulated_qs(),
+            "{} is unpopulated when {} is empty and {} is null".format(
+                field_name, ft, fk
+            )
+        ))
+    return result
+
+
+def get_explain_connection():
+    """
+    The connection of the overview database, which runs the queries
+    """
+    return connections[database.get_alias()]
+
+
+def explain(qs):
+    """
+    The overview database's plan for a queryset as a list of dicts
+    of column to value, or None if it cannot be explained
+    """
+    explain_connection = get_explain_connection()
+    prefix = EXPLAIN_PREFIXES.get(explain_connection.vendor)
+    if prefix is None:
+        return None
+    sql, params = qs.query.get_compiler(
+        connection=explain_connection
+    ).as_sql()
+    with explain_connection.cursor() as cursor:
+        cursor.execute("{} {}".format(prefix, sql), params)
+        columns = [i[0] for i in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def get_plan_lines(plan):
+    if plan is None:
+        return []
+    vendor = get_explain_connection().vendor
+    if vendor == "sqlite":
+        return [row["detail"] for row in plan]
+    if vendor == "postgresql":
+        return [row["QUERY PLAN"] for row in plan]
+    return [
+        " ".join("{}={}".format(k, v) for k, v in sorted(row.items()))
+        for row in plan
+    ]
+
+
+def scans_table(plan, table):
+    """
+    True if the plan reads every row of the table, None if
+    the plan cannot be read.
+    """
+    if plan is None:
+        return None
+    vendor = get_explain_connection().vendor
+    if vendor == "sqlite":
+        return any(
+            row["detail"].split(" USING ")[0] in (
+                "SCAN TABLE {}".format(table), "SCAN {}".format(table)
+            ) for row in plan
+        )
+    if vendor == "postgresql":
+        return any(
+            "Seq Scan on {}".format(table) in row["QUERY PLAN"]
+            for row in plan
+        )
+    if vendor == "mysql":
+        return any(
+            row.get("table") == table and row.get("type") == "ALL"
+            for row in plan
+        )
+    return None
+
+
+def get_index_names(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {i.lower() for i in constraints.keys()}
+
+
+class Advice(object):
+    def __init__(self, suggestion, plan, exists):
+        self.suggestion = suggestion
+        self.plan = get_plan_lines(plan)
+        self.scans = scans_table(plan, suggestion.table)
+        self.exists = exists
+
+    @property
+    def recommended(self):
+        """
+        Recommended if the index does not exist and the
+        query scans the table, or its plan is unknown
+        """
+        return not self.exists and self.scans is not False
+
+
+def advise(subrecord_models):
+    """
+    Explains the query of every suggestion for the subrecords
+    """
+    result = []
+    for subrecord in subrecord_models:
+        index_names = get_index_names(subrecord._meta.db_table)
+        for suggestion in get_suggestions(subrecord):
+            result.append(Advice(
+                suggestion,
+                explain(suggestion.qs),
+                suggestion.name.lower() in index_names
+            ))
+    return result
+
+
+def get_migration(app_label, suggestions, name="overview_indexes"):
+    """
+    A migration of app_label that creates the suggested indexes,
+    after the migrations of the app and of the subrecords' apps.
+    """
+    loader = MigrationLoader(connection, ignore_no_migrations=True)
+    leaves = loader.graph.leaf_nodes()
+    app_labels = {app_label}
+    app_labels.update(i.model._meta.app_label for i in suggestions)
+    number = 1
+    for leaf_app_label, leaf_name in leaves:
+        if leaf_app_label == app_label:
+            number = (MigrationAutodetector.parse_number(leaf_name) or 0) + 1
+
+    migration = migrations.Migration(
+        "{:04d}_{}".format(number, name), app_label
+    )
+    migration.dependencies = sorted(i for i in leaves if i[0] in app_labels)
+    migration.operations = [
+        migrations.RunSQL(i.create_sql(), reverse_sql=i.drop_sql())
+        for i in suggestions
+    ]
+    return migration
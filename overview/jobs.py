@@ -0,0 +1,324 @@
+"""
+Calculates overview pages in the background.
+
+Configured with the OVERVIEW_BACKGROUND_JOBS setting, eg
+
+    OVERVIEW_BACKGROUND_JOBS = {
+        "ENABLED": True,
+        # "thread" calculates in a thread of the web process,
+        # "command" leaves reports for the overview_run_jobs command,
+        # "sync" calculates during the request
+        "RUNNER": "thread",
+        # seconds before a result is recalculated, it is still
+        # served while it is being recalculated
+        "MAX_AGE": 3600,
+        # seconds before a running report is assumed to have died,
+        # and before a failed report is retried
+        "TIMEOUT": 3600,
+    }
+
+Results are stored as OverviewReports, one per page, so concurrent
+requests for the same page are coalesced into a single calculation.
+"""
+import json
+import logging
+import threading
+import traceback
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from opal.core import subrecords
+
+from overview import cache, database, fields, overview_utils
+from overview.models import OverviewReport
+
+logger = logging.getLogger("overview.jobs")
+
+DEFAULTS = dict(
+    ENABLED=False,
+    RUNNER="thread",
+    MAX_AGE=3600,
+    TIMEOUT=3600,
+)
+
+
+def get_setting(name):
+    return getattr(
+        settings, "OVERVIEW_BACKGROUND_JOBS", {}
+    ).get(name, DEFAULTS[name])
+
+
+def is_enabled():
+    return get_setting("ENABLED")
+
+
+def get_episode_qs(category=None, tagging=None, date_from=None, date_to=None):
+    """
+    Job arguments are stored as JSON so dates are ISO 8601 strings
+    """
+    return overview_utils.get_episode_qs(
+        category,
+        tagging,
+        date_from=parse_date(date_from) if date_from else None,
+        date_to=parse_date(date_to) if date_to else None,
+    )
+
+
+def compute_subrecord_list(**episode_filter):
+    episode_qs = get_episode_qs(**episode_filter)
+    rows = overview_utils.get_subrecord_summary_rows(
+        subrecords.subrecords(), episode_qs
+    )
+    return [
+        [subrecord.get_api_name(), count, str(percentage)]
+        for subrecord, count, percentage in rows
+    ]
+
+
+def load_subrecord_list(result, **episode_filter):
+    return [
+        (
+            subrecords.get_subrecord_from_api_name(api_name),
+            count,
+            Decimal(percentage)
+        ) for api_name, count, percentage in result
+    ]
+
+
+def compute_subrecord_detail(api_name, **episode_filter):
+    subrecord = subrecords.get_subrecord_from_api_name(api_name)
+    episode_qs = get_episode_qs(**episode_filter)
+    field_names = fields.get_field_names(subrecord)
+    field_stats = fields.get_field_stats(episode_qs, subrecord, field_names)
+    result = []
+    for field_name in field_names:
+        field = fields.get_field(
+            episode_qs, subrecord, field_name, stats=field_stats[field_name]
+        )
+        row = dict(
+            field_name=field_name,
+            total=field.total_count(),
+            populated=field.total_populated(),
+        )
+        if isinstance(field, fields.ForeignKeyOrFreeTextField):
+            row["top_uncoded"] = [list(i) for i in field.top_uncoded]
+            row["top_coded"] = [list(i) for i in field.top_coded]
+        if isinstance(field, fields.TypedField):
+            row["distribution"] = field.distribution
+        result.append(row)
+    return result
+
+
+def load_subrecord_detail(result, api_name, **episode_filter):
+    subrecord = subrecords.get_subrecord_from_api_name(api_name)
+    episode_qs = get_episode_qs(**episode_filter)
+    loaded = []
+    for row in result:
+        stats = fields.FieldStats(
+            row["total"],
+            row["populated"],
+            top_uncoded=[tuple(i) for i in row.get("top_uncoded", [])],
+            top_coded=[tuple(i) for i in row.get("top_coded", [])],
+            distribution=row.get("distribution"),
+        )
+        loaded.append(fields.get_field(
+            episode_qs, subrecord, row["field_name"], stats=stats
+        ))
+    return loaded
+
+
+def compute_breakdown(lookup):
+    columns, rows = overview_utils.get_breakdown(
+        subrecords.subrecords(), lookup
+    )
+    return dict(
+        columns=columns,
+        rows=[
+            [
+                subrecord.get_api_name(),
+                [[total, str(percentage)] for total, percentage in cells]
+            ] for subrecord, cells in rows
+        ]
+    )
+
+
+def load_breakdown(result, lookup):
+    return result["columns"], [
+        (
+            subrecords.get_subrecord_from_api_name(api_name),
+            [(total, Decimal(percentage)) for total, percentage in cells]
+        ) for api_name, cells in result["rows"]
+    ]
+
+
+JOBS = {
+    "subrecord_list": (compute_subrecord_list, load_subrecord_list),
+    "subrecord_detail": (compute_subrecord_detail, load_subrecord_detail),
+    "breakdown": (compute_breakdown, load_breakdown),
+}
+
+
+def get_key(name, **kwargs):
+    return "{}:{}".format(name, json.dumps(kwargs, sort_keys=True))
+
+
+def get_arguments(report):
+    return json.loads(report.arguments)
+
+
+def load_result(report):
+    """
+    The result of a report in the form its view uses
+    """
+    _, load = JOBS[report.name]
+    return load(json.loads(report.result), **get_arguments(report))
+
+
+def is_stale(report):
+    if report.computed is None:
+        return True
+    max_age = timedelta(seconds=get_setting("MAX_AGE"))
+    return report.computed < timezone.now() - max_age
+
+
+def get_retryable():
+    """
+    Failed reports are only retried once TIMEOUT has passed since
+    they started, so a report that always fails is not recalculated
+    on every request.
+    """
+    timed_out = timezone.now() - timedelta(seconds=get_setting("TIMEOUT"))
+    return Q(status=OverviewReport.FAILED, started__lt=timed_out)
+
+
+def claim(report, retry=False):
+    """
+    Marks a report as running, returns False if another
+    worker is already calculating it, or it failed recently
+    and retry is False.
+    """
+    now = timezone.now()
+    timed_out = now - timedelta(seconds=get_setting("TIMEOUT"))
+    claimable = Q(
+        status__in=[OverviewReport.PENDING, OverviewReport.DONE]
+    ) | Q(status=OverviewReport.RUNNING, started__lt=timed_out)
+    if retry:
+        claimable |= Q(status=OverviewReport.FAILED)
+    else:
+        claimable |= get_retryable()
+    return OverviewReport.objects.filter(claimable, id=report.id).update(
+        status=OverviewReport.RUNNING, started=now
+    ) == 1
+
+
+def execute(report_id):
+    """
+    Calculates a claimed report and stores the result
+    """
+    report = OverviewReport.objects.get(id=report_id)
+    compute, _ = JOBS[report.name]
+    try:
+        with database.reading(), cache.memoised_versions():
+            result = compute(**get_arguments(report))
+    except Exception:
+        logger.exception("Overview report {} failed".format(report.key))
+        OverviewReport.objects.filter(id=report_id).update(
+            status=OverviewReport.FAILED, error=traceback.format_exc()
+        )
+    else:
+        OverviewReport.objects.filter(id=report_id).update(
+            status=OverviewReport.DONE,
+            result=json.dumps(result),
+            error="",
+            computed=timezone.now()
+        )
+
+
+def execute_in_thread(report_id):
+    try:
+        execute(report_id)
+    finally:
+        connection.close()
+
+
+def enqueue(report):
+    runner = get_setting("RUNNER")
+    if runner == "command":
+        OverviewReport.objects.filter(
+            Q(status=OverviewReport.DONE) | get_retryable(), id=report.id
+        ).update(status=OverviewReport.PENDING)
+    elif claim(report):
+        if runner == "sync":
+            execute(report.id)
+        else:
+            thread = threading.Thread(
+                target=execute_in_thread, args=(report.id,)
+            )
+            thread.daemon = True
+            thread.start()
+
+
+def get_or_create_report(name, **kwargs):
+    report, _ = OverviewReport.objects.get_or_create(
+        key=get_key(name, **kwargs),
+        defaults=dict(name=name, arguments=json.dumps(kwargs))
+    )
+    return report
+
+
+def find_report(name, **kwargs):
+    """
+    The report for a page if there is one, without queuing it
+    """
+    return OverviewReport.objects.filter(key=get_key(name, **kwargs)).first()
+
+
+def get_report(name, **kwargs):
+    """
+    The report for a page, queuing its calculation if it has no
+    result or the result is stale.
+    """
+    report = get_or_create_report(name, **kwargs)
+    OverviewReport.objects.filter(id=report.id).update(views=F("views") + 1)
+    if report.result is None or is_stale(report):
+        enqueue(report)
+        report.refresh_from_db()
+    return report
+
+
+def warm(report, force=False):
+    """
+    Calculates a report now if it has no result or the result is
+    stale, or always if force is True, retrying it even if it
+    failed recently. Returns False if the report did not need
+    calculating or another worker is calculating it.
+    """
+    if not force and report.result is not None and not is_stale(report):
+        return False
+    if not claim(report, retry=force):
+        return False
+    execute(report.id)
+    return True
+
+
+def run_pending():
+    """
+    Calculates every pending report and any that have timed out,
+    used by the overview_run_jobs command.
+    """
+    timed_out = timezone.now() - timedelta(seconds=get_setting("TIMEOUT"))
+    reports = OverviewReport.objects.filter(
+        Q(status=OverviewReport.PENDING) |
+        Q(status=OverviewReport.RUNNING, started__lt=timed_out)
+    )
+    executed = []
+    for report in reports:
+        if claim(report):
+            execute(report.id)
+            executed.append(report.key)
+    return executed
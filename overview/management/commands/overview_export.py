@@ -0,0 +1,44 @@
+"""
+Writes the overview statistics as CSV or JSON Lines, a row at a time.
+"""
+from django.core.management.base import BaseCommand
+from opal.core import subrecords
+from opal import models as omodels
+
+from overview import database, export
+
+
+class Command(BaseCommand):
+    help = "Export the overview statistics as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "report", choices=sorted(export.REPORTS.keys())
+        )
+        parser.add_argument(
+            "--format",
+            choices=sorted(export.CONTENT_TYPES.keys()),
+            default="csv",
+            dest="format"
+        )
+        parser.add_argument(
+            "--output",
+            dest="output",
+            default=None,
+            help="The file to write to, defaults to stdout"
+        )
+
+    def handle(self, *args, **options):
+        lines = database.iterate(export.export(
+            options["report"],
+            options["format"],
+            subrecords.subrecords(),
+            omodels.Episode.objects.all()
+        ))
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                for line in lines:
+                    output.write(line)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
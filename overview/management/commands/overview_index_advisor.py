@@ -0,0 +1,79 @@
+"""
+Reports the indexes that would speed up the overview queries
+and optionally writes them as a migration.
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.migrations.writer import MigrationWriter
+from opal.core import subrecords
+
+from overview import indexes
+
+
+class Command(BaseCommand):
+    help = "Suggest indexes for the overview queries of subrecord tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--emit-migration",
+            dest="app_label",
+            default=None,
+            help="Write the recommended indexes as a migration of this app"
+        )
+        parser.add_argument(
+            "--name",
+            dest="name",
+            default="overview_indexes",
+            help="The name of the migration"
+        )
+
+    def handle(self, *args, **options):
+        advice = indexes.advise(subrecords.subrecords())
+        verbose = options["verbosity"] > 1
+
+        for i in advice:
+            suggestion = i.suggestion
+            if i.exists:
+                status = "exists"
+            elif i.scans is None:
+                status = "plan unknown"
+            elif i.scans:
+                status = "scans the table"
+            else:
+                status = "does not scan the table"
+            self.stdout.write("{} {}: {}".format(
+                suggestion.table, suggestion.name, status
+            ))
+            self.stdout.write("  {}".format(suggestion.reason))
+            if i.recommended:
+                self.stdout.write("  {}".format(suggestion.create_sql()))
+            if verbose:
+                for line in i.plan:
+                    self.stdout.write("    {}".format(line))
+
+        if options["app_label"] is None:
+            return
+
+        if connection.vendor not in indexes.SUPPORTED_VENDORS:
+            raise CommandError(
+                "Partial and functional indexes are not supported on {}".format(
+                    connection.vendor
+                )
+            )
+        recommended = [i.suggestion for i in advice if i.recommended]
+        if not recommended:
+            self.stdout.write("No indexes to add")
+            return
+        migration = indexes.get_migration(
+            options["app_label"], recommended, name=options["name"]
+        )
+        writer = MigrationWriter(migration)
+        if not os.path.exists(os.path.dirname(writer.path)):
+            raise CommandError(
+                "{} has no migrations directory".format(options["app_label"])
+            )
+        with open(writer.path, "w") as migration_file:
+            migration_file.write(writer.as_string())
+        self.stdout.write("Wrote {}".format(writer.path))
@@ -0,0 +1,31 @@
+"""
+Checks the overview counters against a full recount
+and repairs any drift.
+"""
+from django.core.management.base import BaseCommand
+from opal.core import subrecords
+
+from overview import counters
+
+
+class Command(BaseCommand):
+    help = "Check the overview counters and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Report drift without repairing it"
+        )
+
+    def handle(self, *args, **options):
+        for subrecord in subrecords.subrecords():
+            drift = counters.reconcile(
+                subrecord, repair=not options["dry_run"]
+            )
+            for name, (counted, actual) in sorted(drift.items()):
+                self.stdout.write("{} {}: counted {} actual {}".format(
+                    subrecord.get_api_name(), name, counted, actual
+                ))
@@ -0,0 +1,30 @@
+"""
+Calculates the overview pages queued when background jobs
+are enabled with the "command" runner.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from overview import jobs
+
+
+class Command(BaseCommand):
+    help = "Calculate queued overview pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=int,
+            dest="poll",
+            default=0,
+            help="Keep polling for jobs every POLL seconds"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for key in jobs.run_pending():
+                self.stdout.write("Calculated {}".format(key))
+            if not options["poll"]:
+                break
+            time.sleep(options["poll"])
@@ -0,0 +1,32 @@
+"""
+Snapshots the overview statistics of every subrecord whose
+data has changed since it was last snapshotted.
+"""
+from django.core.management.base import BaseCommand
+from opal.core import subrecords
+
+from overview import database, snapshots
+
+
+class Command(BaseCommand):
+    help = "Refresh the overview snapshots of changed subrecords"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            dest="force",
+            default=False,
+            help="Recalculate every snapshot, even if unchanged"
+        )
+
+    def handle(self, *args, **options):
+        with database.reading():
+            for subrecord in subrecords.subrecords():
+                _, refreshed = snapshots.take_snapshot(
+                    subrecord, force=options["force"]
+                )
+                if refreshed:
+                    self.stdout.write(
+                        "Refreshed {}".format(subrecord.get_api_name())
+                    )
@@ -0,0 +1,55 @@
+"""
+Calculates the overview pages into the background job result
+store, most viewed first, so that the first people to view them
+after a deploy or cache flush do not wait for them.
+"""
+from django.core.management.base import BaseCommand
+
+from overview import cache, jobs, parallel, warmup
+
+
+class Command(BaseCommand):
+    help = "Calculate the overview pages ahead of them being viewed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget",
+            type=int,
+            dest="budget",
+            default=None,
+            help="Stop starting pages after BUDGET seconds"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            dest="workers",
+            default=parallel.get_workers(),
+            help="Calculate WORKERS pages at a time"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            dest="force",
+            default=False,
+            help="Recalculate every page, even if its result is fresh"
+        )
+
+    def handle(self, *args, **options):
+        if not jobs.is_enabled() and not cache.is_enabled():
+            self.stderr.write(
+                "Neither background jobs nor the overview cache are "
+                "enabled, so pages will be calculated again when viewed"
+            )
+        result = warmup.warm_up(
+            budget=options["budget"],
+            workers=options["workers"],
+            force=options["force"]
+        )
+        for key in result.calculated:
+            self.stdout.write("Calculated {}".format(key))
+        if result.skipped:
+            self.stdout.write(
+                "Out of time before {} pages: {}".format(
+                    len(result.skipped), ", ".join(result.skipped)
+                )
+            )
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubrecordSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('api_name', models.CharField(max_length=255, unique=True)),
+                ('data_version', models.CharField(max_length=32)),
+                ('total', models.IntegerField(default=0)),
+                ('episodes', models.IntegerField(default=0)),
+                ('computed', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FieldSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=255)),
+                ('total', models.IntegerField(default=0)),
+                ('populated', models.IntegerField(default=0)),
+                ('subrecord_snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fields', to='overview.SubrecordSnapshot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ValueSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coded', models.BooleanField(default=False)),
+                ('value', models.TextField(blank=True, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('field_snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='overview.FieldSnapshot')),
+            ],
+            options={
+                'ordering': ('-count', 'id'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='fieldsnapshot',
+            unique_together=set([('subrecord_snapshot', 'field_name')]),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('overview', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubrecordCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('api_name', models.CharField(max_length=255, unique=True)),
+                ('rows', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('episodes', models.IntegerField(default=0)),
+                ('patients', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FieldCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=255)),
+                ('populated', models.IntegerField(default=0)),
+                ('subrecord_counter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fields', to='overview.SubrecordCounter')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='fieldcounter',
+            unique_together=set([('subrecord_counter', 'field_name')]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('overview', '0003_overviewreport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='overviewreport',
+            name='views',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('overview', '0004_overviewreport_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fieldsnapshot',
+            name='distribution_json',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,149 @@
 """
 Models for overview
 """
-# 
-# Warning - even if you don't have any models, please don't delete this file.
-# Some parts of Django require you to have something it can import called 
-# overview.models in order for us to let you be a Django app.
-#
\ No newline at end of file
+import json
+
+from django.db import models
+
+
+class SubrecordSnapshot(models.Model):
+    """
+    Precomputed usage of a subrecord across all episodes.
+
+    The data_version is the overview_utils.get_data_version token
+    at the time the snapshot was taken, if the token is unchanged
+    the snapshot does not need to be recalculated.
+    """
+    api_name = models.CharField(max_length=255, unique=True)
+    data_version = models.CharField(max_length=32)
+    total = models.IntegerField(default=0)
+    episodes = models.IntegerField(default=0)
+    computed = models.DateTimeField()
+
+    def __str__(self):
+        return "{}: {}".format(self.api_name, self.computed)
+
+
+class FieldSnapshot(models.Model):
+    """
+    Precomputed populated counts for a field of a subrecord.
+
+    Exposes the same total/populated/top_uncoded/top_coded/distribution
+    interface that fields.Field reads its stats from.
+    """
+    subrecord_snapshot = models.ForeignKey(
+        SubrecordSnapshot, related_name="fields", on_delete=models.CASCADE
+    )
+    field_name = models.CharField(max_length=255)
+    total = models.IntegerField(default=0)
+    populated = models.IntegerField(default=0)
+    # the overview.distributions summary of typed fields, as JSON
+    distribution_json = models.TextField(blank=True, null=True)
+
+    class Meta:
+        unique_together = (("subrecord_snapshot", "field_name"),)
+
+    @property
+    def distribution(self):
+        if self.distribution_json is None:
+            return None
+        return json.loads(self.distribution_json)
+
+    def get_top_values(self, coded):
+        return [
+            (i.value, i.count) for i in self.values.all()
+            if i.coded == coded
+        ]
+
+    @property
+    def top_uncoded(self):
+        return self.get_top_values(False)
+
+    @property
+    def top_coded(self):
+        return self.get_top_values(True)
+
+
+class ValueSnapshot(models.Model):
+    """
+    One of the top coded or free text values of a field snapshot
+    """
+    field_snapshot = models.ForeignKey(
+        FieldSnapshot, related_name="values", on_delete=models.CASCADE
+    )
+    coded = models.BooleanField(default=False)
+    value = models.TextField(blank=True, null=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ("-count", "id",)
+
+
+class SubrecordCounter(models.Model):
+    """
+    Running counts of a subrecord's use, maintained by
+    the signals in overview.counters.
+
+    rows is every row in the table, total, episodes and patients
+    only count populated rows.
+    """
+    api_name = models.CharField(max_length=255, unique=True)
+    rows = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    episodes = models.IntegerField(default=0)
+    patients = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.api_name
+
+
+class FieldCounter(models.Model):
+    """
+    The running count of rows where a field is populated
+    """
+    subrecord_counter = models.ForeignKey(
+        SubrecordCounter, related_name="fields", on_delete=models.CASCADE
+    )
+    field_name = models.CharField(max_length=255)
+    populated = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (("subrecord_counter", "field_name"),)
+
+
+class OverviewReport(models.Model):
+    """
+    The persisted result of an overview page calculated
+    in the background by overview.jobs.
+
+    There is one row per page, so concurrent requests for
+    the same page share a calculation.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    key = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
+    arguments = models.TextField(default="{}")
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING
+    )
+    result = models.TextField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(blank=True, null=True)
+    computed = models.DateTimeField(blank=True, null=True)
+    # how many times the page has been requested, so that
+    # overview_warm_up calculates the most viewed pages first
+    views = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "{}: {}".format(self.key, self.status)
@@ -1,24 +1,204 @@
+import datetime
+import hashlib
 from decimal import Decimal
-from opal.core import subrecords
+from functools import partial
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Max, Sum, When
+from django.utils.text import slugify
+from opal.core import subrecords, episodes
+from opal import models as omodels
+
+from overview import cache, parallel, planner
+from overview.profiling import profiled
+
 
 TOP_AMOUNT = 25
 
 
-def get_subrecord_use(subrecord, episode_qs):
+def get_subrecord_label(subrecord, *args, **kwargs):
+    return subrecord.get_api_name()
+
+
+def get_episode_lookup(subrecord):
     """
-    Get's all populated subrecords in an episode_qs.
-    For singletons, populated means they have an updated flag
+    The lookup from a subrecord to the episodes it relates to.
+    """
+    if subrecord in subrecords.episode_subrecords():
+        return "episode_id"
+    return "patient__episode"
+
+
+def get_category_slug(category):
+    return slugify(category.display_name)
+
+
+def get_category_from_slug(slug):
+    """
+    The episode category with the slug, or None
+    """
+    for i in episodes.EpisodeCategory.list():
+        if get_category_slug(i) == slug:
+            return i
+
+
+def get_episode_date_field():
+    """
+    The episode field that date ranges and trends are based on,
+    eg start or created
+    """
+    return getattr(settings, "OVERVIEW_EPISODE_DATE_FIELD", "start")
+
+
+def filter_by_date(episode_qs, date_from=None, date_to=None):
+    """
+    The episodes whose date is between date_from and date_to inclusive
+    """
+    date_field = get_episode_date_field()
+    if date_from:
+        episode_qs = episode_qs.filter(
+            **{"{}__gte".format(date_field): date_from}
+        )
+    if date_to:
+        # less than the next day so that datetimes on date_to are included
+        episode_qs = episode_qs.filter(**{
+            "{}__lt".format(date_field): date_to + datetime.timedelta(days=1)
+        })
+    return episode_qs
+
+
+def get_episode_qs(category=None, tagging=None, date_from=None, date_to=None):
+    """
+    All episodes, or those of a category (by its slug) or with a tag,
+    optionally between two dates
+    """
+    episode_qs = omodels.Episode.objects.all()
+    if category:
+        episode_qs = episode_qs.filter(
+            category_name=get_category_from_slug(category).display_name
+        )
+    if tagging:
+        episode_qs = episode_qs.filter(tagging__value=tagging).distinct()
+    return filter_by_date(episode_qs, date_from, date_to)
+
+
+def get_data_version(subrecord):
+    """
+    A cheap token that changes whenever the statistics for a subrecord
+    may have changed, read once per cache.memoised_versions block and
+    cached if the cache is enabled.
+    """
+    return cache.get_memoised_version(
+        subrecord.get_api_name(), partial(calculate_data_version, subrecord)
+    )
+
+
+def calculate_data_version(subrecord):
+    """
+    The data version of a subrecord.
+
+    Adding or deleting rows changes the count, saving a row changes the
+    max created/updated. Patient subrecords are also used by new episodes
+    so the episode table is taken into account for them.
+    """
+    version = subrecord.objects.aggregate(
+        count=Count("id"),
+        max_created=Max("created"),
+        max_updated=Max("updated"),
+    )
+    if subrecord in subrecords.patient_subrecords():
+        version.update(omodels.Episode.objects.aggregate(
+            episode_count=Count("id"),
+            max_episode_id=Max("id"),
+        ))
+    token = "|".join(
+        "{}={}".format(key, version[key]) for key in sorted(version.keys())
+    )
+    return hashlib.md5(token.encode("utf8")).hexdigest()
+
+
+def get_episode_data_version():
+    """
+    A cheap token that changes whenever the episodes that a
+    category, tag or date range filter matches may have changed,
+    read once per cache.memoised_versions block and cached if the
+    cache is enabled.
+    """
+    return cache.get_memoised_version(None, calculate_episode_data_version)
+
+
+def calculate_episode_data_version():
+    version = omodels.Episode.objects.aggregate(
+        count=Count("id"),
+        max_id=Max("id"),
+        max_updated=Max("updated"),
+    )
+    version.update({
+        "tagging_{}".format(key): value
+        for key, value in omodels.Tagging.objects.aggregate(
+            count=Count("id"),
+            max_id=Max("id"),
+            archived=Sum(Case(
+                When(archived=True, then=1),
+                default=0,
+                output_field=IntegerField()
+            )),
+        ).items()
+    })
+    token = "|".join(
+        "{}={}".format(key, version[key]) for key in sorted(version.keys())
+    )
+    return hashlib.md5(token.encode("utf8")).hexdigest()
+
+
+def get_all_populated(subrecord):
+    """
+    All populated subrecords, for singletons populated
+    means they have an updated flag.
+
+    Singletons are created empty with every episode or patient, so
+    most rows can be unpopulated. The filter is written as the
+    predicate of the partial index that overview_index_advisor
+    suggests, so that the empty rows are not read at all.
     """
-    is_episode_subrecord = subrecord in subrecords.episode_subrecords()
     if subrecord._is_singleton:
-        populated = subrecord.objects.exclude(updated=None)
-    else:
-        populated = subrecord.objects.all()
+        return subrecord.objects.filter(updated__isnull=False)
+    return subrecord.objects.all()
+
+
+def get_populated(subrecord, episode_qs):
+    """
+    All populated subrecords in an episode_qs, without the
+    distinct, so that the result can be aggregated over.
+    """
+    is_episode_subrecord = subrecord in subrecords.episode_subrecords()
+    populated = get_all_populated(subrecord)
 
     if is_episode_subrecord:
-        return populated.filter(episode__in=episode_qs).distinct()
+        return planner.restrict(populated, "episode", episode_qs)
     else:
-        return populated.filter(patient__episode__in=episode_qs).distinct()
+        return planner.restrict(populated, "patient__episode", episode_qs)
+
+
+def get_subrecord_use(subrecord, episode_qs):
+    """
+    Get's all populated subrecords in an episode_qs.
+    For singletons, populated means they have an updated flag
+    """
+    populated = get_populated(subrecord, episode_qs)
+    is_patient_subrecord = subrecord in subrecords.patient_subrecords()
+    if is_patient_subrecord and not planner.is_unrestricted(episode_qs):
+        # joined to each of the patient's episodes
+        return populated.distinct()
+    return populated
+
+
+def get_percentage(id_count, episode_count):
+    """
+    The percentage of episodes, rounded to 2 decimal places
+    """
+    if not episode_count:
+        return 0
+    return round(Decimal(id_count)/episode_count * 100, 2)
 
 
 def get_probability_an_episode_uses_a_subrecord(
@@ -30,19 +210,13 @@ def get_probability_an_episode_uses_a_subrecord(
 
     (some episodes could have more than one subrecord)
     """
-    subrecord = subrecord_qs.model
-    is_episode_subrecord = subrecord in subrecords.episode_subrecords()
-    if is_episode_subrecord:
-        id_count = subrecord_qs.values_list(
-            "episode_id", flat=True
-        ).distinct().count()
-    else:
-        id_count = subrecord_qs.values_list(
-            "patient__episode", flat=True
-        ).distinct().count()
+    id_count = subrecord_qs.values_list(
+        get_episode_lookup(subrecord_qs.model), flat=True
+    ).distinct().count()
     return round(Decimal(id_count)/episode_qs.count() * 100, 2)
 
 
+@profiled("get_summary_row", lambda display_name, *args: str(display_name))
 def get_summary_row(display_name, subrecord_qs, episode_qs):
     """
     A summary row is a
@@ -57,3 +231,149 @@ def get_summary_row(display_name, subrecord_qs, episode_qs):
             subrecord_qs, episode_qs
         ),
     )
+
+
+def get_sort_name(display_name):
+    """
+    Summary rows are keyed by either a subrecord or a field value
+    """
+    if hasattr(display_name, "get_display_name"):
+        return display_name.get_display_name()
+    return display_name or ""
+
+
+def sort_summary_rows(rows):
+    """
+    Sorts summary rows by probability, then count, then display name
+    """
+    rows = sorted(rows, key=lambda x: get_sort_name(x[0]))
+    rows = sorted(rows, key=lambda x: -x[1])
+    return sorted(rows, key=lambda x: -x[2])
+
+
+@profiled("get_subrecord_use", get_subrecord_label)
+def get_subrecord_aggregates(subrecord, episode_qs):
+    """
+    Returns the total number of populated subrecords and the number
+    of distinct episodes that use them, in a single query.
+    """
+    return get_populated(subrecord, episode_qs).aggregate(
+        total=Count("id", distinct=True),
+        episodes=Count(get_episode_lookup(subrecord), distinct=True)
+    )
+
+
+def get_subrecord_summary_rows(subrecord_models, episode_qs):
+    """
+    The summary rows for many subrecords at once.
+
+    Rather than the 3 queries per subrecord that get_summary_row
+    makes, the episode count is calculated once and each subrecord
+    table is aggregated with a single query.
+
+    The subrecords are aggregated in parallel if OVERVIEW_WORKERS is set.
+    """
+    episode_count = cache.get_or_compute(
+        "episode_count", episode_qs.count, querysets=[episode_qs]
+    )
+
+    def aggregate(subrecord):
+        return cache.get_or_compute(
+            "subrecord_aggregates",
+            partial(get_subrecord_aggregates, subrecord, episode_qs),
+            subrecord=subrecord,
+            querysets=[episode_qs]
+        )
+
+    subrecord_models = list(subrecord_models)
+    all_aggregates = parallel.map(aggregate, subrecord_models)
+    rows = []
+    for subrecord, aggregates in zip(subrecord_models, all_aggregates):
+        rows.append((
+            subrecord,
+            aggregates["total"],
+            get_percentage(aggregates["episodes"], episode_count),
+        ))
+    return sort_summary_rows(rows)
+
+
+def get_episode_counts_by(lookup):
+    """
+    The number of episodes for each value of an episode lookup,
+    eg category_name or tagging__value, in a single grouped query.
+    """
+    return dict(
+        omodels.Episode.objects.exclude(
+            **{"{}__isnull".format(lookup): True}
+        ).values_list(lookup).annotate(Count("id", distinct=True))
+    )
+
+
+@profiled("get_subrecord_use_by", get_subrecord_label)
+def get_subrecord_use_by(subrecord, lookup):
+    """
+    The total populated subrecords and the number of episodes
+    that use them for each value of an episode lookup, in a single
+    grouped query.
+
+    Returns a dict of value to dict(total=, episodes=)
+    """
+    if subrecord in subrecords.episode_subrecords():
+        group_by = "episode__{}".format(lookup)
+    else:
+        group_by = "patient__episode__{}".format(lookup)
+
+    qs = get_all_populated(subrecord).exclude(
+        **{"{}__isnull".format(group_by): True}
+    ).values(group_by).annotate(
+        total=Count("id", distinct=True),
+        episodes=Count(get_episode_lookup(subrecord), distinct=True)
+    )
+    return {
+        row[group_by]: dict(total=row["total"], episodes=row["episodes"])
+        for row in qs
+    }
+
+
+def get_breakdown(subrecord_models, lookup):
+    """
+    The use of every subrecord broken down by every value of an
+    episode lookup, eg category_name or tagging__value.
+
+    Costs one query for the episode counts and one grouped query per
+    subrecord, however many values there are.
+
+    Returns the sorted values and a list of rows of
+    (subrecord, [(total, percentage) for each value])
+    """
+    episode_counts = cache.get_or_compute(
+        "episode_counts_by_{}".format(lookup),
+        partial(get_episode_counts_by, lookup),
+    )
+    columns = sorted(episode_counts.keys())
+    rows = []
+    empty = dict(total=0, episodes=0)
+
+    def use_by(subrecord):
+        return cache.get_or_compute(
+            "subrecord_use_by_{}".format(lookup),
+            partial(get_subrecord_use_by, subrecord, lookup),
+            subrecord=subrecord
+        )
+
+    subrecord_models = list(subrecord_models)
+    all_use = parallel.map(use_by, subrecord_models)
+
+    for subrecord, use in zip(subrecord_models, all_use):
+        cells = []
+        for column in columns:
+            column_use = use.get(column, empty)
+            cells.append((
+                column_use["total"],
+                get_percentage(
+                    column_use["episodes"], episode_counts[column]
+                ),
+            ))
+        rows.append((subrecord, cells))
+    rows = sorted(rows, key=lambda x: get_sort_name(x[0]))
+    return columns, rows
@@ -0,0 +1,87 @@
+"""
+Runs independent overview calculations across a pool of threads.
+
+The pool size is set with settings.OVERVIEW_WORKERS, the default of 1
+runs everything serially in the request's thread. Each thread uses its
+own database connection, which is closed once all of the work is done.
+"""
+try:
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue
+
+from django.conf import settings
+from django.db import connections
+
+from overview import cache, database, profiling
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the futures backport
+    ThreadPoolExecutor = None
+
+
+def get_workers():
+    return getattr(settings, "OVERVIEW_WORKERS", 1)
+
+
+def run_worker(
+    func, pending, results, reading=False, versions=None, profile=None
+):
+    """
+    Runs func on items taken from pending until it is empty, reading
+    from the overview database and sharing the data versions and
+    profile of the calling thread. The thread's connections are
+    closed once, when there is nothing left for it to do.
+    """
+    try:
+        with cache.memoised_versions(versions), profiling.attached(profile):
+            if reading:
+                with database.reading(check=False):
+                    run_pending(func, pending, results)
+            else:
+                run_pending(func, pending, results)
+    finally:
+        connections.close_all()
+
+
+def run_pending(func, pending, results):
+    while True:
+        try:
+            index, item = pending.get_nowait()
+        except queue.Empty:
+            return
+        results[index] = func(item)
+
+
+def map(func, items):
+    """
+    Returns [func(i) for i in items], calculated in parallel if
+    OVERVIEW_WORKERS is more than 1.
+
+    Results are always in the order of items.
+    """
+    items = list(items)
+    workers = min(get_workers(), len(items))
+    if workers <= 1 or ThreadPoolExecutor is None:
+        return [func(i) for i in items]
+    pending = queue.Queue()
+    for i in enumerate(items):
+        pending.put(i)
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                run_worker, func, pending, results,
+                database.is_reading(),
+                cache.get_memoised_versions(),
+                profiling.get_context()
+            )
+            for _ in range(workers)
+        ]
+    for future in futures:
+        # re-raises the first exception of each worker
+        future.result()
+    return results
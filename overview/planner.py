@@ -0,0 +1,97 @@
+"""
+Chooses how overview queries are restricted to a set of episodes.
+
+All episodes need no restriction, so subrecord tables are aggregated
+without a subquery or a DISTINCT. Sets of up to
+settings.OVERVIEW_EPISODE_ID_LIST_SIZE episodes (default 500) are read
+once into a list of ids that the database looks up directly in the
+subrecord's index. Larger sets are an IN subquery without ordering or
+DISTINCT, which databases plan as a semi join, the same as EXISTS.
+"""
+import threading
+import weakref
+
+from django.conf import settings
+from opal import models as omodels
+
+# the ids read for each episode queryset, so that they are read
+# once however many subrecords are restricted by it
+_ids = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_id_list_size():
+    return getattr(settings, "OVERVIEW_EPISODE_ID_LIST_SIZE", 500)
+
+
+def is_unrestricted(episode_qs):
+    """
+    True if the queryset is every episode
+    """
+    query = episode_qs.query
+    return (
+        episode_qs.model is omodels.Episode and
+        not query.where.children and
+        query.low_mark == 0 and
+        query.high_mark is None
+    )
+
+
+def get_subquery(episode_qs, field_name):
+    """
+    The values of an episode field as a subquery, without the ordering
+    or DISTINCT, which do not change the result of an IN.
+    """
+    qs = episode_qs.order_by().values_list(field_name, flat=True)
+    qs.query.distinct = False
+    return qs
+
+
+def get_ids(episode_qs, field_name="id"):
+    """
+    The values of an episode field, eg id or patient_id, for an
+    __in lookup. A list if there are few of them, otherwise a subquery.
+    """
+    with _lock:
+        found = _ids.get(episode_qs, {}).get(field_name)
+    if found is not None:
+        return found
+
+    limit = get_id_list_size()
+    # distinct before the slice, as patients have many episodes and
+    # joins to tags repeat them, so limit + 1 rows can hide more ids
+    ids = sorted(
+        get_subquery(episode_qs, field_name).distinct()[:limit + 1]
+    )
+    if len(ids) > limit:
+        ids = get_subquery(episode_qs, field_name)
+
+    with _lock:
+        _ids.setdefault(episode_qs, {})[field_name] = ids
+    return ids
+
+
+def restrict(qs, relation, episode_qs):
+    """
+    Restricts qs to the rows whose relation, eg episode or
+    patient__episode, is in episode_qs.
+
+    If episode_qs is every episode, qs is returned unchanged, for
+    patient subrecords that includes any patients without episodes.
+    """
+    if is_unrestricted(episode_qs):
+        return qs
+    return qs.filter(
+        **{"{}__in".format(relation): get_ids(episode_qs)}
+    )
+
+
+def restrict_to_patients(qs, episode_qs):
+    """
+    Restricts a patient subrecord qs to the patients of episode_qs
+    without joining to the episodes, so rows are not repeated for
+    patients with many episodes.
+    """
+    if is_unrestricted(episode_qs):
+        return qs
+    return qs.filter(patient_id__in=get_ids(episode_qs, "patient_id"))
@@ -0,0 +1,256 @@
+"""
+Records the number of queries, database time and wall time of each
+stage of an overview page.
+
+Enabled with settings.OVERVIEW_PROFILING. Each stage is logged as a
+JSON line to the overview.profiling logger and the stages of a page
+are shown in a debug panel at the bottom of it.
+
+Queries are counted by a cursor wrapper on the connections of the
+thread that started the profile and of the worker threads it starts,
+see overview.parallel.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.utils import CursorDebugWrapper
+
+from overview import database
+
+logger = logging.getLogger("overview.profiling")
+_local = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, "OVERVIEW_PROFILING", False)
+
+
+def get_connections():
+    """
+    The default connection and the one overview queries are read
+    from, if that is a different database
+    """
+    aliases = [DEFAULT_DB_ALIAS]
+    if database.get_alias() != DEFAULT_DB_ALIAS:
+        aliases.append(database.get_alias())
+    return [connections[i] for i in aliases]
+
+
+class ProfilingCursor(CursorDebugWrapper):
+    """
+    Records each query in the profile and the stages that the
+    thread running it is in
+    """
+    def execute(self, sql, params=None):
+        started = time.time()
+        try:
+            return super(ProfilingCursor, self).execute(sql, params)
+        finally:
+            record_query(time.time() - started)
+
+    def executemany(self, sql, param_list):
+        started = time.time()
+        try:
+            return super(ProfilingCursor, self).executemany(sql, param_list)
+        finally:
+            record_query(time.time() - started)
+
+
+def wrap_cursors():
+    """
+    Connections are per thread, so this is called by every
+    thread that records queries
+    """
+    for connection in get_connections():
+        connection.force_debug_cursor = True
+        connection.make_debug_cursor = functools.partial(
+            ProfilingCursor, db=connection
+        )
+
+
+def unwrap_cursors():
+    for connection in get_connections():
+        connection.force_debug_cursor = False
+        # falls back to the backend's own make_debug_cursor
+        connection.__dict__.pop("make_debug_cursor", None)
+
+
+def record_query(db_time):
+    profile = get_profile()
+    if profile is not None:
+        profile.record_query(get_active_stages(), db_time)
+
+
+class Stage(object):
+    def __init__(self, name, label, queries=0, db_time=0, wall_time=0):
+        self.name = name
+        self.label = label
+        self.queries = queries
+        self.db_time = db_time
+        self.wall_time = wall_time
+
+    def to_dict(self):
+        return dict(
+            name=self.name,
+            label=self.label,
+            queries=self.queries,
+            db_time=round(self.db_time, 4),
+            wall_time=round(self.wall_time, 4),
+        )
+
+
+class Profile(object):
+    """
+    The stages of a page, which are recorded by the thread that
+    started the profile and by the worker threads it starts, see
+    get_context.
+    """
+    def __init__(self, path=""):
+        self.path = path
+        self.stages = []
+        self.started = time.time()
+        self.finished = None
+        self.queries = 0
+        self.db_time = 0
+        self.lock = threading.Lock()
+
+    def record_query(self, stages, db_time):
+        with self.lock:
+            self.queries += 1
+            self.db_time += db_time
+            for i in stages:
+                i.queries += 1
+                i.db_time += db_time
+
+    def add_stage(self, recorded):
+        with self.lock:
+            self.stages.append(recorded)
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def wall_time(self):
+        return (self.finished or time.time()) - self.started
+
+    def slowest(self, amount=10):
+        return sorted(self.stages, key=lambda x: -x.db_time)[:amount]
+
+    def log(self):
+        logger.info(json.dumps(dict(
+            path=self.path,
+            queries=self.queries,
+            wall_time=round(self.wall_time, 4),
+            stages=len(self.stages),
+        )))
+
+
+def start(path=""):
+    _local.profile = Profile(path)
+    _local.stages = []
+    wrap_cursors()
+    return _local.profile
+
+
+def stop():
+    profile = get_profile()
+    _local.profile = None
+    _local.stages = []
+    if profile is not None:
+        profile.finish()
+        unwrap_cursors()
+    return profile
+
+
+def get_profile():
+    return getattr(_local, "profile", None)
+
+
+def get_active_stages():
+    """
+    The stages the current thread is in, outermost first
+    """
+    if not hasattr(_local, "stages"):
+        _local.stages = []
+    return _local.stages
+
+
+def get_context():
+    """
+    The profile and stages of the current thread, for worker
+    threads to record their queries and stages in, or None
+    """
+    profile = get_profile()
+    if profile is None:
+        return None
+    return profile, list(get_active_stages())
+
+
+@contextmanager
+def attached(context):
+    """
+    Records the queries and stages of the block, run in a worker
+    thread, in the profile and stages of the thread that started it
+    """
+    if context is None or get_profile() is not None:
+        yield
+        return
+    _local.profile, stages = context
+    _local.stages = list(stages)
+    wrap_cursors()
+    try:
+        yield
+    finally:
+        unwrap_cursors()
+        _local.profile = None
+        _local.stages = []
+
+
+@contextmanager
+def stage(name, label=""):
+    """
+    Records the queries and time taken by the wrapped code
+    if a profile has been started.
+    """
+    profile = get_profile()
+    if profile is None:
+        yield
+        return
+    recorded = Stage(name, label)
+    stages = get_active_stages()
+    stages.append(recorded)
+    started = time.time()
+    try:
+        yield
+    finally:
+        stages.remove(recorded)
+        recorded.wall_time = time.time() - started
+        profile.add_stage(recorded)
+        logger.info(json.dumps(recorded.to_dict()))
+
+
+def profiled(name, get_label=None):
+    """
+    Decorates a function so that each call is recorded as a stage.
+
+    get_label is called with the function's arguments and
+    returns the label of the stage, eg the subrecord.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_profile() is None:
+                return func(*args, **kwargs)
+            label = ""
+            if get_label is not None:
+                label = get_label(*args, **kwargs)
+            with stage(name, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,155 @@
+"""
+Precomputed overview statistics across all episodes.
+
+Snapshots are taken by the overview_snapshot management command and
+are served by the views in place of live queries when they exist.
+"""
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from opal import models as omodels
+
+from overview import fields, overview_utils
+from overview.models import SubrecordSnapshot, FieldSnapshot, ValueSnapshot
+
+
+def get_snapshot(subrecord):
+    return SubrecordSnapshot.objects.filter(
+        api_name=subrecord.get_api_name()
+    ).first()
+
+
+def save_field_snapshot(subrecord_snapshot, field):
+    distribution_json = None
+    if isinstance(field, fields.TypedField):
+        distribution_json = json.dumps(field.distribution)
+    field_snapshot = FieldSnapshot.objects.create(
+        subrecord_snapshot=subrecord_snapshot,
+        field_name=field.field_name,
+        total=field.total_count(),
+        populated=field.total_populated(),
+        distribution_json=distribution_json,
+    )
+    if isinstance(field, fields.ForeignKeyOrFreeTextField):
+        values = [(False, i) for i in field.top_uncoded]
+        values.extend((True, i) for i in field.top_coded)
+        ValueSnapshot.objects.bulk_create([
+            ValueSnapshot(
+                field_snapshot=field_snapshot,
+                coded=coded,
+                value=value,
+                count=count
+            ) for coded, (value, count) in values
+        ])
+    return field_snapshot
+
+
+def take_snapshot(subrecord, force=False):
+    """
+    Snapshots the statistics of a subrecord, if its data has
+    changed since the last snapshot.
+
+    Returns the snapshot and whether it was recalculated.
+    """
+    data_version = overview_utils.get_data_version(subrecord)
+    snapshot = get_snapshot(subrecord)
+
+    if snapshot and snapshot.data_version == data_version and not force:
+        return snapshot, False
+
+    episode_qs = omodels.Episode.objects.all()
+    aggregates = overview_utils.get_subrecord_aggregates(
+        subrecord, episode_qs
+    )
+
+    with transaction.atomic():
+        if snapshot is None:
+            snapshot = SubrecordSnapshot(api_name=subrecord.get_api_name())
+        else:
+            snapshot.fields.all().delete()
+        snapshot.data_version = data_version
+        snapshot.total = aggregates["total"]
+        snapshot.episodes = aggregates["episodes"]
+        snapshot.computed = timezone.now()
+        snapshot.save()
+
+        field_names = fields.get_field_names(subrecord)
+        field_stats = fields.get_field_stats(
+            episode_qs, subrecord, field_names
+        )
+        for field_name in field_names:
+            save_field_snapshot(
+                snapshot,
+                fields.get_field(
+                    episode_qs,
+                    subrecord,
+                    field_name,
+                    stats=field_stats[field_name]
+                )
+            )
+    return snapshot, True
+
+
+def get_version(subrecord_models):
+    """
+    A token that changes whenever the snapshots of the
+    subrecords are taken
+    """
+    rows = SubrecordSnapshot.objects.filter(
+        api_name__in=[i.get_api_name() for i in subrecord_models]
+    ).order_by("api_name").values_list(
+        "api_name", "data_version", "computed"
+    )
+    return "|".join(
+        "{}={}:{}".format(api_name, data_version, computed.isoformat())
+        for api_name, data_version, computed in rows
+    )
+
+
+def get_subrecord_summary_rows(subrecord_models, episode_qs):
+    """
+    The same rows as overview_utils.get_subrecord_summary_rows
+    but read from the snapshots.
+
+    Returns None unless every subrecord has a snapshot.
+    """
+    snapshots = {
+        i.api_name: i for i in SubrecordSnapshot.objects.all()
+    }
+    if not all(i.get_api_name() in snapshots for i in subrecord_models):
+        return None
+
+    episode_count = episode_qs.count()
+    rows = []
+    for subrecord in subrecord_models:
+        snapshot = snapshots[subrecord.get_api_name()]
+        rows.append((
+            subrecord,
+            snapshot.total,
+            overview_utils.get_percentage(snapshot.episodes, episode_count),
+        ))
+    return overview_utils.sort_summary_rows(rows)
+
+
+def get_fields(subrecord, episode_qs):
+    """
+    Fields that read their statistics from the subrecord's snapshot.
+
+    Returns None if there is no snapshot.
+    """
+    snapshot = get_snapshot(subrecord)
+    if snapshot is None:
+        return None
+    field_snapshots = {
+        i.field_name: i for i in snapshot.fields.prefetch_related("values")
+    }
+    result = []
+    for field_name in fields.get_field_names(subrecord):
+        result.append(fields.get_field(
+            episode_qs,
+            subrecord,
+            field_name,
+            stats=field_snapshots.get(field_name)
+        ))
+    return result
@@ -0,0 +1,50 @@
+/*
+ * Fills in the fields of a progressive overview detail page.
+ *
+ * Each placeholder has the url of the field's statistics in its
+ * data-overview-field attribute. They are all requested as soon as
+ * the page loads, so the browser fetches them in parallel, and each
+ * is replaced by the field's html when it arrives.
+ */
+(function(){
+  "use strict";
+
+  var loadField = function(placeholder){
+    var request = new XMLHttpRequest();
+    request.open("GET", placeholder.getAttribute("data-overview-field"));
+    request.setRequestHeader("Accept", "application/json");
+    request.onload = function(){
+      if(request.status === 200){
+        placeholder.innerHTML = JSON.parse(request.responseText).html;
+      }
+      else{
+        showError(placeholder);
+      }
+    };
+    request.onerror = function(){
+      showError(placeholder);
+    };
+    request.send();
+  };
+
+  var showError = function(placeholder){
+    var status = placeholder.querySelector("[data-overview-field-status]");
+    if(status){
+      status.textContent = "Unable to load this field, please reload the page";
+    }
+  };
+
+  var loadFields = function(){
+    var placeholders = document.querySelectorAll("[data-overview-field]");
+    for(var i = 0; i < placeholders.length; i++){
+      loadField(placeholders[i]);
+    }
+  };
+
+  if(document.readyState === "loading"){
+    document.addEventListener("DOMContentLoaded", loadFields);
+  }
+  else{
+    loadFields();
+  }
+})();
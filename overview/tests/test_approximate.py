@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import random
+
+from django.test import override_settings
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import approximate, overview_utils, fields
+
+
+class EstimateTestCase(OpalTestCase):
+    def test_str(self):
+        self.assertEqual(str(approximate.Estimate(10, 2)), "~10 ± 2")
+        self.assertEqual(str(approximate.Estimate(10, 0)), "10")
+
+    def test_exact_equals_number(self):
+        self.assertEqual(approximate.Estimate(10, 0), 10)
+        self.assertNotEqual(approximate.Estimate(10, 1), 10)
+
+
+class IdSampleTestCase(OpalTestCase):
+    @override_settings(OVERVIEW_APPROXIMATE=dict(SAMPLE_SIZE=100, BLOCKS=10))
+    def test_blocks(self):
+        sample = approximate.IdSample(1, 1000, rand=random.Random(0))
+        self.assertEqual(len(sample.blocks), 10)
+        self.assertEqual(sample.block_length, 10)
+        self.assertEqual(sample.population, 100)
+        self.assertEqual(sample.fraction, 0.1)
+        for start, end in sample.blocks:
+            self.assertEqual(end - start + 1, 10)
+            self.assertEqual((start - 1) % 10, 0)
+
+    @override_settings(OVERVIEW_APPROXIMATE=dict(SAMPLE_SIZE=100))
+    def test_small(self):
+        sample = approximate.IdSample(1, 50)
+        self.assertTrue(sample.is_exact())
+        self.assertEqual(sample.blocks, [(1, 50)])
+
+
+class ApproximateStatsTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient_1, self.episode_1 = self.new_patient_and_episode_please()
+        self.patient_2, self.episode_2 = self.new_patient_and_episode_please()
+        for dog in ["Alsation", "alsation", "basset"]:
+            hound_owner = HoundOwner.objects.create(episode=self.episode_1)
+            hound_owner.dog = dog
+            hound_owner.save()
+        FavouriteNumber.objects.create(patient=self.patient_2)
+
+    @override_settings(OVERVIEW_APPROXIMATE=dict(THRESHOLD=0))
+    def test_exact_when_sample_covers_table(self):
+        episode_qs = omodels.Episode.objects.all()
+        self.assertEqual(
+            approximate.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], episode_qs
+            ),
+            overview_utils.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], episode_qs
+            )
+        )
+
+    @override_settings(OVERVIEW_APPROXIMATE=dict(THRESHOLD=0))
+    def test_top_uncoded(self):
+        field = fields.get_field(
+            omodels.Episode.objects.all(), HoundOwner, "dog", approximate=True
+        )
+        self.assertEqual(
+            field.top_uncoded,
+            [("alsation", approximate.Estimate(2, 0)), ("basset", 1)]
+        )
+
+    @override_settings(OVERVIEW_APPROXIMATE=dict(THRESHOLD=10))
+    def test_small_tables_exact(self):
+        self.assertFalse(approximate.is_large(HoundOwner))
+
+    def test_estimate_percentage(self):
+        estimate = approximate.estimate_percentage(50, 100, 0.1)
+        self.assertEqual(estimate.value, 50)
+        self.assertEqual(estimate.error, round(1.96 * (0.25 / 100 * 0.9) ** 0.5 * 100, 2))
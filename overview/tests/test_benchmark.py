@@ -0,0 +1,39 @@
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import EpisodeName, HoundOwner
+
+from overview import benchmark
+
+
+class GenerateTestCase(OpalTestCase):
+    def test_generate(self):
+        benchmark.generate(20, episodes_per_patient=2, seed=1)
+        self.assertEqual(omodels.Episode.objects.count(), 20)
+        self.assertEqual(omodels.Patient.objects.count(), 10)
+        self.assertEqual(EpisodeName.objects.count(), 20)
+
+    def test_reproducible(self):
+        benchmark.generate(20, seed=1)
+        first = list(HoundOwner.objects.values_list("episode_id", "dog_ft"))
+        HoundOwner.objects.all().delete()
+        omodels.Episode.objects.all().delete()
+        omodels.Patient.objects.all().delete()
+        benchmark.generate(20, seed=1)
+        second = list(HoundOwner.objects.values_list("episode_id", "dog_ft"))
+        self.assertEqual(len(first), len(second))
+        self.assertEqual(
+            sorted(i[1] for i in first), sorted(i[1] for i in second)
+        )
+
+
+class RunTestCase(OpalTestCase):
+    def test_run(self):
+        benchmark.generate(10)
+        report = benchmark.get_report(benchmark.run(repeat=1))
+        self.assertEqual(report["episodes"], 10)
+        self.assertEqual(
+            [i["name"] for i in report["results"]],
+            ["subrecord_summary_rows", "list_view", "detail_view", "get_top_ft"]
+        )
+        for result in report["results"]:
+            self.assertGreater(result["queries"], 0)
@@ -0,0 +1,122 @@
+from django.core.cache import caches
+from django.test import override_settings
+from django.utils import timezone
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner
+
+from overview import cache, overview_utils
+
+CACHE_SETTINGS = dict(ENABLED=True, TIMEOUT=None)
+
+
+@override_settings(OVERVIEW_CACHE=CACHE_SETTINGS)
+class GetOrComputeTestCase(OpalTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_cached(self):
+        self.assertEqual(cache.get_or_compute("test", self.compute), 1)
+        self.assertEqual(cache.get_or_compute("test", self.compute), 1)
+
+    def test_keyed_by_name_and_field(self):
+        cache.get_or_compute("test", self.compute)
+        cache.get_or_compute("other", self.compute)
+        cache.get_or_compute("test", self.compute, field_name="name")
+        self.assertEqual(self.calls, 3)
+
+    def test_keyed_by_queryset(self):
+        cache.get_or_compute(
+            "test", self.compute, querysets=[omodels.Episode.objects.all()]
+        )
+        cache.get_or_compute(
+            "test",
+            self.compute,
+            querysets=[omodels.Episode.objects.filter(category_name="x")]
+        )
+        cache.get_or_compute(
+            "test", self.compute, querysets=[omodels.Episode.objects.none()]
+        )
+        self.assertEqual(self.calls, 3)
+
+    def test_data_version(self):
+        _, episode = self.new_patient_and_episode_please()
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        HoundOwner.objects.create(episode=episode, created=timezone.now())
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        self.assertEqual(self.calls, 2)
+
+    def test_data_version_cached(self):
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        with self.assertNumQueries(0):
+            cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        self.assertEqual(self.calls, 1)
+
+    def test_data_version_tagged(self):
+        _, episode = self.new_patient_and_episode_please()
+        cache.get_or_compute("test", self.compute)
+        omodels.Tagging.objects.create(episode=episode, value="heroes")
+        cache.get_or_compute("test", self.compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_episode_data_version(self):
+        cache.get_or_compute("test", self.compute)
+        self.new_patient_and_episode_please()
+        cache.get_or_compute("test", self.compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_memoised_versions(self):
+        with cache.memoised_versions():
+            cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+            with self.assertNumQueries(0):
+                cache.get_or_compute(
+                    "test", self.compute, subrecord=HoundOwner
+                )
+        self.assertIsNone(cache.get_memoised_versions())
+
+    def test_invalidate_subrecord(self):
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        cache.get_or_compute("test", self.compute)
+        cache.invalidate(HoundOwner)
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        cache.get_or_compute("test", self.compute)
+        self.assertEqual(self.calls, 3)
+
+    def test_invalidate_all(self):
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        cache.invalidate()
+        cache.get_or_compute("test", self.compute, subrecord=HoundOwner)
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(OVERVIEW_CACHE=dict(ENABLED=False))
+    def test_disabled(self):
+        cache.get_or_compute("test", self.compute)
+        cache.get_or_compute("test", self.compute)
+        self.assertEqual(self.calls, 2)
+
+
+@override_settings(OVERVIEW_CACHE=CACHE_SETTINGS)
+class CachedSummaryRowsTestCase(OpalTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        _, self.episode = self.new_patient_and_episode_please()
+        HoundOwner.objects.create(episode=self.episode)
+
+    def test_summary_rows_cached(self):
+        episode_qs = omodels.Episode.objects.all()
+        result = overview_utils.get_subrecord_summary_rows(
+            [HoundOwner], episode_qs
+        )
+        # the data version is cached too
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                overview_utils.get_subrecord_summary_rows(
+                    [HoundOwner], episode_qs
+                ),
+                result
+            )
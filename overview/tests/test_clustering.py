@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.urlresolvers import reverse
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, Dog
+
+from overview import clustering, overview_utils
+
+
+class NormaliseTestCase(OpalTestCase):
+    def test_normalise(self):
+        self.assertEqual(
+            clustering.normalise("  Pénicilin,  V! "), "penicilin v"
+        )
+
+    def test_edit_distance(self):
+        self.assertEqual(
+            clustering.edit_distance("penicilin", "penicillin", 2), 1
+        )
+        self.assertEqual(clustering.edit_distance("cat", "horse", 2), 3)
+
+
+class ClusteringTestCase(OpalTestCase):
+    def setUp(self):
+        clustering._indexes.clear()
+        _, self.episode = self.new_patient_and_episode_please()
+        _, self.other_episode = self.new_patient_and_episode_please()
+        Dog.objects.create(name="Alsatian")
+        for dog in ["alsation", "Alsation ", "alsatian."]:
+            self.create_hound_owner(self.episode, dog)
+        self.create_hound_owner(self.other_episode, "Basset")
+
+    def create_hound_owner(self, episode, dog):
+        hound_owner = HoundOwner.objects.create(episode=episode)
+        hound_owner.dog = dog
+        hound_owner.save()
+
+    def test_get_clusters(self):
+        clusters = clustering.get_clusters(HoundOwner, "dog")
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(clusters[0].count, 3)
+        self.assertEqual(clusters[0].suggestion, "Alsatian")
+        self.assertEqual(len(clusters[0].members), 3)
+        self.assertEqual(clusters[1].name, "Basset")
+        self.assertIsNone(clusters[1].suggestion)
+
+    def test_restricted(self):
+        omodels.Tagging.objects.create(episode=self.other_episode, value="x")
+        clusters = clustering.get_clusters(
+            HoundOwner, "dog", overview_utils.get_episode_qs(tagging="x")
+        )
+        self.assertEqual([(i.name, i.count) for i in clusters], [("Basset", 1)])
+
+    def test_refreshed_incrementally(self):
+        index = clustering.get_index(HoundOwner, "dog")
+        self.create_hound_owner(self.other_episode, "basset")
+        self.assertIs(clustering.get_index(HoundOwner, "dog"), index)
+        self.assertEqual(index.get_clusters()[0].count, 3)
+        self.assertEqual(index.get_clusters()[1].count, 2)
+
+    def test_other_fields_not_blocked(self):
+        # the lock of another field being held does not stop clustering
+        with clustering.get_lock(HoundOwner, "name"):
+            clusters = clustering.get_clusters(HoundOwner, "dog")
+        self.assertEqual(len(clusters), 2)
+
+    def test_rebuilt_after_delete(self):
+        index = clustering.get_index(HoundOwner, "dog")
+        HoundOwner.objects.filter(dog_ft="Basset").delete()
+        rebuilt = clustering.get_index(HoundOwner, "dog")
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(len(rebuilt.get_clusters()), 1)
+
+
+class OverviewClusterViewTestCase(OpalTestCase):
+    def setUp(self):
+        clustering._indexes.clear()
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+
+    def test_get(self):
+        response = self.client.get(reverse("overview_clusters", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="dog"
+        )))
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_free_text(self):
+        response = self.client.get(reverse("overview_clusters", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="name"
+        )))
+        self.assertEqual(response.status_code, 404)
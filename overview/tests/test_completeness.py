@@ -0,0 +1,47 @@
+from django.core.urlresolvers import reverse
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner
+
+from overview import completeness
+
+
+class CompletenessTestCase(OpalTestCase):
+    def setUp(self):
+        _, self.episode = self.new_patient_and_episode_please()
+        hound_owner = HoundOwner.objects.create(episode=self.episode)
+        hound_owner.dog = "Alsation"
+        hound_owner.save()
+        hound_owner = HoundOwner.objects.create(episode=self.episode)
+        hound_owner.dog = ""
+        hound_owner.save()
+
+    def test_get_completeness(self):
+        result = completeness.get_completeness(
+            omodels.Episode.objects.all(), HoundOwner
+        )
+        self.assertEqual(result.total, 2)
+        dog = result.field_names.index("dog")
+        name = result.field_names.index("name")
+        matrix = result.get_matrix()
+        self.assertEqual(matrix[dog][dog], 1)
+        self.assertEqual(matrix[name][name], 2)
+        self.assertEqual(matrix[dog][name], 1)
+        self.assertEqual(matrix[name][dog], 1)
+        top = result.get_top_patterns()
+        self.assertEqual([i[0] for i in top], [1, 1])
+
+    def test_get_bits(self):
+        self.assertEqual(completeness.get_bits(5, 4), [0, 2])
+
+
+class OverviewCompletenessViewTestCase(OpalTestCase):
+    def test_get(self):
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+        response = self.client.get(reverse(
+            "overview_completeness",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        ))
+        self.assertEqual(response.status_code, 200)
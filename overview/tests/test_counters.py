@@ -0,0 +1,136 @@
+from django.test import override_settings
+from django.utils import timezone
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber, EpisodeName
+
+from overview import counters, overview_utils
+from overview.models import SubrecordCounter
+
+
+@override_settings(OVERVIEW_SIGNAL_COUNTERS=True)
+class CountersTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient_1, self.episode_1 = self.new_patient_and_episode_please()
+        self.patient_2, self.episode_2 = self.new_patient_and_episode_please()
+        for subrecord in [HoundOwner, FavouriteNumber, EpisodeName]:
+            counters.reconcile(subrecord)
+        counters.connect()
+
+    def tearDown(self):
+        counters.disconnect()
+
+    def get_counter(self, subrecord):
+        return SubrecordCounter.objects.get(api_name=subrecord.get_api_name())
+
+    def test_reconcile_creates_counters(self):
+        counter = self.get_counter(HoundOwner)
+        self.assertEqual(counter.total, 0)
+        self.assertEqual(counter.fields.count(), 2)
+
+    def test_episode_subrecord_save_and_delete(self):
+        hound_owner = HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_1)
+        counter = self.get_counter(HoundOwner)
+        self.assertEqual(counter.rows, 2)
+        self.assertEqual(counter.total, 2)
+        self.assertEqual(counter.episodes, 1)
+        self.assertEqual(counter.patients, 1)
+        self.assertEqual(counters.reconcile(HoundOwner), {})
+
+        hound_owner.delete()
+        self.assertEqual(self.get_counter(HoundOwner).total, 1)
+        self.assertEqual(counters.reconcile(HoundOwner), {})
+
+    def assert_reconciled(self):
+        for subrecord in [HoundOwner, FavouriteNumber, EpisodeName]:
+            self.assertEqual(counters.reconcile(subrecord, repair=False), {})
+
+    def test_queryset_delete(self):
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_2)
+        FavouriteNumber.objects.create(patient=self.patient_1)
+        FavouriteNumber.objects.create(patient=self.patient_1)
+        HoundOwner.objects.filter(episode=self.episode_1).delete()
+        counter = self.get_counter(HoundOwner)
+        self.assertEqual(counter.episodes, 1)
+        self.assertEqual(counter.patients, 1)
+        FavouriteNumber.objects.all().delete()
+        self.assertEqual(self.get_counter(FavouriteNumber).episodes, 0)
+        self.assert_reconciled()
+
+    def test_episode_delete(self):
+        self.patient_1.create_episode()
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_1)
+        FavouriteNumber.objects.create(patient=self.patient_1)
+        self.episode_1.delete()
+        self.assertEqual(self.get_counter(HoundOwner).episodes, 0)
+        self.assertEqual(self.get_counter(FavouriteNumber).episodes, 1)
+        self.assert_reconciled()
+
+    def test_patient_delete(self):
+        self.patient_1.create_episode()
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_2)
+        FavouriteNumber.objects.create(patient=self.patient_1)
+        FavouriteNumber.objects.create(patient=self.patient_1)
+        self.patient_1.delete()
+        counter = self.get_counter(HoundOwner)
+        self.assertEqual(counter.episodes, 1)
+        self.assertEqual(counter.patients, 1)
+        self.assertEqual(self.get_counter(FavouriteNumber).episodes, 0)
+        self.assert_reconciled()
+
+    def test_patient_subrecord_new_episode(self):
+        FavouriteNumber.objects.create(patient=self.patient_1)
+        self.assertEqual(self.get_counter(FavouriteNumber).episodes, 1)
+        self.patient_1.create_episode()
+        self.assertEqual(self.get_counter(FavouriteNumber).episodes, 2)
+        self.assertEqual(counters.reconcile(FavouriteNumber), {})
+
+    def test_field_populated(self):
+        number = FavouriteNumber.objects.create(patient=self.patient_1)
+        number.number = 3
+        number.save()
+        counter = self.get_counter(FavouriteNumber)
+        self.assertEqual(counter.fields.get(field_name="number").populated, 1)
+        self.assertEqual(counters.reconcile(FavouriteNumber), {})
+
+    def test_singleton_populated_on_update(self):
+        episode_name = self.episode_1.episodename_set.get()
+        self.assertEqual(self.get_counter(EpisodeName).total, 0)
+        episode_name.updated = timezone.now()
+        episode_name.save()
+        self.assertEqual(self.get_counter(EpisodeName).total, 1)
+        self.assertEqual(counters.reconcile(EpisodeName), {})
+
+    def test_reconcile_repairs_drift(self):
+        HoundOwner.objects.create(episode=self.episode_1)
+        SubrecordCounter.objects.update(total=10)
+        self.assertEqual(
+            counters.reconcile(HoundOwner, repair=False), {"total": (10, 1)}
+        )
+        counters.reconcile(HoundOwner)
+        self.assertEqual(self.get_counter(HoundOwner).total, 1)
+
+    def test_get_subrecord_summary_rows(self):
+        HoundOwner.objects.create(episode=self.episode_1)
+        FavouriteNumber.objects.create(patient=self.patient_2)
+        episode_qs = omodels.Episode.objects.all()
+        self.assertEqual(
+            counters.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], episode_qs
+            ),
+            overview_utils.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], episode_qs
+            )
+        )
+
+    @override_settings(OVERVIEW_SIGNAL_COUNTERS=False)
+    def test_get_subrecord_summary_rows_disabled(self):
+        self.assertIsNone(counters.get_subrecord_summary_rows(
+            [HoundOwner], omodels.Episode.objects.all()
+        ))
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.core.urlresolvers import reverse
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import coverage, overview_utils
+
+
+class CoverageTestCase(OpalTestCase):
+    def setUp(self):
+        coverage._owner_ids.clear()
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        self.other_episode = self.patient.create_episode()
+        self.other_patient, self.unused_episode = (
+            self.new_patient_and_episode_please()
+        )
+        HoundOwner.objects.create(episode=self.episode)
+        HoundOwner.objects.create(episode=self.episode)
+        FavouriteNumber.objects.create(patient=self.patient)
+
+    def get_coverages(self, episode_qs):
+        return {
+            i.subrecord: i for i in coverage.get_coverages(
+                [HoundOwner, FavouriteNumber], episode_qs
+            )
+        }
+
+    def test_episode_subrecord(self):
+        hound_owner = self.get_coverages(
+            omodels.Episode.objects.all()
+        )[HoundOwner]
+        self.assertEqual(hound_owner.episode_percentage, Decimal("33.33"))
+        self.assertEqual(hound_owner.patient_percentage, 50)
+        self.assertEqual(hound_owner.mean_per_episode, 0.67)
+        self.assertEqual(hound_owner.mean_per_patient, 1)
+
+    def test_patient_subrecord(self):
+        favourite_number = self.get_coverages(
+            omodels.Episode.objects.all()
+        )[FavouriteNumber]
+        self.assertEqual(
+            favourite_number.episode_percentage, Decimal("66.67")
+        )
+        self.assertEqual(favourite_number.patient_percentage, 50)
+        self.assertEqual(favourite_number.mean_per_episode, 0.67)
+        self.assertEqual(favourite_number.mean_per_patient, 0.5)
+
+    def test_filtered(self):
+        omodels.Tagging.objects.create(episode=self.other_episode, value="x")
+        coverages = self.get_coverages(
+            overview_utils.get_episode_qs(tagging="x")
+        )
+        self.assertEqual(coverages[HoundOwner].episode_percentage, 0)
+        self.assertEqual(coverages[FavouriteNumber].episode_percentage, 100)
+
+    def test_owner_ids_refreshed(self):
+        ids = coverage.get_owner_ids(HoundOwner)
+        self.assertEqual(list(ids), [self.episode.id, self.episode.id])
+        self.assertIs(coverage.get_owner_ids(HoundOwner), ids)
+        HoundOwner.objects.create(episode=self.unused_episode)
+        self.assertEqual(len(coverage.get_owner_ids(HoundOwner)), 3)
+
+
+class OverviewCoverageViewTestCase(OpalTestCase):
+    def test_get(self):
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+        response = self.client.get(reverse("overview_coverage"))
+        self.assertEqual(response.status_code, 200)
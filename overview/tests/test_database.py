@@ -0,0 +1,86 @@
+from django.test import RequestFactory, override_settings
+from opal.core.test import OpalTestCase
+from opal.tests.models import HoundOwner
+
+from overview import database, jobs, views
+from overview.models import OverviewReport
+
+SYNC = dict(ENABLED=True, RUNNER="sync")
+
+
+class RouterTestCase(OpalTestCase):
+    def setUp(self):
+        self.router = database.OverviewRouter()
+
+    @override_settings(OVERVIEW_DATABASE=dict(ALIAS="default"))
+    def test_reading(self):
+        self.assertIsNone(self.router.db_for_read(HoundOwner))
+        with database.reading():
+            self.assertTrue(database.is_reading())
+            self.assertEqual(self.router.db_for_read(HoundOwner), "default")
+            self.assertIsNone(self.router.db_for_read(OverviewReport))
+        self.assertFalse(database.is_reading())
+
+    def test_nested(self):
+        with database.reading():
+            with database.reading():
+                pass
+            self.assertTrue(database.is_reading())
+
+    def test_iterate(self):
+        def read():
+            yield database.is_reading()
+        self.assertEqual(list(database.iterate(read())), [True])
+
+
+class CheckRouterTestCase(OpalTestCase):
+    @override_settings(
+        OVERVIEW_DATABASE=dict(ALIAS="replica"), DATABASE_ROUTERS=[]
+    )
+    def test_missing_router(self):
+        self.assertIn(
+            "overview.W001", [i.id for i in database.check_router(None)]
+        )
+
+    @override_settings(
+        OVERVIEW_DATABASE=dict(ALIAS="replica"),
+        DATABASE_ROUTERS=[database.ROUTER]
+    )
+    def test_router(self):
+        # the test settings have no replica database
+        self.assertEqual(
+            [i.id for i in database.check_router(None)], ["overview.E001"]
+        )
+
+    def test_default(self):
+        self.assertEqual(database.check_router(None), [])
+
+
+class UnavailableListView(views.OverviewSubrecordListView):
+    def get_rows(self):
+        if self.job_result is None:
+            raise database.Unavailable("lagging")
+        return super(UnavailableListView, self).get_rows()
+
+
+class UnavailableTestCase(OpalTestCase):
+    def get_response(self):
+        request = RequestFactory().get("/overview/list")
+        request.user = self.user
+        return UnavailableListView.as_view()(request)
+
+    def test_no_result(self):
+        response = self.get_response()
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_stale_result(self):
+        _, episode = self.new_patient_and_episode_please()
+        HoundOwner.objects.create(episode=episode)
+        report = jobs.get_report("subrecord_list")
+        self.assertEqual(report.status, OverviewReport.DONE)
+        with override_settings(OVERVIEW_BACKGROUND_JOBS={}):
+            response = self.get_response()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data["stale_report"], report)
+        self.assertIn((HoundOwner, 1, 100), response.context_data["subrecords"])
@@ -0,0 +1,127 @@
+import datetime
+
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import FavouriteNumber, HoundOwner
+
+from overview import distributions, fields
+
+
+class SummariseTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, _ = self.new_patient_and_episode_please()
+
+    def summarise_numbers(self, numbers):
+        for number in numbers:
+            FavouriteNumber.objects.create(patient=self.patient, number=number)
+        return distributions.calculate_distributions(
+            FavouriteNumber.objects.all(), FavouriteNumber, ["number"]
+        )["number"]
+
+    def test_numbers(self):
+        summary = self.summarise_numbers(range(1, 11))
+        self.assertEqual(summary["count"], 10)
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 10)
+        self.assertEqual(summary["mean"], 5.5)
+        self.assertIn((50, 5.5), summary["percentiles"])
+        self.assertEqual(
+            [i[2] for i in summary["histogram"]], [1] * 9 + [1]
+        )
+
+    def test_numbers_all_equal(self):
+        summary = self.summarise_numbers([3, 3])
+        self.assertEqual(summary["histogram"], [(3, 3, 2, 100)])
+
+    def test_numbers_query_count(self):
+        self.summarise_numbers(range(1, 11))
+        # the aggregates, the histogram and each percentile
+        with self.assertNumQueries(2 + len(distributions.PERCENTILES)):
+            distributions.calculate_distributions(
+                FavouriteNumber.objects.all(), FavouriteNumber, ["number"]
+            )
+
+    def test_empty(self):
+        self.assertEqual(
+            self.summarise_numbers([]),
+            dict(kind=distributions.NUMERIC, count=0)
+        )
+
+    def summarise_dates(self, dates):
+        omodels.Episode.objects.all().delete()
+        for date in dates:
+            omodels.Episode.objects.create(patient=self.patient, start=date)
+        qs = omodels.Episode.objects.all()
+        return distributions.summarise_dates(
+            qs, "start", qs.aggregate(
+                **distributions.get_aggregates("start", distributions.DATE)
+            )
+        )
+
+    def test_dates(self):
+        summary = self.summarise_dates([
+            datetime.date(2017, 1, 3),
+            datetime.date(2017, 1, 20),
+            datetime.date(2017, 3, 1),
+        ])
+        self.assertEqual(summary["min"], "2017-01-03")
+        self.assertEqual(summary["max"], "2017-03-01")
+        self.assertEqual(
+            summary["histogram"],
+            [("2017-01", 2, 66.67), ("2017-03", 1, 33.33)]
+        )
+
+    def test_dates_by_year(self):
+        summary = self.summarise_dates([
+            datetime.date(2010, 1, 3), datetime.date(2017, 1, 3),
+        ])
+        self.assertEqual(
+            [i[0] for i in summary["histogram"]], ["2010", "2017"]
+        )
+
+    def test_booleans(self):
+        summary = distributions.summarise_booleans({True: 2, False: 1})
+        self.assertEqual(summary["true"], 2)
+        self.assertEqual(summary["false"], 1)
+
+    def test_choices(self):
+        summary = distributions.summarise_choices(
+            {"a": 2, "b": 1},
+            [("a", "Apple"), ("b", "Banana"), ("c", "Cherry")]
+        )
+        self.assertEqual(summary["frequencies"], [
+            ("Apple", 2, 66.67), ("Banana", 1, 33.33), ("Cherry", 0, 0)
+        ])
+
+    def test_choices_non_ascii(self):
+        summary = distributions.summarise_choices(
+            {"a": 1}, [("a", u"Cr\xe8me")]
+        )
+        self.assertEqual(summary["frequencies"], [(u"Cr\xe8me", 1, 100)])
+
+
+class FieldDistributionTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, _ = self.new_patient_and_episode_please()
+        for number in [1, 2, 3, None]:
+            FavouriteNumber.objects.create(patient=self.patient, number=number)
+        self.episode_qs = omodels.Episode.objects.all()
+
+    def test_get_kind(self):
+        self.assertEqual(
+            distributions.get_kind(FavouriteNumber, "number"),
+            distributions.NUMERIC
+        )
+        self.assertIsNone(distributions.get_kind(HoundOwner, "dog"))
+
+    def test_field(self):
+        field = fields.get_field(self.episode_qs, FavouriteNumber, "number")
+        self.assertIsInstance(field, fields.NumericField)
+        self.assertEqual(field.distribution["count"], 3)
+        self.assertEqual(field.distribution["mean"], 2)
+
+    def test_field_stats(self):
+        stats = fields.get_field_stats(
+            self.episode_qs, FavouriteNumber, ["number"]
+        )
+        self.assertEqual(stats["number"].distribution["max"], 3)
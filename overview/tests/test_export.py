@@ -0,0 +1,50 @@
+import json
+
+from django.core.urlresolvers import reverse
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner
+
+from overview import export
+
+
+class ExportTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        self.new_patient_and_episode_please()
+        HoundOwner.objects.create(episode=self.episode)
+        self.episode_qs = omodels.Episode.objects.all()
+
+    def test_subrecords_csv(self):
+        lines = list(export.export(
+            "subrecords", "csv", [HoundOwner], self.episode_qs
+        ))
+        self.assertEqual(lines, [
+            "subrecord,total,percentage_of_episodes\r\n",
+            "hound_owner,1,50.00\r\n",
+        ])
+
+    def test_fields_json_lines(self):
+        lines = list(export.export(
+            "fields", "jsonl", [HoundOwner], self.episode_qs
+        ))
+        rows = [json.loads(i) for i in lines]
+        self.assertEqual(
+            [(i["field"], i["populated"]) for i in rows],
+            [("name", 1), ("dog", 1)]
+        )
+
+    def test_is_lazy(self):
+        with self.assertNumQueries(0):
+            export.export("subrecords", "csv", [HoundOwner], self.episode_qs)
+
+    def test_view(self):
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+        response = self.client.get(reverse(
+            "overview_export", kwargs=dict(report="subrecords", format="csv")
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
@@ -0,0 +1,95 @@
+from django.utils import timezone
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, HatWearer, Hat, Dog, EpisodeName
+
+from overview import fields
+
+
+class GetFieldStatsTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        self.episode_qs = omodels.Episode.objects.all()
+
+    def test_matches_fields(self):
+        Dog.objects.create(name="Beagle")
+        coded = HoundOwner.objects.create(episode=self.episode)
+        coded.dog = "Beagle"
+        coded.save()
+        uncoded = HoundOwner.objects.create(episode=self.episode)
+        uncoded.dog = "Alsation"
+        uncoded.save()
+        empty = HoundOwner.objects.create(episode=self.episode)
+        empty.dog = ""
+        empty.save()
+
+        field_names = fields.get_field_names(HoundOwner)
+        result = fields.get_field_stats(
+            self.episode_qs, HoundOwner, field_names
+        )
+        for field_name in field_names:
+            field = fields.get_field(self.episode_qs, HoundOwner, field_name)
+            self.assertEqual(result[field_name].total, field.total_count())
+            self.assertEqual(
+                result[field_name].populated, field.total_populated()
+            )
+        self.assertEqual(result["dog"].total, 3)
+        self.assertEqual(result["dog"].populated, 2)
+
+    def test_single_query(self):
+        field_names = fields.get_field_names(HoundOwner)
+        with self.assertNumQueries(1):
+            fields.get_field_stats(self.episode_qs, HoundOwner, field_names)
+
+    def test_many_to_many(self):
+        hat_wearer = HatWearer.objects.create(episode=self.episode)
+        hat_wearer.hats.add(Hat.objects.create(name="bowler"))
+        hat_wearer.hats.add(Hat.objects.create(name="top"))
+        HatWearer.objects.create(episode=self.episode)
+        result = fields.get_field_stats(
+            self.episode_qs, HatWearer, ["name", "hats"]
+        )
+        self.assertEqual(result["hats"].total, 2)
+        self.assertEqual(result["hats"].populated, 1)
+
+    def test_empty(self):
+        result = fields.get_field_stats(
+            self.episode_qs, HoundOwner, ["dog"]
+        )
+        self.assertEqual(result["dog"].populated, 0)
+
+
+class FieldWithStatsTestCase(OpalTestCase):
+    def test_reads_stats(self):
+        field = fields.get_field(
+            omodels.Episode.objects.all(),
+            HoundOwner,
+            "dog",
+            stats=fields.FieldStats(4, 1)
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(field.total_count(), 4)
+            self.assertEqual(field.total_populated(), 1)
+            self.assertEqual(field.percentage_populated(), 25)
+
+
+class SingletonTestCase(OpalTestCase):
+    def setUp(self):
+        _, self.episode = self.new_patient_and_episode_please()
+        # an episode whose singleton is created empty
+        self.new_patient_and_episode_please()
+        self.episode_qs = omodels.Episode.objects.all()
+        EpisodeName.objects.filter(episode=self.episode).update(
+            name="Jane", updated=timezone.now()
+        )
+
+    def test_unpopulated_not_counted(self):
+        field = fields.get_field(self.episode_qs, EpisodeName, "name")
+        self.assertEqual(field.total_count(), 1)
+        self.assertEqual(field.total_populated(), 1)
+        self.assertEqual(field.percentage_populated(), 100)
+
+    def test_field_stats(self):
+        result = fields.get_field_stats(self.episode_qs, EpisodeName, ["name"])
+        self.assertEqual(result["name"].total, 1)
+        self.assertEqual(result["name"].populated, 1)
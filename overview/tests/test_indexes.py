@@ -0,0 +1,55 @@
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from opal.core.test import OpalTestCase
+from opal.tests.models import HoundOwner, EpisodeName
+
+from overview import indexes
+
+
+class IndexesTestCase(OpalTestCase):
+    def get_advice(self, subrecord):
+        return {i.suggestion.name: i for i in indexes.advise([subrecord])}
+
+    def test_foreign_key_or_free_text(self):
+        advice = self.get_advice(HoundOwner)
+        lower = advice["tests_houndowner_dog_ft_lower"]
+        self.assertEqual(
+            lower.suggestion.create_sql(),
+            'CREATE INDEX IF NOT EXISTS "tests_houndowner_dog_ft_lower" '
+            'ON "tests_houndowner" (LOWER("dog_ft")) WHERE "dog_ft" > \'\''
+        )
+        # the query filters on the index's condition
+        sql = str(lower.suggestion.qs.query)
+        self.assertIn('"tests_houndowner"."dog_ft" >', sql)
+        self.assertNotIn('NOT ("tests_houndowner"."dog_ft"', sql)
+        self.assertTrue(lower.scans)
+        self.assertFalse(lower.exists)
+        self.assertTrue(lower.recommended)
+        self.assertIn("tests_houndowner_dog_unpopulated", advice)
+
+    def test_singleton(self):
+        advice = self.get_advice(EpisodeName)
+        populated = advice["tests_episodename_populated"].suggestion
+        self.assertEqual(populated.condition, '"updated" IS NOT NULL')
+
+    def test_exists(self):
+        suggestion = indexes.get_suggestions(HoundOwner)[0]
+        with connection.cursor() as cursor:
+            cursor.execute(suggestion.create_sql())
+        advice = self.get_advice(HoundOwner)[suggestion.name]
+        self.assertTrue(advice.exists)
+        self.assertFalse(advice.recommended)
+
+    def test_get_migration(self):
+        suggestions = indexes.get_suggestions(HoundOwner)
+        migration = indexes.get_migration("overview", suggestions)
+        leaf = [
+            i for i in MigrationLoader(connection).graph.leaf_nodes()
+            if i[0] == "overview"
+        ][0]
+        self.assertIn(leaf, migration.dependencies)
+        self.assertEqual(
+            migration.name,
+            "{:04d}_overview_indexes".format(int(leaf[1][:4]) + 1)
+        )
+        self.assertEqual(len(migration.operations), len(suggestions))
@@ -0,0 +1,100 @@
+import datetime
+
+from django.core.urlresolvers import reverse
+from django.test import override_settings
+from django.utils import timezone
+from opal.core.test import OpalTestCase
+from opal.tests.models import HoundOwner
+
+from overview import jobs
+from overview.models import OverviewReport
+
+SYNC = dict(ENABLED=True, RUNNER="sync")
+COMMAND = dict(ENABLED=True, RUNNER="command")
+
+
+class JobsTestCase(OpalTestCase):
+    def setUp(self):
+        _, self.episode = self.new_patient_and_episode_please()
+        hound_owner = HoundOwner.objects.create(episode=self.episode)
+        hound_owner.dog = "Alsation"
+        hound_owner.save()
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_subrecord_list(self):
+        report = jobs.get_report("subrecord_list")
+        self.assertEqual(report.status, OverviewReport.DONE)
+        rows = jobs.load_result(report)
+        self.assertIn((HoundOwner, 1, 100), rows)
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_subrecord_detail(self):
+        report = jobs.get_report(
+            "subrecord_detail", api_name=HoundOwner.get_api_name()
+        )
+        loaded = {i.field_name: i for i in jobs.load_result(report)}
+        self.assertEqual(loaded["dog"].total_populated(), 1)
+        self.assertEqual(loaded["dog"].top_uncoded, [("alsation", 1)])
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_coalesced(self):
+        jobs.get_report("subrecord_list")
+        jobs.get_report("subrecord_list")
+        self.assertEqual(OverviewReport.objects.count(), 1)
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_running_not_claimed(self):
+        report = OverviewReport.objects.create(
+            key=jobs.get_key("subrecord_list"),
+            name="subrecord_list",
+            status=OverviewReport.RUNNING,
+            started=timezone.now()
+        )
+        self.assertFalse(jobs.claim(report))
+        report.started = timezone.now() - datetime.timedelta(days=1)
+        report.save()
+        self.assertTrue(jobs.claim(report))
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_failed(self):
+        report = jobs.get_report("subrecord_detail", api_name="not_a_subrecord")
+        self.assertEqual(report.status, OverviewReport.FAILED)
+        self.assertTrue(report.error)
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_failed_not_retried(self):
+        report = jobs.get_report("subrecord_detail", api_name="not_a_subrecord")
+        self.assertFalse(jobs.claim(report))
+        self.assertFalse(jobs.warm(report))
+        report.started = timezone.now() - datetime.timedelta(days=1)
+        report.save()
+        self.assertTrue(jobs.claim(report))
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_failed_forced(self):
+        report = jobs.get_report("subrecord_detail", api_name="not_a_subrecord")
+        self.assertTrue(jobs.warm(report, force=True))
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=COMMAND)
+    def test_command_runner(self):
+        report = jobs.get_report("subrecord_list")
+        self.assertEqual(report.status, OverviewReport.PENDING)
+        self.assertEqual(jobs.run_pending(), [report.key])
+        report.refresh_from_db()
+        self.assertEqual(report.status, OverviewReport.DONE)
+
+
+class JobViewsTestCase(OpalTestCase):
+    def setUp(self):
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=COMMAND)
+    def test_progress_then_result(self):
+        url = reverse("overview_list")
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, "overview/progress.html")
+        jobs.run_pending()
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, "overview/subrecord_list.html")
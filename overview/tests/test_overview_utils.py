@@ -8,6 +8,7 @@ from opal.tests.models import (
     EpisodeName,  # episode singleton
 )
 from overview import overview_utils
+from overview.field_overviews import fk_or_ft
 
 
 class GetSubrecordUseTestCase(OpalTestCase):
@@ -190,7 +191,7 @@ class GetTopFtTestCase(OpalTestCase):
         ho_3.dog = "basset"
         ho_3.save()
 
-        result = overview_utils.get_top_ft(
+        result = fk_or_ft.get_top_ft(
             HoundOwner.objects.all(),
             "dog",
             omodels.Episode.objects.all(),
@@ -219,3 +220,69 @@ class GetTopFtTestCase(OpalTestCase):
         self.assertEqual(
             result[1][2], 33.33
         )
+
+    def create_hound_owner(self, episode, dog):
+        hound_owner = HoundOwner.objects.create(episode=episode)
+        hound_owner.dog = dog
+        hound_owner.save()
+        return hound_owner
+
+    def test_get_top_ft_display_name_case(self):
+        self.create_hound_owner(self.episode_1, "Alsation")
+        self.create_hound_owner(self.episode_2, "alsation")
+        result = fk_or_ft.get_top_ft(
+            HoundOwner.objects.all(),
+            "dog",
+            omodels.Episode.objects.all(),
+        )
+        self.assertEqual(result, [("Alsation", 2, 66.67)])
+
+    def test_get_top_ft_num_queries(self):
+        for dog in ["alsation", "basset", "beagle", "collie"]:
+            self.create_hound_owner(self.episode_1, dog)
+        with self.assertNumQueries(3):
+            fk_or_ft.get_top_ft(
+                HoundOwner.objects.all(),
+                "dog",
+                omodels.Episode.objects.all(),
+            )
+
+
+class GetSubrecordSummaryRowsTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient_1, self.episode_1 = self.new_patient_and_episode_please()
+        self.patient_2, self.episode_2 = self.new_patient_and_episode_please()
+        self.episode_3 = self.patient_2.create_episode()
+
+    def test_matches_get_summary_row(self):
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_1)
+        FavouriteNumber.objects.create(patient=self.patient_2)
+        episode_qs = omodels.Episode.objects.all()
+        result = overview_utils.get_subrecord_summary_rows(
+            [HoundOwner, FavouriteNumber], episode_qs
+        )
+        self.assertEqual(result, [
+            (FavouriteNumber, 1, 66.67),
+            (HoundOwner, 2, 33.33),
+        ])
+        for subrecord, count, probability in result:
+            qs = overview_utils.get_subrecord_use(subrecord, episode_qs)
+            self.assertEqual(
+                overview_utils.get_summary_row(subrecord, qs, episode_qs),
+                (subrecord, count, probability)
+            )
+
+    def test_one_query_per_subrecord(self):
+        HoundOwner.objects.create(episode=self.episode_1)
+        with self.assertNumQueries(3):
+            overview_utils.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber],
+                omodels.Episode.objects.all()
+            )
+
+    def test_no_episodes(self):
+        result = overview_utils.get_subrecord_summary_rows(
+            [HoundOwner], omodels.Episode.objects.none()
+        )
+        self.assertEqual(result, [(HoundOwner, 0, 0)])
@@ -0,0 +1,51 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import parallel, overview_utils
+
+
+class MapTestCase(TestCase):
+    def test_serial(self):
+        self.assertEqual(
+            parallel.map(lambda x: x * 2, range(5)), [0, 2, 4, 6, 8]
+        )
+
+    @override_settings(OVERVIEW_WORKERS=4)
+    def test_parallel_keeps_order(self):
+        self.assertEqual(
+            parallel.map(lambda x: x * 2, range(20)),
+            [i * 2 for i in range(20)]
+        )
+
+    @override_settings(OVERVIEW_WORKERS=4)
+    def test_empty(self):
+        self.assertEqual(parallel.map(lambda x: x, []), [])
+
+    @override_settings(OVERVIEW_WORKERS=4)
+    def test_raises(self):
+        with self.assertRaises(ZeroDivisionError):
+            parallel.map(lambda x: 1 / x, range(5))
+
+
+class ParallelSummaryRowsTestCase(TransactionTestCase):
+    """
+    A transaction test case, so that the worker threads' connections
+    can see the test data.
+    """
+    def test_matches_serial(self):
+        patient = omodels.Patient.objects.create()
+        episode = patient.create_episode()
+        HoundOwner.objects.create(episode=episode)
+        FavouriteNumber.objects.create(patient=patient)
+        episode_qs = omodels.Episode.objects.all()
+        serial = overview_utils.get_subrecord_summary_rows(
+            [HoundOwner, FavouriteNumber], episode_qs
+        )
+        with override_settings(OVERVIEW_WORKERS=2):
+            self.assertEqual(
+                overview_utils.get_subrecord_summary_rows(
+                    [HoundOwner, FavouriteNumber], episode_qs
+                ),
+                serial
+            )
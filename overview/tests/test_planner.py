@@ -0,0 +1,91 @@
+from django.db.models.query import QuerySet
+from django.test import override_settings
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import planner, overview_utils, fields
+
+
+class IsUnrestrictedTestCase(OpalTestCase):
+    def test_all(self):
+        self.assertTrue(planner.is_unrestricted(omodels.Episode.objects.all()))
+
+    def test_filtered(self):
+        self.assertFalse(planner.is_unrestricted(
+            omodels.Episode.objects.filter(category_name="Inpatient")
+        ))
+
+    def test_sliced(self):
+        self.assertFalse(
+            planner.is_unrestricted(omodels.Episode.objects.all()[:10])
+        )
+
+
+class RestrictTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        self.other_episode = self.patient.create_episode()
+        _, self.unused_episode = self.new_patient_and_episode_please()
+        omodels.Tagging.objects.create(episode=self.episode, value="heroes")
+        omodels.Tagging.objects.create(
+            episode=self.other_episode, value="heroes"
+        )
+        HoundOwner.objects.create(episode=self.episode)
+        HoundOwner.objects.create(episode=self.unused_episode)
+        FavouriteNumber.objects.create(patient=self.patient)
+
+    def test_unrestricted(self):
+        qs = planner.restrict(
+            HoundOwner.objects.all(), "episode", omodels.Episode.objects.all()
+        )
+        self.assertFalse(qs.query.where.children)
+
+    def test_id_list(self):
+        episode_qs = overview_utils.get_episode_qs(tagging="heroes")
+        self.assertEqual(
+            planner.get_ids(episode_qs),
+            [self.episode.id, self.other_episode.id]
+        )
+        self.assertIs(planner.get_ids(episode_qs), planner.get_ids(episode_qs))
+
+    @override_settings(OVERVIEW_EPISODE_ID_LIST_SIZE=1)
+    def test_subquery(self):
+        episode_qs = overview_utils.get_episode_qs(tagging="heroes")
+        ids = planner.get_ids(episode_qs)
+        self.assertIsInstance(ids, QuerySet)
+        self.assertFalse(ids.query.distinct)
+
+    @override_settings(OVERVIEW_EPISODE_ID_LIST_SIZE=2)
+    def test_repeated_patient_ids(self):
+        for _ in range(3):
+            self.patient.create_episode()
+        episode_qs = omodels.Episode.objects.exclude(category_name="")
+        ids = planner.get_ids(episode_qs, "patient_id")
+        self.assertEqual(
+            ids, sorted([self.patient.id, self.unused_episode.patient_id])
+        )
+
+    def check_restricted(self):
+        episode_qs = overview_utils.get_episode_qs(tagging="heroes")
+        rows = overview_utils.get_subrecord_summary_rows(
+            [HoundOwner, FavouriteNumber], episode_qs
+        )
+        self.assertIn((HoundOwner, 1, 50), rows)
+        self.assertIn((FavouriteNumber, 1, 100), rows)
+        self.assertEqual(
+            fields.get_model_qs(episode_qs, FavouriteNumber).count(), 1
+        )
+        self.assertEqual(
+            overview_utils.get_subrecord_use(
+                FavouriteNumber, episode_qs
+            ).count(),
+            1
+        )
+
+    def test_restricted_by_id_list(self):
+        self.check_restricted()
+
+    @override_settings(OVERVIEW_EPISODE_ID_LIST_SIZE=1)
+    def test_restricted_by_subquery(self):
+        self.check_restricted()
@@ -0,0 +1,90 @@
+from django.core.urlresolvers import reverse
+from django.test import TransactionTestCase, override_settings
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import profiling, overview_utils
+
+
+class ProfilingTestCase(OpalTestCase):
+    def tearDown(self):
+        profiling.stop()
+
+    def test_stage_not_started(self):
+        with profiling.stage("test"):
+            omodels.Episode.objects.count()
+        self.assertIsNone(profiling.get_profile())
+
+    def test_stage(self):
+        profile = profiling.start()
+        with profiling.stage("test", "label"):
+            omodels.Episode.objects.count()
+            omodels.Episode.objects.count()
+        profiling.stop()
+        self.assertEqual(len(profile.stages), 1)
+        stage = profile.stages[0]
+        self.assertEqual(stage.name, "test")
+        self.assertEqual(stage.label, "label")
+        self.assertEqual(stage.queries, 2)
+        self.assertEqual(profile.queries, 2)
+
+    def test_profiled(self):
+        profile = profiling.start()
+        overview_utils.get_subrecord_summary_rows(
+            [HoundOwner], omodels.Episode.objects.all()
+        )
+        profiling.stop()
+        self.assertEqual(
+            [(i.name, i.label, i.queries) for i in profile.stages],
+            [("get_subrecord_use", "hound_owner", 1)]
+        )
+
+    @override_settings(OVERVIEW_PROFILING=True)
+    def test_view(self):
+        _, episode = self.new_patient_and_episode_please()
+        HoundOwner.objects.create(episode=episode)
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+        with self.assertLogs("overview.profiling", level="INFO"):
+            response = self.client.get(reverse(
+                "overview_detail_view",
+                kwargs=dict(api_name=HoundOwner.get_api_name())
+            ))
+        self.assertEqual(response.status_code, 200)
+        stage_names = {
+            i.name for i in response.context["overview_profile"].stages
+        }
+        self.assertIn("field_stats", stage_names)
+        self.assertIn("top_uncoded", stage_names)
+        self.assertIsNone(profiling.get_profile())
+
+
+class ParallelProfilingTestCase(TransactionTestCase):
+    """
+    A transaction test case, so that the worker threads' connections
+    can see the test data.
+    """
+    def tearDown(self):
+        profiling.stop()
+
+    @override_settings(OVERVIEW_WORKERS=2)
+    def test_worker_stages(self):
+        profile = profiling.start()
+        with profiling.stage("outer"):
+            overview_utils.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], omodels.Episode.objects.all()
+            )
+        profiling.stop()
+        self.assertEqual(
+            sorted(
+                i.label for i in profile.stages
+                if i.name == "get_subrecord_use"
+            ),
+            ["favourite_number", "hound_owner"]
+        )
+        outer = [i for i in profile.stages if i.name == "outer"][0]
+        # the queries of the worker threads count towards the outer stage
+        self.assertEqual(outer.queries, profile.queries)
+        self.assertTrue(profile.queries >= 2)
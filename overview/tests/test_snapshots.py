@@ -0,0 +1,109 @@
+from django.template.loader import render_to_string
+from django.utils import timezone
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import snapshots, overview_utils
+from overview.models import SubrecordSnapshot
+
+
+class TakeSnapshotTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient_1, self.episode_1 = self.new_patient_and_episode_please()
+        self.patient_2, self.episode_2 = self.new_patient_and_episode_please()
+        hound_owner = HoundOwner.objects.create(episode=self.episode_1)
+        hound_owner.dog = "Alsation"
+        hound_owner.save()
+
+    def test_take_snapshot(self):
+        snapshot, refreshed = snapshots.take_snapshot(HoundOwner)
+        self.assertTrue(refreshed)
+        self.assertEqual(snapshot.total, 1)
+        self.assertEqual(snapshot.episodes, 1)
+        dog = snapshot.fields.get(field_name="dog")
+        self.assertEqual(dog.total, 1)
+        self.assertEqual(dog.populated, 1)
+        self.assertEqual(dog.top_uncoded, [("alsation", 1)])
+        self.assertEqual(dog.top_coded, [])
+
+    def test_unchanged(self):
+        snapshots.take_snapshot(HoundOwner)
+        _, refreshed = snapshots.take_snapshot(HoundOwner)
+        self.assertFalse(refreshed)
+
+    def test_changed(self):
+        snapshots.take_snapshot(HoundOwner)
+        HoundOwner.objects.create(
+            episode=self.episode_2, created=timezone.now()
+        )
+        snapshot, refreshed = snapshots.take_snapshot(HoundOwner)
+        self.assertTrue(refreshed)
+        self.assertEqual(snapshot.total, 2)
+        self.assertEqual(SubrecordSnapshot.objects.count(), 1)
+
+    def test_force(self):
+        snapshots.take_snapshot(HoundOwner)
+        _, refreshed = snapshots.take_snapshot(HoundOwner, force=True)
+        self.assertTrue(refreshed)
+
+
+class GetSubrecordSummaryRowsTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        HoundOwner.objects.create(episode=self.episode)
+
+    def test_no_snapshot(self):
+        self.assertIsNone(snapshots.get_subrecord_summary_rows(
+            [HoundOwner], omodels.Episode.objects.all()
+        ))
+
+    def test_matches_live(self):
+        snapshots.take_snapshot(HoundOwner)
+        snapshots.take_snapshot(FavouriteNumber)
+        episode_qs = omodels.Episode.objects.all()
+        self.assertEqual(
+            snapshots.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], episode_qs
+            ),
+            overview_utils.get_subrecord_summary_rows(
+                [HoundOwner, FavouriteNumber], episode_qs
+            )
+        )
+
+    def test_get_fields(self):
+        self.assertIsNone(
+            snapshots.get_fields(HoundOwner, omodels.Episode.objects.all())
+        )
+        snapshots.take_snapshot(HoundOwner)
+        result = snapshots.get_fields(
+            HoundOwner, omodels.Episode.objects.all()
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [(i.field_name, i.total_populated()) for i in result],
+                [("name", 1), ("dog", 1)]
+            )
+
+
+class TypedFieldSnapshotTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        FavouriteNumber.objects.create(patient=self.patient, number=7)
+
+    def test_distribution(self):
+        snapshot, _ = snapshots.take_snapshot(FavouriteNumber)
+        number = snapshot.fields.get(field_name="number")
+        self.assertEqual(number.distribution["count"], 1)
+        self.assertEqual(number.distribution["max"], 7)
+
+    def test_renders(self):
+        snapshots.take_snapshot(FavouriteNumber)
+        field = [
+            i for i in snapshots.get_fields(
+                FavouriteNumber, omodels.Episode.objects.all()
+            ) if i.field_name == "number"
+        ][0]
+        with self.assertNumQueries(0):
+            html = render_to_string(field.template, dict(field=field))
+        self.assertIn("Number", html)
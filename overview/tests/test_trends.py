@@ -0,0 +1,175 @@
+import datetime
+
+from django.core.cache import caches
+from django.test import override_settings
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner, FavouriteNumber
+
+from overview import cache, trends
+
+
+class BucketTestCase(OpalTestCase):
+    def test_get_buckets_month(self):
+        self.assertEqual(
+            trends.get_buckets(
+                datetime.date(2016, 11, 15),
+                datetime.date(2017, 1, 2),
+                trends.MONTH
+            ),
+            [
+                datetime.date(2016, 11, 1),
+                datetime.date(2016, 12, 1),
+                datetime.date(2017, 1, 1),
+            ]
+        )
+
+    def test_get_buckets_week(self):
+        self.assertEqual(
+            trends.get_buckets(
+                datetime.date(2017, 1, 4),
+                datetime.date(2017, 1, 9),
+                trends.WEEK
+            ),
+            [datetime.date(2017, 1, 2), datetime.date(2017, 1, 9)]
+        )
+
+    def test_get_bucket_datetime(self):
+        self.assertEqual(
+            trends.get_bucket(
+                datetime.datetime(2017, 1, 4, 10, 30), trends.MONTH
+            ),
+            datetime.date(2017, 1, 1)
+        )
+
+    def test_is_closed(self):
+        today = datetime.date(2017, 2, 10)
+        self.assertTrue(
+            trends.is_closed(datetime.date(2017, 1, 1), trends.MONTH, today)
+        )
+        self.assertFalse(
+            trends.is_closed(datetime.date(2017, 2, 1), trends.MONTH, today)
+        )
+
+    def test_get_default_range(self):
+        date_from, date_to = trends.get_default_range(
+            trends.MONTH, today=datetime.date(2017, 2, 10)
+        )
+        self.assertEqual(date_from, datetime.date(2016, 3, 1))
+        self.assertEqual(date_to, datetime.date(2017, 2, 10))
+
+
+class TrendsTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.january = self.new_patient_and_episode_please()
+        self.january.start = datetime.date(2016, 1, 10)
+        self.january.save()
+        self.february = self.patient.create_episode(
+            start=datetime.date(2016, 2, 10)
+        )
+        hound_owner = HoundOwner.objects.create(episode=self.january)
+        hound_owner.dog = "Alsation"
+        hound_owner.save()
+        HoundOwner.objects.create(episode=self.february)
+        FavouriteNumber.objects.create(patient=self.patient)
+        self.episode_qs = omodels.Episode.objects.all()
+
+    def get_row(self, rows, key):
+        return [i[1] for i in rows if i[0] == key][0]
+
+    def test_get_subrecord_trends(self):
+        buckets, rows = trends.get_subrecord_trends(
+            [HoundOwner, FavouriteNumber],
+            self.episode_qs,
+            datetime.date(2016, 1, 1),
+            datetime.date(2016, 3, 31),
+            trends.MONTH
+        )
+        self.assertEqual(buckets, [
+            datetime.date(2016, 1, 1),
+            datetime.date(2016, 2, 1),
+            datetime.date(2016, 3, 1),
+        ])
+        self.assertEqual(
+            self.get_row(rows, HoundOwner), [(1, 100), (1, 100), (0, 0)]
+        )
+        # the patient subrecord is used by both episodes
+        self.assertEqual(
+            self.get_row(rows, FavouriteNumber), [(1, 100), (1, 100), (0, 0)]
+        )
+
+    def test_get_subrecord_trends_by_week(self):
+        buckets, rows = trends.get_subrecord_trends(
+            [HoundOwner],
+            self.episode_qs,
+            datetime.date(2016, 1, 4),
+            datetime.date(2016, 1, 17),
+            trends.WEEK
+        )
+        self.assertEqual(
+            buckets, [datetime.date(2016, 1, 4), datetime.date(2016, 1, 11)]
+        )
+        self.assertEqual(self.get_row(rows, HoundOwner), [(1, 100), (0, 0)])
+
+    def test_week_counts_distinct(self):
+        patient, _ = self.new_patient_and_episode_please()
+        patient.create_episode(start=datetime.date(2016, 3, 7))
+        patient.create_episode(start=datetime.date(2016, 3, 9))
+        FavouriteNumber.objects.create(patient=patient)
+        _, rows = trends.get_subrecord_trends(
+            [FavouriteNumber],
+            omodels.Episode.objects.filter(patient=patient),
+            datetime.date(2016, 3, 7),
+            datetime.date(2016, 3, 13),
+            trends.WEEK
+        )
+        # one subrecord used by both of the week's episodes
+        self.assertEqual(self.get_row(rows, FavouriteNumber), [(1, 100)])
+
+    def test_get_field_trends(self):
+        buckets, rows = trends.get_field_trends(
+            HoundOwner,
+            self.episode_qs,
+            datetime.date(2016, 1, 1),
+            datetime.date(2016, 2, 29),
+            trends.MONTH
+        )
+        self.assertEqual(self.get_row(rows, "dog"), [(1, 100), (1, 100)])
+
+    @override_settings(OVERVIEW_CACHE=dict(ENABLED=True, TIMEOUT=None))
+    def test_closed_buckets_cached(self):
+        caches["default"].clear()
+
+        def get_january():
+            _, rows = trends.get_subrecord_trends(
+                [HoundOwner],
+                self.episode_qs,
+                datetime.date(2016, 1, 1),
+                datetime.date(2016, 1, 31),
+                trends.MONTH
+            )
+            return self.get_row(rows, HoundOwner)[0][0]
+
+        self.assertEqual(get_january(), 1)
+        HoundOwner.objects.create(episode=self.january)
+        self.assertEqual(get_january(), 1)
+        cache.invalidate(HoundOwner)
+        self.assertEqual(get_january(), 2)
+
+    @override_settings(OVERVIEW_CACHE=dict(ENABLED=True, TIMEOUT=None))
+    def test_empty_buckets_cached(self):
+        caches["default"].clear()
+        calls = []
+
+        def compute(buckets):
+            calls.append(buckets)
+            return {}
+
+        buckets = [datetime.date(2016, 1, 1)]
+        for _ in range(2):
+            result = trends.get_series(
+                "empty_trend", compute, buckets, trends.MONTH,
+                subrecord=HoundOwner
+            )
+            self.assertEqual(result, {datetime.date(2016, 1, 1): None})
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,315 @@
+import datetime
+import json
+
+from django.core.urlresolvers import reverse
+from django.test import override_settings
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner
+
+from overview import overview_utils
+from overview import snapshots
+
+
+class OverviewViewTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient, self.episode = self.new_patient_and_episode_please()
+        self.assertTrue(self.client.login(
+            username=self.user.username, password=self.PASSWORD
+        ))
+
+
+class OverviewCategoryListViewTestCase(OverviewViewTestCase):
+    def test_get(self):
+        omodels.Tagging.objects.create(episode=self.episode, value="heroes")
+        response = self.client.get(reverse("overview_home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            ("heroes", reverse("overview_list", kwargs=dict(tagging="heroes"))),
+            response.context["tagging"]
+        )
+
+
+class OverviewSubrecordListViewTestCase(OverviewViewTestCase):
+    def test_all(self):
+        response = self.client.get(reverse("overview_list"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_tagging(self):
+        _, other_episode = self.new_patient_and_episode_please()
+        omodels.Tagging.objects.create(episode=self.episode, value="heroes")
+        HoundOwner.objects.create(episode=self.episode)
+        HoundOwner.objects.create(episode=other_episode)
+        response = self.client.get(
+            reverse("overview_list", kwargs=dict(tagging="heroes"))
+        )
+        self.assertEqual(response.status_code, 200)
+        hound_owner_row = [
+            i for i in response.context["subrecords"] if i[0] == HoundOwner
+        ][0]
+        self.assertEqual(hound_owner_row, (HoundOwner, 1, 100))
+
+    def test_unknown_category(self):
+        response = self.client.get(
+            reverse("overview_list", kwargs=dict(category="not-a-category"))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class DateRangeTestCase(OverviewViewTestCase):
+    def test_filtered(self):
+        self.episode.start = datetime.date(2016, 1, 10)
+        self.episode.save()
+        HoundOwner.objects.create(episode=self.episode)
+        url = reverse("overview_list")
+        response = self.client.get(url, dict(to="2015-12-31"))
+        self.assertIn((HoundOwner, 0, 0), response.context["subrecords"])
+        response = self.client.get(url, {"from": "2016-01-01"})
+        hound_owner_row = [
+            i for i in response.context["subrecords"] if i[0] == HoundOwner
+        ][0]
+        self.assertEqual(hound_owner_row, (HoundOwner, 1, 100))
+        self.assertTrue(
+            response.context["subrecord_rows"][0][3].endswith(
+                "?from=2016-01-01"
+            )
+        )
+
+    def test_exact_keeps_date_range(self):
+        response = self.client.get(
+            reverse("overview_list"), {"from": "2016-01-01"}
+        )
+        self.assertEqual(
+            response.context["exact_query_string"],
+            "?from=2016-01-01&exact=1"
+        )
+
+    def test_invalid_date(self):
+        response = self.client.get(
+            reverse("overview_list"), dict(to="2016-13-01")
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class OverviewTrendViewTestCase(OverviewViewTestCase):
+    def test_get(self):
+        HoundOwner.objects.create(episode=self.episode)
+        response = self.client.get(
+            reverse("overview_trends"), dict(period="week")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["buckets"]), 12)
+
+    def test_subrecord(self):
+        response = self.client.get(reverse(
+            "overview_subrecord_trends",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        ))
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_period(self):
+        response = self.client.get(
+            reverse("overview_trends"), dict(period="fortnight")
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class OverviewDetailViewTestCase(OverviewViewTestCase):
+    def test_get(self):
+        HoundOwner.objects.create(episode=self.episode)
+        url = reverse(
+            "overview_detail_view",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["detail_url"], url)
+
+
+class ProgressiveDetailViewTestCase(OverviewViewTestCase):
+    def test_placeholders(self):
+        url = reverse(
+            "overview_detail_view",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        )
+        response = self.client.get(url, dict(progressive=1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["fields"], [])
+        self.assertIn(
+            (
+                "Dog",
+                reverse("overview_field", kwargs=dict(
+                    api_name=HoundOwner.get_api_name(), field_name="dog"
+                ))
+            ),
+            response.context["placeholders"]
+        )
+
+    @override_settings(OVERVIEW_APPROXIMATE=dict(ENABLED=True))
+    def test_exact_placeholders(self):
+        url = reverse(
+            "overview_detail_view",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        )
+        response = self.client.get(url, dict(progressive=1, exact=1))
+        self.assertIn(
+            (
+                "Dog",
+                reverse("overview_field", kwargs=dict(
+                    api_name=HoundOwner.get_api_name(), field_name="dog"
+                )) + "?exact=1"
+            ),
+            response.context["placeholders"]
+        )
+
+
+class OverviewFieldViewTestCase(OverviewViewTestCase):
+    def test_get(self):
+        HoundOwner.objects.create(episode=self.episode, dog_ft="Spot")
+        HoundOwner.objects.create(episode=self.episode)
+        response = self.client.get(reverse("overview_field", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="dog"
+        )))
+        self.assertEqual(response.status_code, 200)
+        result = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(result["total_count"], 2)
+        self.assertEqual(result["total_populated"], 1)
+        self.assertIn("Spot", result["html"])
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse("overview_field", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="cat"
+        )))
+        self.assertEqual(response.status_code, 404)
+
+
+class OverviewApiTestCase(OverviewViewTestCase):
+    def get_json(self, response):
+        return json.loads(response.content.decode("utf-8"))
+
+    def test_list(self):
+        HoundOwner.objects.create(episode=self.episode)
+        response = self.client.get(reverse("overview_api_list"))
+        self.assertEqual(response.status_code, 200)
+        hound_owner = [
+            i for i in self.get_json(response)["subrecords"]
+            if i["api_name"] == HoundOwner.get_api_name()
+        ][0]
+        self.assertEqual(hound_owner["count"], 1)
+        self.assertEqual(hound_owner["percentage"], 100)
+
+    def test_detail(self):
+        HoundOwner.objects.create(episode=self.episode, name="Jane")
+        response = self.client.get(reverse(
+            "overview_api_detail",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        ))
+        name = [
+            i for i in self.get_json(response)["fields"]
+            if i["field_name"] == "name"
+        ][0]
+        self.assertEqual(name["total_count"], 1)
+        self.assertEqual(name["total_populated"], 1)
+
+    def test_values(self):
+        HoundOwner.objects.create(episode=self.episode, name="Jane")
+        HoundOwner.objects.create(episode=self.episode, name="Jane")
+        HoundOwner.objects.create(episode=self.episode, dog_ft="Spot")
+        url = reverse("overview_api_values", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="name"
+        ))
+        self.assertEqual(
+            self.get_json(self.client.get(url))["top_values"], [["Jane", 2]]
+        )
+        url = reverse("overview_api_values", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="dog"
+        ))
+        self.assertEqual(
+            self.get_json(self.client.get(url))["top_uncoded"], [["spot", 1]]
+        )
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse("overview_api_values", kwargs=dict(
+            api_name=HoundOwner.get_api_name(), field_name="cat"
+        )))
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        url = reverse("overview_api_list")
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_modified(self):
+        url = reverse(
+            "overview_api_detail",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        )
+        etag = self.client.get(url)["ETag"]
+        HoundOwner.objects.create(episode=self.episode)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_snapshot_retaken(self):
+        HoundOwner.objects.create(episode=self.episode)
+        snapshots.take_snapshot(HoundOwner)
+        url = reverse(
+            "overview_api_detail",
+            kwargs=dict(api_name=HoundOwner.get_api_name())
+        )
+        etag = self.client.get(url)["ETag"]
+        snapshots.take_snapshot(HoundOwner, force=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class OverviewBreakdownViewTestCase(OverviewViewTestCase):
+    def test_category(self):
+        HoundOwner.objects.create(episode=self.episode)
+        response = self.client.get(reverse("overview_category_breakdown"))
+        self.assertEqual(response.status_code, 200)
+        columns = [i[0] for i in response.context["columns"]]
+        self.assertEqual(columns, [self.episode.category_name])
+
+    def test_tagging(self):
+        response = self.client.get(reverse("overview_tagging_breakdown"))
+        self.assertEqual(response.status_code, 200)
+
+
+class GetBreakdownTestCase(OpalTestCase):
+    def setUp(self):
+        self.patient_1, self.episode_1 = self.new_patient_and_episode_please()
+        self.patient_2, self.episode_2 = self.new_patient_and_episode_please()
+        omodels.Tagging.objects.create(episode=self.episode_1, value="heroes")
+        omodels.Tagging.objects.create(episode=self.episode_2, value="heroes")
+        omodels.Tagging.objects.create(episode=self.episode_2, value="villains")
+
+    def test_get_breakdown(self):
+        HoundOwner.objects.create(episode=self.episode_1)
+        HoundOwner.objects.create(episode=self.episode_1)
+        columns, rows = overview_utils.get_breakdown(
+            [HoundOwner], "tagging__value"
+        )
+        self.assertEqual(columns, ["heroes", "villains"])
+        self.assertEqual(rows, [(HoundOwner, [(2, 50), (0, 0)])])
+
+    def test_matches_filtered_summary_rows(self):
+        HoundOwner.objects.create(episode=self.episode_2)
+        _, rows = overview_utils.get_breakdown([HoundOwner], "tagging__value")
+        for index, value in enumerate(["heroes", "villains"]):
+            episode_qs = omodels.Episode.objects.filter(
+                tagging__value=value
+            ).distinct()
+            summary = overview_utils.get_subrecord_summary_rows(
+                [HoundOwner], episode_qs
+            )
+            self.assertEqual(summary[0][1:], rows[0][1][index])
+
+    def test_one_query_per_subrecord(self):
+        with self.assertNumQueries(3):
+            overview_utils.get_breakdown(
+                [HoundOwner, HoundOwner], "category_name"
+            )
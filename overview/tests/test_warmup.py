@@ -0,0 +1,76 @@
+from django.test import override_settings
+from opal.core.test import OpalTestCase
+from opal import models as omodels
+from opal.tests.models import HoundOwner
+
+from overview import jobs, warmup
+from overview.models import OverviewReport
+
+SYNC = dict(ENABLED=True, RUNNER="sync")
+
+
+class GetReportsTestCase(OpalTestCase):
+    def setUp(self):
+        _, self.episode = self.new_patient_and_episode_please()
+
+    def test_pages(self):
+        omodels.Tagging.objects.create(episode=self.episode, value="heroes")
+        keys = [i.key for i in warmup.get_reports()]
+        self.assertEqual(keys[0], jobs.get_key("subrecord_list"))
+        self.assertIn(
+            jobs.get_key("subrecord_list", tagging="heroes"), keys
+        )
+        self.assertIn(
+            jobs.get_key("breakdown", lookup="category_name"), keys
+        )
+        self.assertIn(
+            jobs.get_key(
+                "subrecord_detail", api_name=HoundOwner.get_api_name()
+            ),
+            keys
+        )
+
+    @override_settings(OVERVIEW_BACKGROUND_JOBS=SYNC)
+    def test_most_viewed_first(self):
+        api_name = HoundOwner.get_api_name()
+        jobs.get_report("subrecord_detail", api_name=api_name)
+        jobs.get_report("subrecord_detail", api_name=api_name)
+        jobs.get_report("subrecord_detail", api_name=api_name, tagging="heroes")
+        keys = [i.key for i in warmup.get_reports()]
+        self.assertEqual(
+            keys[0], jobs.get_key("subrecord_detail", api_name=api_name)
+        )
+        self.assertEqual(keys[1], jobs.get_key(
+            "subrecord_detail", api_name=api_name, tagging="heroes"
+        ))
+
+
+class WarmUpTestCase(OpalTestCase):
+    def setUp(self):
+        _, self.episode = self.new_patient_and_episode_please()
+        HoundOwner.objects.create(episode=self.episode)
+
+    def test_warm_up(self):
+        result = warmup.warm_up()
+        self.assertFalse(result.skipped)
+        report = OverviewReport.objects.get(key=jobs.get_key("subrecord_list"))
+        self.assertEqual(report.status, OverviewReport.DONE)
+        self.assertIn((HoundOwner, 1, 100), jobs.load_result(report))
+        report = OverviewReport.objects.get(
+            key=jobs.get_key("breakdown", lookup="category_name")
+        )
+        columns, _ = jobs.load_result(report)
+        self.assertEqual(columns, [self.episode.category_name])
+
+    def test_fresh_not_recalculated(self):
+        first = warmup.warm_up()
+        second = warmup.warm_up()
+        self.assertFalse(second.calculated)
+        self.assertEqual(sorted(second.fresh), sorted(first.calculated))
+        forced = warmup.warm_up(force=True)
+        self.assertEqual(sorted(forced.calculated), sorted(first.calculated))
+
+    def test_budget(self):
+        result = warmup.warm_up(budget=0)
+        self.assertFalse(result.calculated)
+        self.assertEqual(result.skipped[0], jobs.get_key("subrecord_list"))
@@ -0,0 +1,374 @@
+"""
+The use of subrecords and the completeness of their fields over time,
+bucketed by the week or month of their episode's date, see
+overview_utils.get_episode_date_field.
+
+Each series costs one grouped query per subrecord however many buckets
+there are. Buckets that have ended are cached forever if OVERVIEW_CACHE
+is enabled so only the current bucket is recalculated, call
+cache.invalidate() if historical data is changed.
+"""
+import datetime
+from functools import partial
+
+from django.db.models import Count, Case, F, When, Value, IntegerField
+from django.db.models.functions import TruncMonth
+from opal.core import subrecords
+
+from overview import cache, fields, overview_utils, parallel, planner
+from overview.profiling import profiled
+
+MONTH = "month"
+WEEK = "week"
+PERIODS = (MONTH, WEEK)
+
+# how far back trends go if no date_from is given, in buckets
+DEFAULT_BUCKETS = 12
+
+# cached for closed buckets without any data, as the cache
+# does not return None values
+EMPTY = {}
+
+
+def get_bucket(value, period):
+    """
+    The first day of the week or month of a date or datetime
+    """
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if period == WEEK:
+        return value - datetime.timedelta(days=value.weekday())
+    return value.replace(day=1)
+
+
+def get_next_bucket(bucket, period):
+    if period == WEEK:
+        return bucket + datetime.timedelta(days=7)
+    return (bucket.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def get_buckets(date_from, date_to, period):
+    """
+    The buckets from the one date_from is in to the one date_to is in
+    """
+    bucket = get_bucket(date_from, period)
+    last = get_bucket(date_to, period)
+    buckets = []
+    while bucket <= last:
+        buckets.append(bucket)
+        bucket = get_next_bucket(bucket, period)
+    return buckets
+
+
+def get_default_range(period, today=None):
+    today = today or datetime.date.today()
+    bucket = get_bucket(today, period)
+    for _ in range(DEFAULT_BUCKETS - 1):
+        bucket = get_bucket(bucket - datetime.timedelta(days=1), period)
+    return bucket, today
+
+
+def is_closed(bucket, period, today=None):
+    """
+    A bucket is closed once it has ended, so new episodes
+    will no longer fall in it
+    """
+    return get_next_bucket(bucket, period) <= (today or datetime.date.today())
+
+
+def get_trunc(lookup, period, buckets):
+    """
+    An expression of the bucket of each row, so that distinct
+    counts are made per bucket by the database
+    """
+    if period == MONTH:
+        return TruncMonth(lookup)
+    # Django has no TruncWeek until 2.1, so rows are matched
+    # to the index of their week in buckets
+    return Case(*[
+        When(then=Value(index), **{
+            "{}__gte".format(lookup): bucket,
+            "{}__lt".format(lookup): get_next_bucket(bucket, period),
+        }) for index, bucket in enumerate(buckets)
+    ], output_field=IntegerField())
+
+
+def get_episode_relation(subrecord):
+    if subrecord in subrecords.episode_subrecords():
+        return "episode"
+    return "patient__episode"
+
+
+def get_dated_episodes(episode_qs, buckets, period):
+    """
+    The episodes in the buckets, whole weeks or months
+    """
+    return overview_utils.filter_by_date(
+        episode_qs,
+        buckets[0],
+        get_next_bucket(buckets[-1], period) - datetime.timedelta(days=1)
+    )
+
+
+def group_by_bucket(qs, date_lookup, period, buckets, **aggregates):
+    """
+    Aggregates qs for each of the buckets with a single grouped query.
+
+    Returns a dict of bucket to a dict of the aggregates.
+    """
+    # the date is annotated first so the buckets reuse the join of
+    # any filter on it rather than joining the episodes again
+    rows = qs.annotate(bucket_date=F(date_lookup)).annotate(
+        bucket=get_trunc("bucket_date", period, buckets)
+    ).values("bucket").annotate(**aggregates).order_by()
+
+    result = {}
+    for row in rows:
+        if row["bucket"] is None:
+            continue
+        if period == WEEK:
+            bucket = buckets[row["bucket"]]
+        else:
+            bucket = get_bucket(row["bucket"], period)
+        result[bucket] = {k: row[k] or 0 for k in aggregates}
+    return result
+
+
+def get_series(name, compute, buckets, period, subrecord=None, querysets=()):
+    """
+    Returns a dict of bucket to the result of compute for each bucket.
+
+    compute is called with the buckets that are not cached and
+    returns a dict of bucket to result for those with any data,
+    the closed buckets it returns are cached forever.
+    """
+    suffixes = {"{}:{}".format(period, i.isoformat()): i for i in buckets}
+    cached = cache.get_permanent(
+        name, suffixes.keys(), subrecord=subrecord, querysets=querysets
+    )
+    result = {
+        suffixes[k]: None if v == EMPTY else v for k, v in cached.items()
+    }
+    missing = [i for i in buckets if i not in result]
+
+    if missing:
+        computed = compute(missing)
+        to_cache = {}
+        for suffix, bucket in suffixes.items():
+            if bucket not in missing:
+                continue
+            result[bucket] = computed.get(bucket)
+            if is_closed(bucket, period):
+                to_cache[suffix] = computed.get(bucket, EMPTY)
+        cache.set_permanent(
+            name, to_cache, subrecord=subrecord, querysets=querysets
+        )
+    return result
+
+
+@profiled("episode_trend")
+def calculate_episode_counts(episode_qs, period, buckets):
+    date_field = overview_utils.get_episode_date_field()
+    counts = group_by_bucket(
+        get_dated_episodes(episode_qs, buckets, period),
+        date_field,
+        period,
+        buckets,
+        count=Count("id", distinct=True)
+    )
+    return {k: v["count"] for k, v in counts.items()}
+
+
+def get_episode_counts(episode_qs, buckets, period):
+    """
+    The number of episodes in each bucket
+    """
+    return get_series(
+        "episode_trend",
+        partial(calculate_episode_counts, episode_qs, period),
+        buckets,
+        period,
+        querysets=[episode_qs]
+    )
+
+
+@profiled("subrecord_trend", overview_utils.get_subrecord_label)
+def calculate_subrecord_use(subrecord, episode_qs, period, buckets):
+    populated = overview_utils.get_populated(
+        subrecord, get_dated_episodes(episode_qs, buckets, period)
+    )
+    # annotating after the filter reuses its join to the episodes
+    return group_by_bucket(
+        populated,
+        "{}__{}".format(
+            get_episode_relation(subrecord),
+            overview_utils.get_episode_date_field()
+        ),
+        period,
+        buckets,
+        total=Count("id", distinct=True),
+        episodes=Count(
+            overview_utils.get_episode_lookup(subrecord), distinct=True
+        )
+    )
+
+
+def get_subrecord_use(subrecord, episode_qs, buckets, period):
+    """
+    The total populated subrecords and the number of episodes that
+    use them in each bucket, as a dict of bucket to dict(total=, episodes=)
+
+    Patient subrecords are counted in each bucket that one of their
+    patient's episodes is in.
+    """
+    return get_series(
+        "subrecord_trend",
+        partial(calculate_subrecord_use, subrecord, episode_qs, period),
+        buckets,
+        period,
+        subrecord=subrecord,
+        querysets=[episode_qs]
+    )
+
+
+def count_populated(model, field_name):
+    """
+    Counts the distinct rows where a field is populated so that
+    patient subrecords joined to many episodes are counted once.
+    """
+    return Count(Case(
+        When(then=Value(None), **fields.get_empty_lookups(model, field_name)),
+        default="id",
+        output_field=IntegerField()
+    ), distinct=True)
+
+
+@profiled(
+    "field_trend", lambda subrecord, *args: subrecord.get_api_name()
+)
+def calculate_field_completeness(
+    subrecord, field_names, episode_qs, period, buckets
+):
+    relation = get_episode_relation(subrecord)
+    qs = planner.restrict(
+        overview_utils.get_all_populated(subrecord),
+        relation,
+        get_dated_episodes(episode_qs, buckets, period)
+    )
+    aggregates = {"total": Count("id", distinct=True)}
+    for index, field_name in enumerate(field_names):
+        aggregates["populated_{}".format(index)] = count_populated(
+            subrecord, field_name
+        )
+    grouped = group_by_bucket(
+        qs,
+        "{}__{}".format(relation, overview_utils.get_episode_date_field()),
+        period,
+        buckets,
+        **aggregates
+    )
+    return {
+        bucket: dict(
+            total=counts["total"],
+            populated=[
+                counts["populated_{}".format(i)]
+                for i in range(len(field_names))
+            ]
+        ) for bucket, counts in grouped.items()
+    }
+
+
+def get_trend_field_names(subrecord):
+    """
+    Many to many fields would multiply the rows of the grouped
+    query so are left out of trends
+    """
+    return [
+        i for i in fields.get_field_names(subrecord)
+        if not fields.is_many_to_many(subrecord, i)
+    ]
+
+
+def get_field_completeness(subrecord, field_names, episode_qs, buckets, period):
+    """
+    The total rows and the populated rows of each field in each bucket,
+    as a dict of bucket to dict(total=, populated=[for each field])
+    """
+    return get_series(
+        "field_trend_{}".format(",".join(field_names)),
+        partial(
+            calculate_field_completeness,
+            subrecord,
+            field_names,
+            episode_qs,
+            period
+        ),
+        buckets,
+        period,
+        subrecord=subrecord,
+        querysets=[episode_qs]
+    )
+
+
+def get_subrecord_trends(subrecord_models, episode_qs, date_from, date_to, period):
+    """
+    The percentage of episodes that use each subrecord in each bucket.
+
+    The range is widened to whole weeks or months.
+
+    Returns the buckets and a list of rows of
+    (subrecord, [(total, percentage) for each bucket])
+    """
+    buckets = get_buckets(date_from, date_to, period)
+    episode_counts = get_episode_counts(episode_qs, buckets, period)
+    empty = dict(total=0, episodes=0)
+
+    subrecord_models = list(subrecord_models)
+    all_use = parallel.map(
+        lambda x: get_subrecord_use(x, episode_qs, buckets, period),
+        subrecord_models
+    )
+    rows = []
+    for subrecord, use in zip(subrecord_models, all_use):
+        cells = []
+        for bucket in buckets:
+            bucket_use = use[bucket] or empty
+            cells.append((
+                bucket_use["total"],
+                overview_utils.get_percentage(
+                    bucket_use["episodes"], episode_counts[bucket] or 0
+                ),
+            ))
+        rows.append((subrecord, cells))
+    rows = sorted(rows, key=lambda x: overview_utils.get_sort_name(x[0]))
+    return buckets, rows
+
+
+def get_field_trends(subrecord, episode_qs, date_from, date_to, period):
+    """
+    The percentage of rows of a subrecord that have each field populated
+    in each bucket.
+
+    Returns the buckets and a list of rows of
+    (field_name, [(populated, percentage) for each bucket])
+    """
+    buckets = get_buckets(date_from, date_to, period)
+    field_names = get_trend_field_names(subrecord)
+    completeness = get_field_completeness(
+        subrecord, field_names, episode_qs, buckets, period
+    )
+    rows = []
+    for index, field_name in enumerate(field_names):
+        cells = []
+        for bucket in buckets:
+            counts = completeness[bucket]
+            if counts is None:
+                cells.append((0, 0))
+            else:
+                populated = counts["populated"][index]
+                cells.append((
+                    populated,
+                    overview_utils.get_percentage(populated, counts["total"])
+                ))
+        rows.append((field_name, cells))
+    return buckets, rows
@@ -6,24 +6,199 @@ from django.conf.urls import url
 from overview import views
 
 urlpatterns = [
+    url(
+        '^overview/$',
+        views.OverviewCategoryListView.as_view(),
+        name="overview_home"
+    ),
     url(
         '^overview/list$',
         views.OverviewSubrecordListView.as_view(),
         name="overview_list"
     ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/list$',
+        views.OverviewSubrecordListView.as_view(),
+        name="overview_list"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/list$',
+        views.OverviewSubrecordListView.as_view(),
+        name="overview_list"
+    ),
+    url(
+        '^overview/coverage$',
+        views.OverviewCoverageView.as_view(),
+        name="overview_coverage"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/coverage$',
+        views.OverviewCoverageView.as_view(),
+        name="overview_coverage"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/coverage$',
+        views.OverviewCoverageView.as_view(),
+        name="overview_coverage"
+    ),
+    url(
+        '^overview/breakdown/category$',
+        views.OverviewCategoryBreakdownView.as_view(),
+        name="overview_category_breakdown"
+    ),
+    url(
+        '^overview/breakdown/tagging$',
+        views.OverviewTaggingBreakdownView.as_view(),
+        name="overview_tagging_breakdown"
+    ),
     url(
         '^overview/all/subrecord/(?P<api_name>[0-9a-z_\-]+)?$',
         views.OverviewDetailView.as_view(),
         name="overview_detail_view"
     ),
     url(
-        '^overview/category/(?P<category>[0-9a-z_\-]+)?$/subrecord/(?P<api_name>[0-9a-z_\-]+)?$',
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)$',
         views.OverviewDetailView.as_view(),
         name="overview_detail_view"
     ),
     url(
-        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)?$/subrecord/(?P<api_name>[0-9a-z_\-]+)?$',
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)$',
         views.OverviewDetailView.as_view(),
         name="overview_detail_view"
     ),
+    url(
+        '^overview/all/subrecord/(?P<api_name>[0-9a-z_\-]+)/completeness$',
+        views.OverviewCompletenessView.as_view(),
+        name="overview_completeness"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/completeness$',
+        views.OverviewCompletenessView.as_view(),
+        name="overview_completeness"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/completeness$',
+        views.OverviewCompletenessView.as_view(),
+        name="overview_completeness"
+    ),
+    url(
+        '^overview/all/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)\.json$',
+        views.OverviewFieldView.as_view(),
+        name="overview_field"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)\.json$',
+        views.OverviewFieldView.as_view(),
+        name="overview_field"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)\.json$',
+        views.OverviewFieldView.as_view(),
+        name="overview_field"
+    ),
+    url(
+        '^overview/all/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)/clusters$',
+        views.OverviewClusterView.as_view(),
+        name="overview_clusters"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)/clusters$',
+        views.OverviewClusterView.as_view(),
+        name="overview_clusters"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)/clusters$',
+        views.OverviewClusterView.as_view(),
+        name="overview_clusters"
+    ),
+    url(
+        '^overview/trends$',
+        views.OverviewTrendView.as_view(),
+        name="overview_trends"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/trends$',
+        views.OverviewTrendView.as_view(),
+        name="overview_trends"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/trends$',
+        views.OverviewTrendView.as_view(),
+        name="overview_trends"
+    ),
+    url(
+        '^overview/all/subrecord/(?P<api_name>[0-9a-z_\-]+)/trends$',
+        views.OverviewSubrecordTrendView.as_view(),
+        name="overview_subrecord_trends"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/trends$',
+        views.OverviewSubrecordTrendView.as_view(),
+        name="overview_subrecord_trends"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/trends$',
+        views.OverviewSubrecordTrendView.as_view(),
+        name="overview_subrecord_trends"
+    ),
+    url(
+        '^overview/export/(?P<report>subrecords|fields)\.(?P<format>csv|jsonl)$',
+        views.OverviewExportView.as_view(),
+        name="overview_export"
+    ),
+    url(
+        '^overview/category/(?P<category>[0-9a-z_\-]+)/export/(?P<report>subrecords|fields)\.(?P<format>csv|jsonl)$',
+        views.OverviewExportView.as_view(),
+        name="overview_export"
+    ),
+    url(
+        '^overview/tagging/(?P<tagging>[0-9a-z_\-]+)/export/(?P<report>subrecords|fields)\.(?P<format>csv|jsonl)$',
+        views.OverviewExportView.as_view(),
+        name="overview_export"
+    ),
+    url(
+        '^overview/api/list$',
+        views.OverviewApiSubrecordListView.as_view(),
+        name="overview_api_list"
+    ),
+    url(
+        '^overview/api/category/(?P<category>[0-9a-z_\-]+)/list$',
+        views.OverviewApiSubrecordListView.as_view(),
+        name="overview_api_list"
+    ),
+    url(
+        '^overview/api/tagging/(?P<tagging>[0-9a-z_\-]+)/list$',
+        views.OverviewApiSubrecordListView.as_view(),
+        name="overview_api_list"
+    ),
+    url(
+        '^overview/api/all/subrecord/(?P<api_name>[0-9a-z_\-]+)$',
+        views.OverviewApiDetailView.as_view(),
+        name="overview_api_detail"
+    ),
+    url(
+        '^overview/api/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)$',
+        views.OverviewApiDetailView.as_view(),
+        name="overview_api_detail"
+    ),
+    url(
+        '^overview/api/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)$',
+        views.OverviewApiDetailView.as_view(),
+        name="overview_api_detail"
+    ),
+    url(
+        '^overview/api/all/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)/values$',
+        views.OverviewApiValuesView.as_view(),
+        name="overview_api_values"
+    ),
+    url(
+        '^overview/api/category/(?P<category>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)/values$',
+        views.OverviewApiValuesView.as_view(),
+        name="overview_api_values"
+    ),
+    url(
+        '^overview/api/tagging/(?P<tagging>[0-9a-z_\-]+)/subrecord/(?P<api_name>[0-9a-z_\-]+)/(?P<field_name>[0-9a-z_]+)/values$',
+        views.OverviewApiValuesView.as_view(),
+        name="overview_api_values"
+    ),
 ]
@@ -1,107 +1,461 @@
 """
 Views for the overview Opal Plugin
 """
+import hashlib
+import logging
+
+from django.conf import settings
 from django.contrib.auth import mixins
-from django.views.generic import TemplateView
+from django.http import Http404
+from django.http import HttpResponseNotModified
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
+from django.views.generic import TemplateView, View
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
 from django.utils.text import slugify
 from django.core.urlresolvers import reverse
 
 from opal.core import subrecords, episodes
 from opal import models as omodels
-from opal.core.fields import ForeignKeyOrFreeText
-from opal.core.patient_lists import TaggedPatientList
 
+from overview import approximate
+from overview import cache
+from overview import clustering
+from overview import completeness
+from overview import coverage
+from overview import counters
+from overview import database
+from overview import export
+from overview import jobs
 from overview import overview_utils
+from overview import parallel
+from overview import profiling
 from overview import fields
+from overview import snapshots
+from overview import trends
+
+logger = logging.getLogger("overview.views")
 
 
 class OverviewBase(mixins.UserPassesTestMixin):
+    # snapshots and counters are of all episodes, so are
+    # only used when the episodes are not filtered
+    use_snapshots = True
+
+    # the name of the overview.jobs job that calculates
+    # the page in the background, if background jobs are enabled
+    job_name = None
+    progress_template_name = "overview/progress.html"
+    unavailable_template_name = "overview/unavailable.html"
+
+    # the report served when the overview database is unavailable
+    stale_report = None
+
     def test_func(self):
         """
         Override this method to use a different test_func method.
         """
         return self.request.user.is_authenticated() and self.request.user.is_superuser
 
+    def dispatch(self, request, *args, **kwargs):
+        """
+        If profiling is enabled, record the stages of the page,
+        including those triggered while the template renders.
+        """
+        if not profiling.is_enabled():
+            return self.dispatch_to_database(request, *args, **kwargs)
+        profiling.start(request.path)
+        try:
+            response = self.dispatch_to_database(request, *args, **kwargs)
+        finally:
+            profile = profiling.stop()
+        profile.log()
+        return response
+
+    def dispatch_to_database(self, request, *args, **kwargs):
+        """
+        Reads from the overview database while the page is calculated
+        and rendered, falling back to stored results if it is
+        unavailable.
+        """
+        try:
+            with database.reading(), cache.memoised_versions():
+                response = super(OverviewBase, self).dispatch(
+                    request, *args, **kwargs
+                )
+                if hasattr(response, "render"):
+                    response.render()
+        except database.UNAVAILABLE_ERRORS as e:
+            logger.warning("Overview database unavailable: {}".format(e))
+            if not self.test_func():
+                return self.handle_no_permission()
+            response = self.get_unavailable_response()
+        return response
+
+    def get_unavailable_response(self):
+        """
+        The page from the last result of its background job however
+        old, or a 503 if it has never been calculated.
+        """
+        report = None
+        if self.job_name:
+            report = jobs.find_report(self.job_name, **self.get_job_kwargs())
+        if report is None or report.result is None:
+            response = TemplateResponse(
+                self.request,
+                self.unavailable_template_name,
+                dict(list_url=self.get_list_url()),
+                status=503
+            )
+        else:
+            self.precomputed = None
+            self.job_result = jobs.load_result(report)
+            self.stale_report = report
+            response = TemplateResponse(
+                self.request,
+                self.get_template_names(),
+                self.get_context_data(**self.kwargs)
+            )
+        response.render()
+        return response
+
+    def is_approximate(self):
+        """
+        Approximate statistics are used for large tables if enabled,
+        unless the user has asked for the exact figures.
+        """
+        return approximate.is_enabled() and "exact" not in self.request.GET
+
+    def is_progressive(self):
+        """
+        Progressive pages are rendered without their statistics,
+        which the browser requests separately, so they are not
+        calculated by background jobs.
+        """
+        return False
+
+    def get_precomputed(self):
+        """
+        Returns the page's statistics from snapshots or counters,
+        or None if there are none.
+        """
+        return None
+
+    def get_job_kwargs(self):
+        kwargs = self.get_episode_filter_kwargs()
+        kwargs.update({
+            k: v.isoformat() for k, v in self.get_date_range().items()
+        })
+        return kwargs
+
+    def get(self, request, *args, **kwargs):
+        """
+        Serves precomputed statistics if there are any, otherwise
+        if background jobs are enabled, serves the job's result or
+        a progress page while it is calculated.
+        """
+        self.precomputed = None
+        self.job_result = None
+
+        if self.uses_precomputed():
+            self.precomputed = self.get_precomputed()
+
+        uses_job = self.job_name and jobs.is_enabled()
+        if self.precomputed is None and uses_job and not self.is_progressive():
+            report = jobs.get_report(self.job_name, **self.get_job_kwargs())
+            if report.result is None:
+                return TemplateResponse(
+                    request,
+                    self.progress_template_name,
+                    dict(report=report, list_url=self.get_list_url())
+                )
+            self.job_result = jobs.load_result(report)
+
+        return super(OverviewBase, self).get(request, *args, **kwargs)
+
     def get_category_slug(self, category):
-        return slugify(category.display_name)
+        return overview_utils.get_category_slug(category)
 
     def get_category_from_slug(self, slug):
-        for i in EpisodeCategory.list():
-            if self.get_category_slug(i) == slug:
-                return i
+        category = overview_utils.get_category_from_slug(slug)
+        if category is None:
+            raise Http404("Unknown episode category {}".format(slug))
+        return category
+
+    def get_episode_filter_kwargs(self):
+        """
+        The category or tagging the episodes are filtered by
+        """
+        return {
+            k: v for k, v in self.kwargs.items()
+            if k in ("category", "tagging") and v
+        }
+
+    def get_date_range(self):
+        """
+        The dates the episodes are filtered by, from the
+        from and to parameters of the query string
+        """
+        date_range = {}
+        for param, key in (("from", "date_from"), ("to", "date_to")):
+            value = self.request.GET.get(param)
+            if not value:
+                continue
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise Http404("Unknown date {}".format(value))
+            date_range[key] = parsed
+        return date_range
+
+    def get_query_string(self, exact=False):
+        """
+        The query string that keeps the date range in links,
+        and asks for exact figures if exact is True
+        """
+        params = [
+            (param, self.request.GET[param]) for param in ("from", "to")
+            if self.request.GET.get(param)
+        ]
+        if exact:
+            params.append(("exact", "1"))
+        if not params:
+            return ""
+        return "?{}".format(urlencode(params))
+
+    def get_exact_query_string(self):
+        """
+        The query string of this page, asking for exact figures
+        """
+        params = self.request.GET.copy()
+        params["exact"] = "1"
+        return "?{}".format(params.urlencode())
+
+    def is_all_episodes(self):
+        return not self.get_episode_filter_kwargs() and not self.get_date_range()
+
+    def uses_precomputed(self):
+        return self.use_snapshots and self.is_all_episodes()
+
+    def get_episode_qs(self):
+        filter_kwargs = self.get_episode_filter_kwargs()
+        if "category" in filter_kwargs:
+            self.get_category_from_slug(filter_kwargs["category"])
+        filter_kwargs.update(self.get_date_range())
+        return overview_utils.get_episode_qs(**filter_kwargs)
+
+    def get_list_url(self):
+        return reverse(
+            "overview_list", kwargs=self.get_episode_filter_kwargs()
+        ) + self.get_query_string()
+
+    def get_clusters_url(self, subrecord, field_name):
+        kwargs = self.get_episode_filter_kwargs()
+        kwargs["api_name"] = subrecord.get_api_name()
+        kwargs["field_name"] = field_name
+        return reverse("overview_clusters", kwargs=kwargs)
+
+    def get_field_url(self, subrecord, field_name):
+        """
+        The url the browser loads a field of a progressive page
+        from, with the same figures as the page
+        """
+        kwargs = self.get_episode_filter_kwargs()
+        kwargs["api_name"] = subrecord.get_api_name()
+        kwargs["field_name"] = field_name
+        exact = approximate.is_enabled() and not self.is_approximate()
+        return reverse(
+            "overview_field", kwargs=kwargs
+        ) + self.get_query_string(exact=exact)
+
+    def get_detail_url(self, subrecord):
+        kwargs = self.get_episode_filter_kwargs()
+        kwargs["api_name"] = subrecord.get_api_name()
+        return reverse(
+            "overview_detail_view", kwargs=kwargs
+        ) + self.get_query_string()
 
-    def get_category_subrecord_url(self, subrecord, category):
-        return reverse()
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewBase, self).get_context_data(*args, **kwargs)
+        ctx["list_url"] = self.get_list_url()
+        ctx["episode_filter"] = self.get_episode_filter_kwargs()
+        ctx["overview_profile"] = profiling.get_profile()
+        ctx["approximate"] = self.is_approximate()
+        ctx["exact_query_string"] = self.get_exact_query_string()
+        ctx["stale_report"] = self.stale_report
+        ctx.update(self.get_date_range())
+        return ctx
 
 
 class OverviewCategoryListView(OverviewBase, TemplateView):
-    template_name = "overview/category_list.html"
+    template_name = "overview/home.html"
 
     def get_category_url(self, category):
-        pass
+        return reverse(
+            "overview_list",
+            kwargs=dict(category=self.get_category_slug(category))
+        )
+
+    def get_tagging_url(self, tagging):
+        return reverse("overview_list", kwargs=dict(tagging=tagging))
 
     def get_context_data(self, *args, **kwargs):
         ctx = super(OverviewCategoryListView, self).get_context_data(
             *args, **kwargs
         )
-        ctx["tagging"] = omodels.Tagging.objects.values_list(
-            'value', flat=True
-        ).distinct()
+        ctx["tagging"] = [
+            (i, self.get_tagging_url(i)) for i in omodels.Tagging.objects.exclude(
+                value=None
+            ).values_list('value', flat=True).distinct().order_by('value')
+        ]
 
         categories = episodes.EpisodeCategory.list()
 
         ctx["categories"] = [
-            (i.display_name, slugify(i.display_name)) for i in categories
+            (i.display_name, self.get_category_url(i)) for i in categories
         ]
         return ctx
 
 
-class OverviewSubrecordListView(OverviewBase, TemplateView):
-    template_name = "overview/subrecord_list.html"
+class OverviewBreakdownView(OverviewBase, TemplateView):
+    """
+    A matrix of the use of every subrecord by every value
+    of an episode lookup, eg category or tag.
+    """
+    template_name = "overview/breakdown.html"
+    job_name = "breakdown"
+    lookup = None
+    title = None
 
-    def get_episode_qs(self):
-        return omodels.Episode.objects.all()
+    def get_column_url(self, value):
+        raise NotImplementedError(
+            "please implement get_column_url"
+        )
+
+    def get_job_kwargs(self):
+        # breakdowns are always of all episodes
+        return dict(lookup=self.lookup)
 
     def get_context_data(self, *args, **kwargs):
-        ctx = super(OverviewSubrecordListView, self).get_context_data(
+        ctx = super(OverviewBreakdownView, self).get_context_data(
             *args, **kwargs
         )
+        if self.job_result is not None:
+            columns, rows = self.job_result
+        else:
+            columns, rows = overview_utils.get_breakdown(
+                subrecords.subrecords(), self.lookup
+            )
+        ctx["title"] = self.title
+        ctx["columns"] = [(i, self.get_column_url(i)) for i in columns]
+        ctx["rows"] = rows
+        return ctx
+
+
+class OverviewCategoryBreakdownView(OverviewBreakdownView):
+    lookup = "category_name"
+    title = "By Episode Category"
+
+    def get_column_url(self, value):
+        return reverse(
+            "overview_list", kwargs=dict(category=slugify(value))
+        )
+
+
+class OverviewTaggingBreakdownView(OverviewBreakdownView):
+    lookup = "tagging__value"
+    title = "By Team"
+
+    def get_column_url(self, value):
+        return reverse("overview_list", kwargs=dict(tagging=value))
+
+
+class OverviewSubrecordListView(OverviewBase, TemplateView):
+    template_name = "overview/subrecord_list.html"
+    job_name = "subrecord_list"
+
+    def get_precomputed(self):
+        subrecord_models = subrecords.subrecords()
         episode_qs = self.get_episode_qs()
+        rows = counters.get_subrecord_summary_rows(
+            subrecord_models, episode_qs
+        )
+        if rows is None:
+            rows = snapshots.get_subrecord_summary_rows(
+                subrecord_models, episode_qs
+            )
+        return rows
+
+    def get_rows(self):
+        """
+        The summary row of each subrecord, precomputed, from the
+        background job, estimated or calculated
+        """
+        rows = self.precomputed or self.job_result
 
-        ctx["subrecords"] = []
+        if rows is None and self.is_approximate():
+            rows = approximate.get_subrecord_summary_rows(
+                subrecords.subrecords(), self.get_episode_qs()
+            )
 
-        for subrecord in subrecords.subrecords():
-            qs = overview_utils.get_subrecord_use(
-                subrecord, episode_qs,
+        if rows is None:
+            rows = overview_utils.get_subrecord_summary_rows(
+                subrecords.subrecords(), self.get_episode_qs()
             )
-            ctx["subrecords"].append((
-                overview_utils.get_summary_row(
-                    subrecord, qs, episode_qs
-                )
-            ))
+        return rows
 
-        ctx["subrecords"] = sorted(ctx["subrecords"], key=lambda x: x[0])
-        ctx["subrecords"] = sorted(ctx["subrecords"], key=lambda x: -x[1])
-        ctx["subrecords"] = sorted(ctx["subrecords"], key=lambda x: -x[2])
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewSubrecordListView, self).get_context_data(
+            *args, **kwargs
+        )
+        rows = self.get_rows()
+        ctx["subrecords"] = rows
+        ctx["subrecord_rows"] = [
+            (subrecord, count, percentage, self.get_detail_url(subrecord))
+            for subrecord, count, percentage in rows
+        ]
+        ctx["trends_url"] = reverse(
+            "overview_trends", kwargs=self.get_episode_filter_kwargs()
+        ) + self.get_query_string()
+        ctx["coverage_url"] = reverse(
+            "overview_coverage", kwargs=self.get_episode_filter_kwargs()
+        ) + self.get_query_string()
         return ctx
 
 
 class OverviewDetailView(OverviewBase, TemplateView):
     template_name = "overview/subrecord.html"
+    job_name = "subrecord_detail"
 
-    IGNORED_FIELDS = {
-        "id",
-        "created",
-        "updated",
-        "created_by_id",
-        "updated_by_id",
-        "consistency_token",
-        "episode_id",
-        "patient_id"
-    }
+    def get_subrecord(self):
+        return subrecords.get_subrecord_from_api_name(self.kwargs["api_name"])
 
-    def get_episode_qs(self):
-        return omodels.Episode.objects.all()
+    def get_precomputed(self):
+        return snapshots.get_fields(
+            self.get_subrecord(), self.get_episode_qs()
+        )
+
+    def get_job_kwargs(self):
+        kwargs = super(OverviewDetailView, self).get_job_kwargs()
+        kwargs["api_name"] = self.kwargs["api_name"]
+        return kwargs
+
+    def is_progressive(self):
+        """
+        If settings.OVERVIEW_PROGRESSIVE_DETAIL is True, or the
+        progressive parameter is passed, the page is rendered with a
+        placeholder for each field that is filled in as the field's
+        statistics are requested from OverviewFieldView.
+        """
+        return (
+            getattr(settings, "OVERVIEW_PROGRESSIVE_DETAIL", False) or
+            "progressive" in self.request.GET
+        )
 
     def get_ft_or_fk_detail(self, qs, field, episode_qs):
         # so for ft_or_fk we want, the % the field is populated
@@ -123,23 +477,507 @@ class OverviewDetailView(OverviewBase, TemplateView):
         )
         return result
 
+    def get_fields(self, episode_qs, subrecord):
+        """
+        The Field of each field of the subrecord, precomputed,
+        from the background job or calculated
+        """
+        field_list = self.precomputed or self.job_result
+        if field_list is not None:
+            return field_list
+        field_names = fields.get_field_names(subrecord)
+        field_stats = fields.get_field_stats(
+            episode_qs, subrecord, field_names
+        )
+        field_list = [
+            fields.get_field(
+                episode_qs,
+                subrecord,
+                field_name,
+                stats=field_stats[field_name],
+                approximate=self.is_approximate()
+            )
+            for field_name in field_names
+        ]
+        if parallel.get_workers() > 1:
+            fields.prefetch_top_values(field_list)
+        return field_list
+
     def get_context_data(self, *args, **kwargs):
         ctx = super(OverviewDetailView, self).get_context_data(*args, **kwargs)
         episode_qs = self.get_episode_qs()
-        subrecord = subrecords.get_subrecord_from_api_name(kwargs["api_name"])
-        ctx["fields"] = []
-        for field_name in subrecord._get_fieldnames_to_serialize():
-            if field_name in self.IGNORED_FIELDS:
-                continue
+        subrecord = self.get_subrecord()
+        ctx["placeholders"] = []
 
-            field = subrecord._get_field(field_name)
-            if isinstance(field, ForeignKeyOrFreeText):
-                ctx["fields"].append(
-                    fields.ForeignKeyOrFreeTextField(episode_qs, subrecord, field_name)
+        if self.precomputed is None and self.is_progressive():
+            ctx["fields"] = []
+            ctx["placeholders"] = [
+                (
+                    subrecord._get_field_title(field_name),
+                    self.get_field_url(subrecord, field_name)
                 )
-            else:
-                ctx["fields"].append(
-                    fields.DefaultField(episode_qs, subrecord, field_name)
+                for field_name in fields.get_field_names(subrecord)
+            ]
+        else:
+            ctx["fields"] = self.get_fields(episode_qs, subrecord)
+
+        for field in ctx["fields"]:
+            if isinstance(field, fields.ForeignKeyOrFreeTextField):
+                field.clusters_url = self.get_clusters_url(
+                    subrecord, field.field_name
                 )
         ctx["subrecord"] = subrecord
+        ctx["detail_url"] = self.get_detail_url(subrecord)
+        ctx["trends_url"] = reverse(
+            "overview_subrecord_trends", kwargs=self.kwargs
+        ) + self.get_query_string()
+        ctx["completeness_url"] = reverse(
+            "overview_completeness", kwargs=self.kwargs
+        ) + self.get_query_string()
+        return ctx
+
+
+class OverviewFieldView(OverviewBase, View):
+    """
+    The statistics of a single field of a subrecord as JSON,
+    with the field rendered as it is on the detail page
+    """
+    def get_subrecord(self):
+        return subrecords.get_subrecord_from_api_name(self.kwargs["api_name"])
+
+    def get(self, request, *args, **kwargs):
+        subrecord = self.get_subrecord()
+        field_name = self.kwargs["field_name"]
+        if field_name not in fields.get_field_names(subrecord):
+            raise Http404("Unknown field {}".format(field_name))
+        episode_qs = self.get_episode_qs()
+        field = fields.get_field(
+            episode_qs,
+            subrecord,
+            field_name,
+            stats=fields.get_field_stats(
+                episode_qs, subrecord, [field_name]
+            )[field_name],
+            approximate=self.is_approximate()
+        )
+        if isinstance(field, fields.ForeignKeyOrFreeTextField):
+            field.clusters_url = self.get_clusters_url(subrecord, field_name)
+        return JsonResponse(dict(
+            field_name=field_name,
+            display_name=field.display_name(),
+            total_count=field.total_count(),
+            total_populated=field.total_populated(),
+            html=render_to_string(
+                field.template, dict(field=field), request=request
+            )
+        ))
+
+
+class OverviewCoverageView(OverviewBase, TemplateView):
+    """
+    The share of episodes and patients with each subrecord
+    and the mean rows per episode and patient
+    """
+    template_name = "overview/coverage.html"
+
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewCoverageView, self).get_context_data(
+            *args, **kwargs
+        )
+        ctx["coverages"] = [
+            (i, self.get_detail_url(i.subrecord))
+            for i in coverage.get_coverages(
+                subrecords.subrecords(), self.get_episode_qs()
+            )
+        ]
+        return ctx
+
+
+class OverviewCompletenessView(OverviewBase, TemplateView):
+    """
+    How often each pair of fields of a subrecord are populated
+    together and the most common patterns of populated fields
+    """
+    template_name = "overview/completeness.html"
+
+    def get_subrecord(self):
+        return subrecords.get_subrecord_from_api_name(self.kwargs["api_name"])
+
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewCompletenessView, self).get_context_data(
+            *args, **kwargs
+        )
+        subrecord = self.get_subrecord()
+        result = completeness.get_completeness(
+            self.get_episode_qs(), subrecord
+        )
+        total = result.total
+        display_names = [
+            subrecord._get_field_title(i) for i in result.field_names
+        ]
+        ctx["subrecord"] = subrecord
+        ctx["detail_url"] = self.get_detail_url(subrecord)
+        ctx["total"] = total
+        ctx["display_names"] = display_names
+        ctx["matrix"] = [
+            (
+                display_name,
+                [
+                    (count, overview_utils.get_percentage(count, total))
+                    for count in row
+                ]
+            ) for display_name, row in zip(display_names, result.get_matrix())
+        ]
+        ctx["patterns"] = [
+            (count, overview_utils.get_percentage(count, total), populated)
+            for count, populated in result.get_top_patterns()
+        ]
+        return ctx
+
+
+class OverviewClusterView(OverviewBase, TemplateView):
+    """
+    The free text values of a field grouped with those that are
+    probably the same, with the lookup list value to code them as
+    """
+    template_name = "overview/clusters.html"
+    amount = 100
+
+    def get_subrecord(self):
+        return subrecords.get_subrecord_from_api_name(self.kwargs["api_name"])
+
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewClusterView, self).get_context_data(
+            *args, **kwargs
+        )
+        subrecord = self.get_subrecord()
+        field_name = self.kwargs["field_name"]
+        if not fields.is_foreign_key_or_free_text(subrecord, field_name):
+            raise Http404("{} is not a foreign key or free text field".format(
+                field_name
+            ))
+        ctx["subrecord"] = subrecord
+        ctx["field_display_name"] = subrecord._get_field_title(field_name)
+        ctx["detail_url"] = self.get_detail_url(subrecord)
+        ctx["clusters"] = clustering.get_clusters(
+            subrecord, field_name, self.get_episode_qs(), amount=self.amount
+        )
+        return ctx
+
+
+class OverviewTrendBase(OverviewBase, TemplateView):
+    """
+    Statistics by week or month, the period is set with the
+    period parameter and the range with from and to.
+    """
+    template_name = "overview/trends.html"
+
+    def get_period(self):
+        period = self.request.GET.get("period", trends.MONTH)
+        if period not in trends.PERIODS:
+            raise Http404("Unknown period {}".format(period))
+        return period
+
+    def get_trend_range(self):
+        date_from, date_to = trends.get_default_range(self.get_period())
+        date_range = self.get_date_range()
+        return (
+            date_range.get("date_from", date_from),
+            date_range.get("date_to", date_to)
+        )
+
+    def get_trend_episode_qs(self):
+        """
+        The episodes without the date range, which trends
+        apply bucket by bucket
+        """
+        filter_kwargs = self.get_episode_filter_kwargs()
+        if "category" in filter_kwargs:
+            self.get_category_from_slug(filter_kwargs["category"])
+        return overview_utils.get_episode_qs(**filter_kwargs)
+
+    def get_trends(self, episode_qs, date_from, date_to, period):
+        """
+        Returns the buckets and rows of (label, url, cells)
+        """
+        raise NotImplementedError(
+            "please implement get_trends"
+        )
+
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewTrendBase, self).get_context_data(
+            *args, **kwargs
+        )
+        date_from, date_to = self.get_trend_range()
+        period = self.get_period()
+        buckets, rows = self.get_trends(
+            self.get_trend_episode_qs(), date_from, date_to, period
+        )
+        ctx["period"] = period
+        ctx["periods"] = trends.PERIODS
+        ctx["date_from"] = date_from
+        ctx["date_to"] = date_to
+        ctx["buckets"] = buckets
+        ctx["rows"] = rows
+        return ctx
+
+
+class OverviewTrendView(OverviewTrendBase):
+    title = "Subrecord use"
+
+    def get_trends(self, episode_qs, date_from, date_to, period):
+        buckets, rows = trends.get_subrecord_trends(
+            subrecords.subrecords(), episode_qs, date_from, date_to, period
+        )
+        return buckets, [
+            (
+                subrecord.get_display_name(),
+                reverse(
+                    "overview_subrecord_trends",
+                    kwargs=dict(
+                        api_name=subrecord.get_api_name(),
+                        **self.get_episode_filter_kwargs()
+                    )
+                ),
+                cells
+            ) for subrecord, cells in rows
+        ]
+
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewTrendView, self).get_context_data(
+            *args, **kwargs
+        )
+        ctx["title"] = self.title
+        return ctx
+
+
+class OverviewSubrecordTrendView(OverviewTrendBase):
+    def get_subrecord(self):
+        return subrecords.get_subrecord_from_api_name(self.kwargs["api_name"])
+
+    def get_trends(self, episode_qs, date_from, date_to, period):
+        subrecord = self.get_subrecord()
+        buckets, rows = trends.get_field_trends(
+            subrecord, episode_qs, date_from, date_to, period
+        )
+        return buckets, [
+            (subrecord._get_field_title(field_name), None, cells)
+            for field_name, cells in rows
+        ]
+
+    def get_context_data(self, *args, **kwargs):
+        ctx = super(OverviewSubrecordTrendView, self).get_context_data(
+            *args, **kwargs
+        )
+        subrecord = self.get_subrecord()
+        ctx["title"] = "{} fields populated".format(
+            subrecord.get_display_name()
+        )
+        ctx["subrecord"] = subrecord
+        ctx["detail_url"] = self.get_detail_url(subrecord)
         return ctx
+
+
+class OverviewExportView(OverviewBase, View):
+    """
+    Streams the subrecord or field statistics as CSV or JSON Lines
+    """
+    def get(self, *args, **kwargs):
+        report = kwargs["report"]
+        export_format = kwargs["format"]
+        # the rows are calculated as the response is streamed,
+        # after the view has returned
+        response = StreamingHttpResponse(
+            database.iterate(export.export(
+                report,
+                export_format,
+                subrecords.subrecords(),
+                self.get_episode_qs()
+            )),
+            content_type=export.CONTENT_TYPES[export_format]
+        )
+        response["Content-Disposition"] = 'attachment; filename="{}.{}"'.format(
+            report, export_format
+        )
+        return response
+
+
+class OverviewApiMixin(object):
+    """
+    Serves a view's statistics as JSON with a strong ETag made from
+    the data versions of the episodes and subrecords they are
+    calculated from. Requests whose If-None-Match has the ETag get
+    a 304 Not Modified without the statistics being calculated.
+
+    Statistics read from snapshots or counters can lag behind the
+    data, so their versions are part of the ETag when they are used.
+
+    The API always serves exact figures, as estimates from a
+    sample differ from request to request.
+    """
+    job_name = None
+
+    def is_approximate(self):
+        return False
+
+    def is_progressive(self):
+        return False
+
+    def get_etag_subrecords(self):
+        """
+        The subrecords the response is calculated from
+        """
+        raise NotImplementedError(
+            "please implement get_etag_subrecords"
+        )
+
+    def get_data(self):
+        raise NotImplementedError(
+            "please implement get_data"
+        )
+
+    def get_etag(self):
+        parts = [
+            self.request.get_full_path(),
+            overview_utils.get_episode_data_version()
+        ]
+        parts.extend(
+            overview_utils.get_data_version(i)
+            for i in self.get_etag_subrecords()
+        )
+        if self.uses_precomputed():
+            # precomputed statistics can lag behind the data versions
+            parts.append(snapshots.get_version(self.get_etag_subrecords()))
+            parts.append(counters.get_version(self.get_etag_subrecords()))
+        digest = hashlib.md5("|".join(parts).encode("utf8")).hexdigest()
+        return '"{}"'.format(digest)
+
+    def is_not_modified(self, etag):
+        """
+        True if the client already has the response with this ETag
+        """
+        if_none_match = self.request.META.get("HTTP_IF_NONE_MATCH")
+        if not if_none_match:
+            return False
+        # If-None-Match uses the weak comparison
+        etags = [
+            i.strip().replace("W/", "", 1) for i in if_none_match.split(",")
+        ]
+        return "*" in etags or etag in etags
+
+    def get_unavailable_response(self):
+        return JsonResponse(
+            dict(error="The overview database is unavailable"), status=503
+        )
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        if self.is_not_modified(etag):
+            response = HttpResponseNotModified()
+        else:
+            self.precomputed = None
+            self.job_result = None
+            if self.uses_precomputed():
+                self.precomputed = self.get_precomputed()
+            response = JsonResponse(self.get_data())
+        response["ETag"] = etag
+        return response
+
+    def get_api_detail_url(self, subrecord):
+        kwargs = self.get_episode_filter_kwargs()
+        kwargs["api_name"] = subrecord.get_api_name()
+        return reverse(
+            "overview_api_detail", kwargs=kwargs
+        ) + self.get_query_string()
+
+    def get_api_values_url(self, subrecord, field_name):
+        kwargs = self.get_episode_filter_kwargs()
+        kwargs["api_name"] = subrecord.get_api_name()
+        kwargs["field_name"] = field_name
+        return reverse(
+            "overview_api_values", kwargs=kwargs
+        ) + self.get_query_string()
+
+
+class OverviewApiSubrecordListView(
+    OverviewApiMixin, OverviewSubrecordListView
+):
+    """
+    The count of each subrecord and the percentage of
+    episodes that use it
+    """
+    def get_etag_subrecords(self):
+        return subrecords.subrecords()
+
+    def get_data(self):
+        return dict(subrecords=[
+            dict(
+                api_name=subrecord.get_api_name(),
+                display_name=subrecord.get_display_name(),
+                count=count,
+                percentage=float(percentage),
+                url=self.get_api_detail_url(subrecord),
+            ) for subrecord, count, percentage in self.get_rows()
+        ])
+
+
+class OverviewApiDetailView(OverviewApiMixin, OverviewDetailView):
+    """
+    How often each field of a subrecord is populated
+    """
+    def get_etag_subrecords(self):
+        return [self.get_subrecord()]
+
+    def get_data(self):
+        subrecord = self.get_subrecord()
+        return dict(
+            api_name=subrecord.get_api_name(),
+            display_name=subrecord.get_display_name(),
+            fields=[
+                dict(
+                    field_name=field.field_name,
+                    display_name=field.display_name(),
+                    total_count=field.total_count(),
+                    total_populated=field.total_populated(),
+                    percentage_populated=float(field.percentage_populated()),
+                    url=self.get_api_values_url(subrecord, field.field_name),
+                ) for field in self.get_fields(self.get_episode_qs(), subrecord)
+            ]
+        )
+
+
+class OverviewApiValuesView(OverviewApiMixin, OverviewBase, View):
+    """
+    The most common values of a field, the top coded and free text
+    values of foreign key or free text fields and the distribution
+    of numeric, date, boolean and choice fields
+    """
+    def get_subrecord(self):
+        return subrecords.get_subrecord_from_api_name(self.kwargs["api_name"])
+
+    def get_etag_subrecords(self):
+        return [self.get_subrecord()]
+
+    def get(self, request, *args, **kwargs):
+        subrecord = self.get_subrecord()
+        if self.kwargs["field_name"] not in fields.get_field_names(subrecord):
+            raise Http404("Unknown field {}".format(self.kwargs["field_name"]))
+        return super(OverviewApiValuesView, self).get(request, *args, **kwargs)
+
+    def get_data(self):
+        subrecord = self.get_subrecord()
+        field_name = self.kwargs["field_name"]
+        field = fields.get_field(self.get_episode_qs(), subrecord, field_name)
+        result = dict(
+            api_name=subrecord.get_api_name(),
+            field_name=field_name,
+            display_name=field.display_name(),
+        )
+        if isinstance(field, fields.ForeignKeyOrFreeTextField):
+            result["top_coded"] = field.top_coded
+            result["top_uncoded"] = field.top_uncoded
+        elif isinstance(field, fields.TypedField):
+            result["distribution"] = field.distribution
+        else:
+            result["top_values"] = field.get_top_values()
+        return result
@@ -0,0 +1,137 @@
+"""
+Calculates overview pages ahead of them being viewed, into the result
+store of overview.jobs, for the overview_warm_up command to run after
+deploys or cache flushes, or on a timer.
+
+The pages are the subrecord list of all episodes and of every category
+and tag, the category and tag breakdowns, the detail page of every
+subrecord and any other page that has been requested before. The most
+viewed are calculated first, then pages in that order. Calculating a
+page also caches the statistics it is made from, if the overview cache
+is enabled.
+"""
+import threading
+import time
+
+from django.db import connections
+from opal.core import episodes, subrecords
+from opal import models as omodels
+
+from overview import jobs, overview_utils
+from overview.models import OverviewReport
+
+BREAKDOWN_LOOKUPS = ("category_name", "tagging__value")
+
+
+def get_pages():
+    """
+    The name and arguments of the report of each page
+    """
+    pages = [("subrecord_list", {})]
+    pages.extend(
+        ("subrecord_list", dict(
+            category=overview_utils.get_category_slug(i)
+        )) for i in episodes.EpisodeCategory.list()
+    )
+    pages.extend(
+        ("subrecord_list", dict(tagging=i))
+        for i in omodels.Tagging.objects.exclude(
+            value=None
+        ).values_list("value", flat=True).distinct().order_by("value")
+    )
+    pages.extend(("breakdown", dict(lookup=i)) for i in BREAKDOWN_LOOKUPS)
+    pages.extend(
+        ("subrecord_detail", dict(api_name=i.get_api_name()))
+        for i in subrecords.subrecords()
+    )
+    return pages
+
+
+def get_reports():
+    """
+    The report of every page, most viewed first
+    """
+    reports = []
+    keys = set()
+    for name, kwargs in get_pages():
+        report = jobs.get_or_create_report(name, **kwargs)
+        if report.key not in keys:
+            keys.add(report.key)
+            reports.append(report)
+    requested = OverviewReport.objects.filter(
+        name__in=list(jobs.JOBS.keys())
+    ).exclude(key__in=keys).order_by("id")
+    reports.extend(requested)
+    # sorted is stable so equally viewed pages keep their order
+    return sorted(reports, key=lambda x: -x.views)
+
+
+class WarmUp(object):
+    """
+    Calculates reports with a pool of workers until they are
+    done or the time budget, in seconds, is spent.
+    """
+    def __init__(self, reports, budget=None, workers=1, force=False):
+        self.remaining = list(reversed(reports))
+        if budget is None:
+            self.deadline = None
+        else:
+            self.deadline = time.time() + budget
+        self.workers = workers
+        self.force = force
+        self.calculated = []
+        self.fresh = []
+        # reports not started before the budget was spent
+        self.skipped = []
+        self.lock = threading.Lock()
+
+    def get_next(self):
+        with self.lock:
+            if self.deadline is not None and time.time() >= self.deadline:
+                self.skipped.extend(i.key for i in reversed(self.remaining))
+                self.remaining = []
+            if not self.remaining:
+                return None
+            return self.remaining.pop()
+
+    def work(self):
+        report = self.get_next()
+        while report is not None:
+            calculated = jobs.warm(report, force=self.force)
+            with self.lock:
+                if calculated:
+                    self.calculated.append(report.key)
+                else:
+                    self.fresh.append(report.key)
+            report = self.get_next()
+
+    def work_in_thread(self):
+        try:
+            self.work()
+        finally:
+            connections.close_all()
+
+    def run(self):
+        workers = min(self.workers, len(self.remaining))
+        if workers <= 1:
+            self.work()
+            return self
+        threads = [
+            threading.Thread(target=self.work_in_thread)
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self
+
+
+def warm_up(budget=None, workers=1, force=False):
+    """
+    Calculates every page that has no result or a stale result,
+    or every page if force is True. Returns the WarmUp.
+    """
+    return WarmUp(
+        get_reports(), budget=budget, workers=workers, force=force
+    ).run()
@@ -0,0 +1,92 @@
+"""
+Standalone benchmark runner for overview plugin
+
+    python runbenchmarks.py --episodes 10000 --output bench.json
+
+Generates synthetic data in a SQLite database and prints a JSON
+report of the query counts and timings of the overview pages.
+"""
+import argparse
+import json
+import os
+import sys
+from django.conf import settings
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--episodes", type=int, default=10000)
+parser.add_argument("--episodes-per-patient", type=int, default=2)
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--repeat", type=int, default=3)
+parser.add_argument(
+    "--database",
+    default=":memory:",
+    help="The SQLite database file, reused if it already has data"
+)
+parser.add_argument("--output", default=None)
+args = parser.parse_args()
+
+settings.configure(DEBUG=False,
+                   DATABASES={
+                       'default': {
+                           'ENGINE': 'django.db.backends.sqlite3',
+                           'NAME': args.database,
+                       }
+                   },
+                   ROOT_URLCONF='opal.urls',
+                   STATIC_URL='/assets/',
+                   COMPRESS_ROOT=os.path.join(os.sep, 'tmp'),
+                   DATE_FORMAT = 'd/m/Y',
+                   DATE_INPUT_FORMATS = ['%d/%m/%Y'],
+                   DATETIME_FORMAT = 'd/m/Y H:i:s',
+                   DATETIME_INPUT_FORMATS = ['%d/%m/%Y %H:%M:%S'],
+                   TIME_FORMAT = "H:i:s",
+                   MIDDLEWARE_CLASSES = (
+                       'django.middleware.common.CommonMiddleware',
+                       'django.contrib.sessions.middleware.SessionMiddleware',
+                       'opal.middleware.AngularCSRFRename',
+                       'django.middleware.csrf.CsrfViewMiddleware',
+                       'django.contrib.auth.middleware.AuthenticationMiddleware',
+                       'django.contrib.messages.middleware.MessageMiddleware',
+                       'opal.middleware.DjangoReversionWorkaround',
+                       'reversion.middleware.RevisionMiddleware',
+                       'axes.middleware.FailedLoginMiddleware',
+                   ),
+                   INSTALLED_APPS=('django.contrib.auth',
+                                   'django.contrib.contenttypes',
+                                   'django.contrib.sessions',
+                                   'django.contrib.staticfiles',
+                                   'django.contrib.admin',
+                                   'compressor',
+                                   'opal',
+                                   'opal.tests',
+                                   'overview',))
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from opal.core import application
+from opal import models as omodels
+
+from overview import benchmark
+
+class Application(application.OpalApplication):
+    pass
+
+call_command("migrate", run_syncdb=True, interactive=False, verbosity=0)
+
+if not omodels.Episode.objects.exists():
+    benchmark.generate(
+        args.episodes,
+        episodes_per_patient=args.episodes_per_patient,
+        seed=args.seed
+    )
+
+report = benchmark.get_report(benchmark.run(repeat=args.repeat))
+report["seed"] = args.seed
+
+if args.output:
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+else:
+    json.dump(report, sys.stdout, indent=2)